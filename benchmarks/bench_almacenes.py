@@ -0,0 +1,142 @@
+"""
+Compara los almacenes (Sheets simulado, SQLite y CSV) con la misma
+carga de trabajo: lectura del catálogo y del historial, cobros (descuento
+de stock + agregar filas) y eliminación de una venta.
+
+    python benchmarks/bench_almacenes.py [productos] [ventas] [cobros]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import pandas as pd
+
+import pos_datos
+from pos_almacenes import (
+    AlmacenCSV,
+    AlmacenSQLite,
+    AlmacenSheets,
+    COLUMNAS_VENTAS,
+)
+from hoja_falsa import LibroFalso
+
+
+def catalogo(n):
+    return pd.DataFrame({
+        "id_producto": [f"P-{i:03d}" for i in range(1, n + 1)],
+        "categoria": ["Fina"] * n,
+        "nombre": [f"Sabor {i}" for i in range(1, n + 1)],
+        "costo": [11.0] * n,
+        "precio": [22.0] * n,
+        "stock": [1_000_000] * n,
+        "stock_minimo": [5] * n,
+        "activa": [True] * n,
+    })
+
+
+def historial(n):
+    fila = [
+        "2026-02-02", "13:49:55", "P-001", "Sabor 1", "Fina",
+        1, 22.0, 0.0, 0.0, 22.0, "Efectivo", 11.0,
+    ]
+    return pd.DataFrame([fila] * n, columns=COLUMNAS_VENTAS)
+
+
+def ticket(i):
+    return [
+        {
+            "fecha": "2026-02-03",
+            "hora": "10:00:00",
+            "id_producto": f"P-{(i + j) % 50 + 1:03d}",
+            "producto": "Sabor",
+            "categoria": "Fina",
+            "cantidad": 1,
+            "precio": 22.0,
+            "descuento": 0.0,
+            "extra": 0.0,
+            "total": 22.0,
+            "metodo_pago": "Efectivo",
+        }
+        for j in range(3)
+    ]
+
+
+def crear(tipo, carpeta, df_prod, df_ventas):
+    if tipo == "sheets":
+        libro = LibroFalso()
+        libro.agregar_hoja("productos", [])
+        libro.agregar_hoja("ventas", [])
+        almacen = AlmacenSheets(libro)
+    elif tipo == "sqlite":
+        almacen = AlmacenSQLite(os.path.join(carpeta, "bench.db"))
+    else:
+        almacen = AlmacenCSV(carpeta)
+
+    almacen.escribir_productos(df_prod)
+    almacen.escribir_ventas(df_ventas)
+    return almacen
+
+
+def cronometrar(funcion):
+    inicio = time.perf_counter()
+    funcion()
+    return (time.perf_counter() - inicio) * 1000
+
+
+def cobro(i):
+    df = pos_datos.cargar_productos()
+    filas = ticket(i)
+    for fila in filas:
+        mask = df["id_producto"] == fila["id_producto"]
+        df.loc[df.index[mask][0], "stock"] -= fila["cantidad"]
+    pos_datos.guardar_productos(df)
+    pos_datos.agregar_ventas(filas)
+
+
+def medir(tipo, n_prod, n_ventas, n_cobros):
+    with tempfile.TemporaryDirectory() as carpeta:
+        almacen = crear(tipo, carpeta, catalogo(n_prod), historial(n_ventas))
+        pos_datos.usar_almacen(almacen)
+
+        resultados = {}
+
+        pos_datos.invalidar_cache()
+        resultados["cargar_productos"] = cronometrar(pos_datos.cargar_productos)
+        pos_datos.invalidar_cache()
+        resultados["cargar_ventas"] = cronometrar(pos_datos.cargar_ventas)
+
+        tiempos = [cronometrar(lambda: cobro(i)) for i in range(n_cobros)]
+        resultados["cobro (prom.)"] = sum(tiempos) / len(tiempos)
+
+        resultados["eliminar_venta"] = cronometrar(
+            lambda: pos_datos.eliminar_venta(0)
+        )
+
+        df_final = pos_datos.cargar_ventas()
+        assert len(df_final) == n_ventas + 3 * n_cobros - 1
+
+    return resultados
+
+
+def main():
+    n_prod = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    n_ventas = int(sys.argv[2]) if len(sys.argv) > 2 else 50_000
+    n_cobros = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+
+    print(f"{n_prod:,} productos, {n_ventas:,} ventas, {n_cobros} cobros (ms)")
+    print(f"{'operación':>18} {'sheets':>10} {'sqlite':>10} {'csv':>10}")
+
+    por_tipo = {t: medir(t, n_prod, n_ventas, n_cobros) for t in ["sheets", "sqlite", "csv"]}
+
+    for operacion in por_tipo["sheets"]:
+        print(
+            f"{operacion:>18} "
+            + " ".join(f"{por_tipo[t][operacion]:>10.2f}" for t in por_tipo)
+        )
+
+
+if __name__ == "__main__":
+    main()
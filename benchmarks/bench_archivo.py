@@ -0,0 +1,128 @@
+"""
+Compara tres formas de obtener las ventas de un rango de fechas:
+el filtro sobre el DataFrame completo (comparación de textos en
+"fecha"), la búsqueda binaria sobre "momento" (ventas_entre) y el
+archivo Parquet por mes (solo los meses del rango y solo las columnas
+de las gráficas).
+
+También mide la creación del archivo, el espejo incremental de un cobro
+y la compactación.
+
+    python benchmarks/bench_archivo.py [ventas] [dias_historial]
+"""
+import datetime as dt
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+import pandas as pd
+
+from pos_almacenes import COLUMNAS_VENTAS, normalizar_ventas
+from pos_archivo import ArchivoVentas
+from pos_reportes import ventas_entre
+
+COBROS = 30
+
+COLUMNAS_GRAFICAS = [
+    "fecha",
+    "id_producto",
+    "producto",
+    "categoria",
+    "cantidad",
+    "total",
+    "metodo_pago",
+]
+
+
+def historial(n, dias, hoy):
+    rng = np.random.default_rng(0)
+    fechas = np.array([
+        (hoy - dt.timedelta(days=d)).isoformat() for d in range(dias - 1, -1, -1)
+    ])
+    cantidades = rng.integers(1, 4, n)
+    prods = rng.integers(1, 501, n)
+    return pd.DataFrame({
+        "fecha": fechas[np.sort(rng.integers(0, dias, n))],
+        "hora": "12:00:00",
+        "id_producto": [f"P-{p:03d}" for p in prods],
+        "producto": [f"Sabor {p}" for p in prods],
+        "categoria": "Fina",
+        "cantidad": cantidades,
+        "precio": 22.0,
+        "descuento": 0.0,
+        "extra": 0.0,
+        "total": 22.0 * cantidades,
+        "costo": 11.0,
+        "metodo_pago": np.array(["Efectivo", "Tarjeta", "Transferencia"])[rng.integers(0, 3, n)],
+    })[COLUMNAS_VENTAS]
+
+
+def cronometrar(funcion, repeticiones=5):
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor * 1000, resultado
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    dias = int(sys.argv[2]) if len(sys.argv) > 2 else 730
+    hoy = dt.date.today()
+
+    df = historial(n, dias, hoy)
+    print(f"{n:,} ventas en {dias} días")
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        archivo = ArchivoVentas(carpeta)
+
+        ms, _ = cronometrar(lambda: archivo.espejar(df), repeticiones=1)
+        print(f"{'crear archivo':>28}: {ms:>9.1f} ms")
+
+        # Cobros de 3 líneas que llegan de uno en uno
+        ticket = df.tail(3).assign(fecha=hoy.isoformat())
+        tiempos = []
+        for _ in range(COBROS):
+            df = pd.concat([df, ticket], ignore_index=True)
+            ms, _ = cronometrar(lambda: archivo.espejar(df), repeticiones=1)
+            tiempos.append(ms)
+        print(f"{'espejar un cobro (prom.)':>28}: {sum(tiempos) / len(tiempos):>9.1f} ms")
+
+        ms, _ = cronometrar(archivo.compactar, repeticiones=1)
+        print(f"{'compactar':>28}: {ms:>9.1f} ms")
+
+        ms, df = cronometrar(lambda: normalizar_ventas(df), repeticiones=1)
+        print(f"{'normalizar (momento)':>28}: {ms:>9.1f} ms")
+
+        print(
+            f"\n{'rango':>10} {'filas':>10} {'DataFrame ms':>13} "
+            f"{'binaria ms':>11} {'archivo ms':>11}"
+        )
+        for dias_rango in [1, 30, 365]:
+            f_ini = (hoy - dt.timedelta(days=dias_rango - 1)).isoformat()
+            f_fin = hoy.isoformat()
+
+            ms_df, en_df = cronometrar(lambda: df[
+                (df["fecha"] >= f_ini) & (df["fecha"] <= f_fin)
+            ][COLUMNAS_GRAFICAS])
+            ms_binaria, en_binaria = cronometrar(
+                lambda: ventas_entre(df, f_ini, f_fin)[COLUMNAS_GRAFICAS]
+            )
+            ms_archivo, en_archivo = cronometrar(
+                lambda: archivo.consultar(f_ini, f_fin, COLUMNAS_GRAFICAS)
+            )
+            assert len(en_df) == len(en_binaria) == len(en_archivo)
+
+            print(
+                f"{dias_rango:>6} días {len(en_df):>10,} "
+                f"{ms_df:>13.1f} {ms_binaria:>11.1f} {ms_archivo:>11.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,370 @@
+"""
+Suite de benchmarks de la app completa sobre un Google Sheets simulado
+(hoja_falsa con latencia y cuota por minuto, detrás de ClienteSheets como
+en producción).
+
+Por cada tamaño de datos mide, escenario por escenario, el tiempo de
+reloj, las llamadas a Sheets y el pico de memoria. La memoria sale de
+una segunda pasada con tracemalloc y sin latencia, porque tracemalloc
+vuelve varias veces más lento el código en Python puro:
+
+    - cargar_productos / cargar_ventas en frío
+    - recarga de ventas después de un cobro (solo la cola)
+    - cobro (confirmar_venta + sincronización de la bitácora)
+    - carga masiva de productos (10% del catálogo, mitad nuevos)
+    - "Corte del día" (primera vez y de nuevo) y "Análisis por rango" a
+      30 y 365 días (cálculos y figuras)
+
+    python benchmarks/bench_escenarios.py [tamaño ...] [--latencia S]
+
+Tamaños: chico, mediano, grande, maximo (por defecto los tres primeros;
+"maximo" son 20k productos y 2M ventas y necesita varios GB de RAM).
+"""
+import datetime as dt
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+CARPETA = tempfile.mkdtemp(prefix="bench_escenarios_")
+os.environ["PALETERIA_BITACORA"] = os.path.join(CARPETA, "bitacora.db")
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+import pos_datos
+from pos_almacenes import AlmacenSheets, COLUMNAS_VENTAS
+from pos_bitacora import (
+    obtener_bitacora,
+    cargar_productos_al_dia,
+    cargar_ventas_al_dia,
+    guardar_productos_editados,
+)
+from pos_caja import confirmar_venta
+from pos_reportes import analisis_rango, ventas_entre
+from pos_sheets import ClienteSheets
+from hoja_falsa import LibroFalso
+
+# (productos, ventas)
+TAMANOS = {
+    "chico": (100, 1_000),
+    "mediano": (1_000, 50_000),
+    "grande": (5_000, 500_000),
+    "maximo": (20_000, 2_000_000),
+}
+TAMANOS_PREDETERMINADOS = ["chico", "mediano", "grande"]
+
+# Latencia de una llamada a la API de Sheets y cuotas por minuto
+LATENCIA_SEGUNDOS = 0.05
+CUOTA_LECTURAS_MINUTO = 60
+CUOTA_ESCRITURAS_MINUTO = 60
+
+COBROS = 5
+DIAS_HISTORIAL = 365
+CATEGORIAS = ["Agua", "Crema", "Fina", "Paleta", "Nieve"]
+METODOS_PAGO = ["Efectivo", "Tarjeta", "Transferencia"]
+
+COLUMNAS_PRODUCTOS = [
+    "id_producto",
+    "categoria",
+    "nombre",
+    "costo",
+    "precio",
+    "stock",
+    "stock_minimo",
+    "activa",
+]
+
+# ============================================
+# Datos sintéticos
+# ============================================
+
+def filas_productos(n):
+    return [
+        [
+            f"P-{i:03d}",
+            CATEGORIAS[i % len(CATEGORIAS)],
+            f"Sabor {i}",
+            11.0,
+            22.0,
+            1_000_000,
+            5,
+            True,
+        ]
+        for i in range(1, n + 1)
+    ]
+
+
+def filas_ventas(n, n_prod, hoy):
+    """
+    Ventas repartidas en los últimos DIAS_HISTORIAL días, como las
+    devuelve get_all_values (todo texto).
+    """
+    rng = np.random.default_rng(0)
+    fechas = [
+        (hoy - dt.timedelta(days=d)).isoformat()
+        for d in range(DIAS_HISTORIAL - 1, -1, -1)
+    ]
+    horas = [f"{h:02d}:{m:02d}:00" for h in range(10, 22) for m in range(60)]
+    productos = filas_productos(n_prod)
+
+    dias = np.sort(rng.integers(0, len(fechas), n))
+    minutos = rng.integers(0, len(horas), n)
+    prods = rng.integers(0, n_prod, n)
+    cantidades = rng.integers(1, 4, n)
+    metodos = rng.integers(0, len(METODOS_PAGO), n)
+
+    filas = []
+    for d, m, p, c, mp in zip(dias, minutos, prods, cantidades, metodos):
+        prod = productos[p]
+        filas.append([
+            fechas[d],
+            horas[m],
+            prod[0],
+            prod[2],
+            prod[1],
+            str(c),
+            "22.0",
+            "0.0",
+            "0.0",
+            str(22.0 * c),
+            METODOS_PAGO[mp],
+            "11.0",
+        ])
+    return filas
+
+
+def preparar(n_prod, n_ventas, latencia, hoy):
+    libro = LibroFalso(
+        latencia=latencia,
+        cuota_lecturas=CUOTA_LECTURAS_MINUTO,
+        cuota_escrituras=CUOTA_ESCRITURAS_MINUTO,
+    )
+    libro.agregar_hoja("productos", [COLUMNAS_PRODUCTOS] + filas_productos(n_prod))
+    libro.agregar_hoja("ventas", [COLUMNAS_VENTAS] + filas_ventas(n_ventas, n_prod, hoy))
+
+    pos_datos.usar_almacen(AlmacenSheets(ClienteSheets(libro)))
+    return libro
+
+# ============================================
+# Escenarios (mismos cálculos que paleteria_OK.py)
+# ============================================
+
+def escenario_cobro(i):
+    bitacora = obtener_bitacora()
+    revisiones = bitacora.revisiones()
+    df_productos = cargar_productos_al_dia()
+    filas = [
+        {
+            "fecha": dt.date.today().isoformat(),
+            "hora": "10:00:00",
+            "id_producto": df_productos["id_producto"].iloc[(i + j) % len(df_productos)],
+            "producto": "Sabor",
+            "categoria": "Fina",
+            "cantidad": 1,
+            "precio": 22.0,
+            "descuento": 0.0,
+            "extra": 0.0,
+            "total": 22.0,
+            "metodo_pago": "Efectivo",
+        }
+        for j in range(3)
+    ]
+    confirmar_venta(filas, df_productos, revisiones)
+    bitacora.esperar_sincronizacion(timeout=120)
+
+
+def plantilla_carga_masiva(df_productos):
+    """
+    10% del catálogo (máx. 1000 filas): la mitad productos existentes con
+    precio nuevo y la otra mitad productos nuevos.
+    """
+    n = max(2, min(len(df_productos) // 10, 1000))
+    existentes = df_productos.head(n // 2)[COLUMNAS_PRODUCTOS[1:]].copy()
+    existentes["precio"] = existentes["precio"] + 1
+    nuevos = pd.DataFrame({
+        "categoria": ["Fina"] * (n - len(existentes)),
+        "nombre": [f"Nuevo {i}" for i in range(n - len(existentes))],
+        "costo": 10.0,
+        "precio": 20.0,
+        "stock": 50,
+        "stock_minimo": 5,
+        "activa": True,
+    })
+    return pd.concat([existentes, nuevos], ignore_index=True)
+
+
+def generar_id_producto(df):
+    ids = pd.to_numeric(
+        df["id_producto"].dropna().astype(str).str.replace("P-", "", regex=False),
+        errors="coerce",
+    ).dropna()
+    return "P-001" if ids.empty else f"P-{int(ids.max()) + 1:03d}"
+
+
+def escenario_carga_masiva(df_nuevos):
+    df_productos = cargar_productos_al_dia()
+    df_productos_base = df_productos.copy()
+    df_nuevos = df_nuevos.copy()
+    df_nuevos["id_producto"] = ""
+
+    def producto_existe(row):
+        return (
+            (df_productos["nombre"].astype(str).str.lower() == str(row["nombre"]).lower()) &
+            (df_productos["categoria"].astype(str).str.lower() == str(row["categoria"]).lower())
+        ).any()
+
+    df_nuevos["existe"] = df_nuevos.apply(producto_existe, axis=1)
+    df_nuevos["accion"] = np.where(df_nuevos["existe"], "Actualizar", "Agregar")
+
+    for _, row in df_nuevos.iterrows():
+        if row["accion"] == "Agregar":
+            row["id_producto"] = generar_id_producto(df_productos)
+            df_productos = pd.concat(
+                [df_productos, pd.DataFrame([row])],
+                ignore_index=True
+            )
+        else:
+            mask = (
+                (df_productos["nombre"].str.lower() == row["nombre"].lower()) &
+                (df_productos["categoria"] == row["categoria"])
+            )
+            df_productos.loc[
+                mask,
+                ["costo", "precio", "stock", "stock_minimo", "activa"]
+            ] = [
+                row["costo"],
+                row["precio"],
+                row["stock"],
+                row["stock_minimo"],
+                row["activa"],
+            ]
+
+    df_productos = df_productos.drop(columns=["existe", "accion"])
+    guardar_productos_editados(df_productos, df_productos_base)
+
+
+def escenario_corte(fecha):
+    df_ventas = cargar_ventas_al_dia()
+    tablas = analisis_rango(df_ventas, fecha, fecha)
+
+    df_dia = ventas_entre(df_ventas, fecha, fecha)
+    df_dia.to_csv(index=False).encode("utf-8")
+
+    px.bar(tablas["por_categoria"], x="categoria", y="cantidad", text="cantidad")
+    px.bar(tablas["por_categoria"], x="categoria", y="total", text="total")
+
+
+def escenario_rango(f_ini, f_fin):
+    tablas = analisis_rango(cargar_ventas_al_dia(), f_ini, f_fin)
+
+    por_producto = tablas["por_producto"]
+    px.bar(por_producto, x="categoria_producto", y="cantidad")
+    px.bar(por_producto.sort_values("total", ascending=False), x="categoria_producto", y="total")
+    px.pie(tablas["por_metodo"], names="metodo_pago", values="total")
+    px.bar(tablas["por_categoria"], x="categoria", y="total")
+    px.bar(tablas["por_dia"], x="fecha", y="total")
+    px.bar(tablas["por_dia"], x="fecha", y="cantidad")
+
+# ============================================
+# Medición
+# ============================================
+
+def medir(libro, funcion, memoria):
+    antes = sum(libro.llamadas.values())
+    if memoria:
+        tracemalloc.start()
+    inicio = time.perf_counter()
+    funcion()
+    segundos = time.perf_counter() - inicio
+    pico = 0
+    if memoria:
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return {
+        "ms": segundos * 1000,
+        "llamadas": sum(libro.llamadas.values()) - antes,
+        "pico_mb": pico / 1024 / 1024,
+    }
+
+
+def ejecutar_escenarios(n_prod, n_ventas, latencia, memoria):
+    hoy = dt.date.today()
+    libro = preparar(n_prod, n_ventas, latencia, hoy)
+
+    def escenario(funcion):
+        return medir(libro, funcion, memoria)
+
+    resultados = {}
+    resultados["cargar_productos"] = escenario(pos_datos.cargar_productos)
+    resultados["cargar_ventas"] = escenario(pos_datos.cargar_ventas)
+
+    tiempos = [escenario(lambda: escenario_cobro(i)) for i in range(COBROS)]
+    resultados["cobro (prom.)"] = {
+        clave: sum(t[clave] for t in tiempos) / len(tiempos)
+        for clave in tiempos[0]
+    }
+
+    pos_datos.invalidar_cache("ventas")
+    resultados["recarga ventas"] = escenario(pos_datos.cargar_ventas)
+
+    df_nuevos = plantilla_carga_masiva(pos_datos.cargar_productos())
+    resultados[f"carga masiva ({len(df_nuevos)})"] = escenario(
+        lambda: escenario_carga_masiva(df_nuevos)
+    )
+
+    ayer = (hoy - dt.timedelta(days=1)).isoformat()
+    resultados["corte del día"] = escenario(lambda: escenario_corte(ayer))
+    resultados["corte (de nuevo)"] = escenario(lambda: escenario_corte(ayer))
+
+    inicio_mes = (hoy - dt.timedelta(days=30)).isoformat()
+    resultados["rango 30 días"] = escenario(
+        lambda: escenario_rango(inicio_mes, hoy.isoformat())
+    )
+
+    inicio_anio = (hoy - dt.timedelta(days=DIAS_HISTORIAL)).isoformat()
+    resultados["rango 365 días"] = escenario(
+        lambda: escenario_rango(inicio_anio, hoy.isoformat())
+    )
+
+    return resultados, libro.rechazos_cuota
+
+
+def correr_tamano(nombre, latencia):
+    n_prod, n_ventas = TAMANOS[nombre]
+
+    resultados, rechazos = ejecutar_escenarios(n_prod, n_ventas, latencia, False)
+    memoria, _ = ejecutar_escenarios(n_prod, n_ventas, 0.0, True)
+    for escenario, r in resultados.items():
+        r["pico_mb"] = memoria[escenario]["pico_mb"]
+
+    print(
+        f"\n{nombre}: {n_prod:,} productos, {n_ventas:,} ventas "
+        f"(latencia {latencia * 1000:.0f} ms, rechazos por cuota {rechazos})"
+    )
+    print(f"{'escenario':>22} {'ms':>10} {'llamadas':>9} {'pico MB':>9}")
+    for escenario, r in resultados.items():
+        print(
+            f"{escenario:>22} {r['ms']:>10.1f} "
+            f"{r['llamadas']:>9.1f} {r['pico_mb']:>9.1f}"
+        )
+
+
+def main():
+    argumentos = sys.argv[1:]
+    latencia = LATENCIA_SEGUNDOS
+    if "--latencia" in argumentos:
+        i = argumentos.index("--latencia")
+        latencia = float(argumentos[i + 1])
+        del argumentos[i:i + 2]
+
+    for nombre in argumentos or TAMANOS_PREDETERMINADOS:
+        correr_tamano(nombre, latencia)
+
+
+if __name__ == "__main__":
+    main()
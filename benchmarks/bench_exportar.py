@@ -0,0 +1,75 @@
+"""
+Memoria y tiempo de exportar un año de ventas:
+
+    to_csv        df[columnas].to_csv(index=False).encode("utf-8"), como
+                  se descargaba antes
+    exportar_csv  por lotes en un archivo temporal en disco, que se
+                  entrega abierto (sin pasar sus bytes a memoria)
+    exportar_xlsx Excel en modo write_only (solo las primeras filas: el
+                  libro completo tarda minutos en cualquier modo)
+
+El pico se mide con tracemalloc en una segunda pasada: cuenta solo la
+memoria que reserva Python (lotes, filas de Excel);
+los búferes de Arrow de las columnas de texto de pandas no aparecen.
+
+    python benchmarks/bench_exportar.py [ventas] [filas_excel]
+"""
+import datetime as dt
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from bench_archivo import historial
+from pos_almacenes import COLUMNAS_VENTAS, normalizar_ventas
+from pos_exportar import exportar_csv, exportar_xlsx
+from pos_reportes import ventas_entre
+
+
+def medir(funcion):
+    # tracemalloc hace mucho más lento to_csv: tiempo y memoria por separado
+    inicio = time.perf_counter()
+    resultado = funcion()
+    ms = (time.perf_counter() - inicio) * 1000
+    del resultado
+
+    tracemalloc.start()
+    resultado = funcion()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return ms, pico / 1024 / 1024, _tamano(resultado) / 1024 / 1024
+
+
+def _tamano(resultado):
+    # bytes (to_csv) o el archivo abierto que devuelven los exportadores
+    if isinstance(resultado, bytes):
+        return len(resultado)
+    with resultado:
+        return os.fstat(resultado.fileno()).st_size
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    n_excel = int(sys.argv[2]) if len(sys.argv) > 2 else 100_000
+    hoy = dt.date.today()
+
+    df = normalizar_ventas(historial(n, 365, hoy))
+    anio = ventas_entre(df, hoy - dt.timedelta(days=364), hoy)
+    print(f"{len(anio):,} líneas en el año\n")
+
+    print(f"{'':>14} {'ms':>9} {'pico MB':>9} {'archivo MB':>11}")
+    for nombre, funcion in [
+        ("to_csv", lambda: anio[COLUMNAS_VENTAS].to_csv(index=False).encode("utf-8")),
+        ("exportar_csv", lambda: exportar_csv(anio)),
+        ("exportar_xlsx", lambda: exportar_xlsx({
+            "Ventas": anio.iloc[:n_excel],
+        })),
+    ]:
+        ms, pico, tamano = medir(funcion)
+        print(f"{nombre:>14} {ms:>9.0f} {pico:>9.1f} {tamano:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
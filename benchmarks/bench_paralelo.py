@@ -0,0 +1,63 @@
+"""
+Recálculo completo del resumen diario y la tabla por hora (lo que hace
+el primer reporte tras arrancar o tras eliminar una venta ya resumida)
+con un proceso y repartido por mes entre varios procesos.
+
+    python benchmarks/bench_paralelo.py [ventas] [dias] [procesos ...]
+
+Por omisión: 5M ventas en 3 años y 1, 2 y 4 procesos. La aceleración
+depende de los núcleos de la máquina (os.cpu_count() se muestra arriba).
+"""
+import datetime as dt
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import pandas as pd
+
+import pos_reportes
+from bench_archivo import historial
+from pos_almacenes import normalizar_ventas
+from pos_reportes import agrupar_historial
+
+
+def cronometrar(funcion, repeticiones=2):
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor, resultado
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000_000
+    dias = int(sys.argv[2]) if len(sys.argv) > 2 else 1095
+    procesos = [int(p) for p in sys.argv[3:]] or [1, 2, 4]
+
+    df = normalizar_ventas(historial(n, dias, dt.date.today()))
+    print(f"{n:,} ventas en {dias} días, {os.cpu_count()} núcleo(s)\n")
+
+    base = None
+    for p in procesos:
+        # El primer uso crea los procesos; no se cuenta
+        if p > 1:
+            pos_reportes._pool(p)
+            agrupar_historial(df.iloc[:pos_reportes.MIN_FILAS_PARALELO], procesos=p)
+
+        segundos, (resumen, horas) = cronometrar(
+            lambda: agrupar_historial(df, procesos=p)
+        )
+        if base is None:
+            base = segundos, resumen, horas
+        else:
+            pd.testing.assert_frame_equal(resumen, base[1])
+            pd.testing.assert_frame_equal(horas, base[2])
+
+        print(f"{p:>2} proceso(s): {segundos:>7.2f} s  x{base[0] / segundos:.2f}")
+
+
+if __name__ == "__main__":
+    main()
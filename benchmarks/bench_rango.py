@@ -0,0 +1,129 @@
+"""
+Tablas de "Análisis por rango" sobre un rango de 1M líneas de venta:
+
+    anterior          seis groupby sobre las líneas del rango, más la
+                      columna categoria_producto fila por fila
+    resumen+groupby   los mismos groupby sobre el resumen diario
+    motor             analisis_rango (una pasada sobre el resumen)
+    motor en caché    analisis_rango repetido con los mismos datos
+
+    python benchmarks/bench_rango.py [ventas] [productos] [dias]
+"""
+import datetime as dt
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+import pandas as pd
+
+import pos_reportes
+from pos_almacenes import COLUMNAS_VENTAS
+from pos_reportes import analisis_rango, resumen_diario, resumen_en_rango
+
+CATEGORIAS = np.array(["Agua", "Crema", "Fina", "Paleta", "Nieve"])
+METODOS_PAGO = np.array(["Efectivo", "Tarjeta", "Transferencia"])
+
+
+def historial(n, n_prod, dias, hoy):
+    rng = np.random.default_rng(0)
+    fechas = np.array([
+        (hoy - dt.timedelta(days=d)).isoformat() for d in range(dias - 1, -1, -1)
+    ])
+    prods = rng.integers(1, n_prod + 1, n)
+    cantidades = rng.integers(1, 4, n)
+    return pd.DataFrame({
+        "fecha": fechas[np.sort(rng.integers(0, dias, n))],
+        "hora": "12:00:00",
+        "id_producto": np.char.add("P-", np.char.zfill(prods.astype(str), 3)),
+        "producto": np.char.add("Sabor ", prods.astype(str)),
+        "categoria": CATEGORIAS[prods % len(CATEGORIAS)],
+        "cantidad": cantidades,
+        "precio": 22.0,
+        "descuento": 0.0,
+        "extra": 0.0,
+        "total": 22.0 * cantidades,
+        "costo": 11.0,
+        "metodo_pago": METODOS_PAGO[rng.integers(0, len(METODOS_PAGO), n)],
+    })[COLUMNAS_VENTAS]
+
+
+def seis_groupby(df_rango):
+    df_rango = df_rango.copy()
+    df_rango["categoria_producto"] = df_rango["categoria"] + " - " + df_rango["producto"]
+    return [
+        df_rango.groupby("metodo_pago", as_index=False).agg(
+            total_venta=("total", "sum"),
+            productos_vendidos=("cantidad", "sum"),
+        ),
+        df_rango.groupby(["id_producto", "producto", "categoria"], as_index=False).agg(
+            cantidad_vendida=("cantidad", "sum"),
+            total_generado=("total", "sum"),
+        ).sort_values("cantidad_vendida", ascending=False),
+        df_rango.groupby(["id_producto", "categoria_producto"], as_index=False)["cantidad"].sum(),
+        df_rango.groupby(["id_producto", "categoria_producto"], as_index=False)["total"].sum(),
+        df_rango.groupby("metodo_pago", as_index=False)["total"].sum(),
+        df_rango.groupby("categoria", as_index=False)["total"].sum(),
+        df_rango.groupby("fecha", as_index=False)["total"].sum(),
+        df_rango.groupby("fecha", as_index=False)["cantidad"].sum(),
+    ]
+
+
+def cronometrar(funcion, repeticiones=3):
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor * 1000
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    n_prod = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    dias = int(sys.argv[3]) if len(sys.argv) > 3 else 365
+    hoy = dt.date.today()
+
+    df = historial(n, n_prod, dias, hoy)
+    f_ini = (hoy - dt.timedelta(days=dias - 1)).isoformat()
+    f_fin = hoy.isoformat()
+
+    inicio = time.perf_counter()
+    resumen = resumen_diario(df)
+    print(
+        f"{n:,} ventas, {n_prod} productos, {dias} días; resumen de "
+        f"{len(resumen):,} filas en {(time.perf_counter() - inicio) * 1000:.0f} ms"
+    )
+
+    df_rango = df[(df["fecha"] >= f_ini) & (df["fecha"] <= f_fin)]
+    print(f"rango {f_ini} a {f_fin}: {len(df_rango):,} líneas\n")
+
+    def motor_sin_cache():
+        pos_reportes._analisis.clear()
+        analisis_rango(df, f_ini, f_fin)
+
+    tiempos = {
+        "anterior": cronometrar(lambda: seis_groupby(df_rango)),
+        "resumen+groupby": cronometrar(
+            lambda: seis_groupby(resumen_en_rango(resumen, f_ini, f_fin))
+        ),
+        "motor": cronometrar(motor_sin_cache),
+        "motor en caché": cronometrar(lambda: analisis_rango(df, f_ini, f_fin)),
+    }
+
+    # Mismos resultados que el cálculo anterior
+    tablas = analisis_rango(df, f_ini, f_fin)
+    esperado = seis_groupby(df_rango)[1].set_index("id_producto")
+    obtenido = tablas["por_producto"].set_index("id_producto")
+    assert np.allclose(
+        esperado.loc[obtenido.index, "total_generado"], obtenido["total"]
+    )
+
+    for nombre, ms in tiempos.items():
+        print(f"{nombre:>16}: {ms:>9.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
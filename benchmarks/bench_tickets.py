@@ -0,0 +1,157 @@
+"""
+Tickets por segundo para tickets de 1, 10 y 100 productos:
+
+    reportlab       el PDF anterior, armado con un Canvas por venta
+    plantilla       generar_ticket_pdf (parte fija del PDF ya armada)
+    ESC/POS 58 mm   ticket_escpos para impresora térmica
+    en hilo         lo que espera la página al pedir el PDF a
+                    generar_ticket_pdf_en_hilo (tickets/s de envío)
+
+    python benchmarks/bench_tickets.py [segundos por medición]
+
+Sin reportlab instalado se omite la primera columna.
+"""
+import os
+import sys
+import time
+from io import BytesIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from pos_tickets import (
+    generar_ticket_pdf,
+    generar_ticket_pdf_en_hilo,
+    ticket_escpos,
+)
+
+try:
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+except ImportError:
+    canvas = None
+
+PRODUCTOS = [1, 10, 100]
+
+
+def ticket(n):
+    items = [
+        {
+            "id_producto": f"P-{i:03d}",
+            "categoria": "Paleta",
+            "producto": f"Limón con chile {i}",
+            "cantidad": 2,
+            "precio": 22.0,
+            "extra": 1.0 if i % 3 == 0 else 0.0,
+            "descuento": 2.0 if i % 5 == 0 else 0.0,
+            "subtotal": 44.0,
+        }
+        for i in range(n)
+    ]
+    return {
+        "fecha": "2026-10-18",
+        "hora": "12:00:00",
+        "metodo_pago": "Efectivo",
+        "total_bruto": 44.0 * n,
+        "descuento": 0.0,
+        "total": 44.0 * n,
+        "items": items,
+    }
+
+
+def ticket_reportlab(ticket):
+    # generar_ticket_pdf antes de la plantilla
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, pagesize=letter)
+    width, height = letter
+
+    y = height - 50
+    c.setFont("Helvetica-Bold", 14)
+    c.drawString(50, y, "Ticket de venta")
+    y -= 25
+    c.setFont("Helvetica", 10)
+    c.drawString(50, y, f"Fecha: {ticket['fecha']}   Hora: {ticket['hora']}")
+    y -= 15
+    c.drawString(50, y, f"Método de pago: {ticket['metodo_pago']}")
+    y -= 25
+    c.setFont("Helvetica-Bold", 11)
+    c.drawString(50, y, "Detalle de productos:")
+    y -= 18
+    c.setFont("Helvetica", 10)
+
+    for item in ticket["items"]:
+        linea3 = ""
+        if item.get("extra", 0) > 0:
+            linea3 += f"  Extra: +${item['extra']:.2f}"
+        if item.get("descuento", 0) > 0:
+            linea3 += f"  Descuento: -${item['descuento']:.2f}"
+        if y < 100:
+            c.showPage()
+            y = height - 50
+        c.setFont("Helvetica", 10)
+        c.drawString(
+            50, y, f"- ID: {item['id_producto']} | {item['categoria']} - {item['producto']}"
+        )
+        y -= 15
+        c.drawString(50, y, f"  Cant: {item['cantidad']}  Precio: ${item['precio']:.2f}")
+        y -= 15
+        if linea3:
+            c.drawString(50, y, linea3)
+            y -= 15
+        c.setFont("Helvetica", 11)
+        c.drawString(50, y, f"Subtotal: ${float(item.get('subtotal', 0)):.2f}")
+        y -= 20
+
+    y -= 10
+    c.line(50, y, width - 50, y)
+    y -= 20
+    c.setFont("Helvetica-Bold", 12)
+    c.drawString(50, y, f"TOTAL A PAGAR: ${ticket['total']:.2f}")
+    y -= 25
+    c.setFont("Helvetica", 10)
+    c.drawString(50, y, "¡Gracias por su compra!")
+    c.showPage()
+    c.save()
+    buffer.seek(0)
+    return buffer
+
+
+def por_segundo(funcion, segundos):
+    # Repeticiones hasta juntar `segundos`; devuelve llamadas por segundo
+    funcion()
+    n = 0
+    inicio = time.perf_counter()
+    while time.perf_counter() - inicio < segundos:
+        funcion()
+        n += 1
+    return n / (time.perf_counter() - inicio)
+
+
+def main():
+    segundos = float(sys.argv[1]) if len(sys.argv) > 1 else 1.0
+
+    medidas = {}
+    if canvas is not None:
+        medidas["reportlab"] = ticket_reportlab
+    medidas["plantilla"] = generar_ticket_pdf
+    medidas["ESC/POS 58 mm"] = lambda t: ticket_escpos(t, 32)
+
+    print(f"{'productos':>10}" + "".join(f"{nombre:>16}" for nombre in medidas) + f"{'en hilo':>16}")
+    for n in PRODUCTOS:
+        datos = ticket(n)
+        tasas = [por_segundo(lambda: f(datos), segundos) for f in medidas.values()]
+
+        # Solo el envío: la página sigue mientras el hilo arma el PDF
+        pendientes = []
+        tasas.append(por_segundo(
+            lambda: pendientes.append(generar_ticket_pdf_en_hilo(datos)), segundos
+        ))
+        for futuro in pendientes:
+            futuro.result()
+
+        print(f"{n:>10}" + "".join(f"{t:>16,.0f}" for t in tasas))
+
+    print("\n(tickets por segundo, un solo hilo de Python)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark del registro de una venta con distintos tamaños de historial.
+
+Compara la reescritura completa de la hoja "ventas" (flujo anterior:
+concat + clear + update) contra agregar_ventas (append de solo el ticket).
+
+    python benchmarks/bench_ventas_append.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import pandas as pd
+
+import pos_datos
+from pos_almacenes import AlmacenSheets, COLUMNAS_VENTAS
+from hoja_falsa import LibroFalso
+
+TAMANOS = [100, 1_000, 10_000, 100_000, 500_000]
+
+
+def historial(n):
+    fila = [
+        "2026-02-02", "13:49:55", "P-001", "Chocolate", "Fina",
+        1, 22.0, 0.0, 0.0, 22.0, "Efectivo", 11.0,
+    ]
+    return [COLUMNAS_VENTAS] + [list(fila) for _ in range(n)]
+
+
+def ticket():
+    return [
+        {
+            "fecha": "2026-02-03",
+            "hora": "10:00:00",
+            "id_producto": f"P-00{i}",
+            "producto": "Fresa",
+            "categoria": "Mini",
+            "cantidad": 2,
+            "precio": 5.0,
+            "extra": 0.0,
+            "descuento": 0.0,
+            "total": 10.0,
+            "metodo_pago": "Efectivo",
+        }
+        for i in range(3)
+    ]
+
+
+def medir(n, modo):
+    libro = LibroFalso()
+    libro.agregar_hoja("ventas", historial(n))
+    pos_datos.usar_almacen(AlmacenSheets(libro))
+
+    df_ventas = pos_datos.cargar_ventas()
+    libro.reiniciar_contadores()
+
+    inicio = time.perf_counter()
+    if modo == "reescritura":
+        df = pd.concat([df_ventas, pd.DataFrame(ticket())], ignore_index=True)
+        pos_datos.guardar_ventas(df)
+    else:
+        pos_datos.agregar_ventas(ticket(), df_ventas)
+    segundos = time.perf_counter() - inicio
+
+    assert len(libro.hojas["ventas"].valores) == n + 1 + 3
+    return segundos, sum(libro.llamadas.values()), libro.celdas_escritas
+
+
+def main():
+    print(f"{'historial':>10} {'modo':>12} {'ms':>10} {'llamadas':>9} {'celdas':>10}")
+    for n in TAMANOS:
+        for modo in ["reescritura", "append"]:
+            segundos, llamadas, celdas = medir(n, modo)
+            print(f"{n:>10,} {modo:>12} {segundos * 1000:>10.2f} {llamadas:>9} {celdas:>10,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Prueba de estrés de cobros simultáneos sobre un mismo producto.
+
+Varias "sesiones" (hilos) cobran una unidad a la vez del mismo producto
+hasta agotarlo, con un almacén lento que simula la latencia de Sheets.
+Se compara el flujo anterior (cargar, descontar y guardar el catálogo
+completo) con confirmar_venta (revisiones + bitácora) y se verifica que
+stock final = stock inicial - unidades en "ventas".
+
+    python benchmarks/estres_cobro.py [sesiones] [intentos_por_sesion] [stock]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+CARPETA = tempfile.mkdtemp(prefix="estres_cobro_")
+os.environ["PALETERIA_BITACORA"] = os.path.join(CARPETA, "bitacora.db")
+
+import pandas as pd
+
+import pos_datos
+from pos_almacenes import AlmacenCSV, COLUMNAS_VENTAS
+from pos_bitacora import (
+    ConflictoRevision,
+    obtener_bitacora,
+    cargar_productos_al_dia,
+)
+from pos_caja import StockInsuficiente, confirmar_venta
+
+LATENCIA_SEGUNDOS = 0.005
+
+
+class AlmacenLento(AlmacenCSV):
+    def leer_productos(self):
+        time.sleep(LATENCIA_SEGUNDOS)
+        return super().leer_productos()
+
+    def escribir_productos(self, df):
+        time.sleep(LATENCIA_SEGUNDOS)
+        super().escribir_productos(df)
+
+
+def preparar(nombre, stock):
+    carpeta = os.path.join(CARPETA, nombre)
+    os.makedirs(carpeta)
+    almacen = AlmacenLento(carpeta)
+    almacen.escribir_productos(pd.DataFrame([{
+        "id_producto": "P-001",
+        "categoria": "Fina",
+        "nombre": "Chocolate",
+        "costo": 11.0,
+        "precio": 22.0,
+        "stock": stock,
+        "stock_minimo": 5,
+        "activa": True,
+    }]))
+    almacen.escribir_ventas(pd.DataFrame(columns=COLUMNAS_VENTAS))
+    pos_datos.usar_almacen(almacen)
+
+
+def fila_venta():
+    return {
+        "fecha": "2026-02-03",
+        "hora": "10:00:00",
+        "id_producto": "P-001",
+        "producto": "Chocolate",
+        "categoria": "Fina",
+        "cantidad": 1,
+        "precio": 22.0,
+        "descuento": 0.0,
+        "extra": 0.0,
+        "total": 22.0,
+        "metodo_pago": "Efectivo",
+    }
+
+
+def cobro_anterior():
+    df = pos_datos.cargar_productos()
+    idx = df.index[df["id_producto"] == "P-001"][0]
+    if df.loc[idx, "stock"] < 1:
+        return False
+    df.loc[idx, "stock"] -= 1
+    pos_datos.guardar_productos(df)
+    pos_datos.agregar_ventas([fila_venta()])
+    return True
+
+
+def cobro_transaccional():
+    revisiones = obtener_bitacora().revisiones()
+    df = cargar_productos_al_dia()
+    try:
+        confirmar_venta([fila_venta()], df, revisiones)
+        return True
+    except (StockInsuficiente, ConflictoRevision):
+        # Rechazado: sin stock o demasiados conflictos seguidos
+        return False
+
+
+def correr(nombre, cobro, sesiones, intentos, stock):
+    preparar(nombre, stock)
+    vendidos = []
+
+    def sesion():
+        for _ in range(intentos):
+            if cobro():
+                vendidos.append(1)
+
+    inicio = time.perf_counter()
+    hilos = [threading.Thread(target=sesion) for _ in range(sesiones)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    segundos = time.perf_counter() - inicio
+
+    obtener_bitacora().esperar_sincronizacion(timeout=120)
+    pos_datos.invalidar_cache()
+
+    stock_final = int(pos_datos.cargar_productos()["stock"].iloc[0])
+    unidades = int(pos_datos.cargar_ventas()["cantidad"].sum())
+    perdidas = (stock - stock_final) - unidades
+
+    print(
+        f"{nombre:>14}: cobros aceptados {sum(vendidos):>4}, "
+        f"filas en ventas {unidades:>4}, stock final {stock_final:>4}, "
+        f"actualizaciones perdidas {abs(perdidas):>4}, {segundos:.2f} s"
+    )
+    return perdidas, stock_final, sum(vendidos), unidades
+
+
+def main():
+    sesiones = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    intentos = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    stock = int(sys.argv[3]) if len(sys.argv) > 3 else 100
+
+    print(f"{sesiones} sesiones x {intentos} cobros, stock inicial {stock}")
+
+    correr("anterior", cobro_anterior, sesiones, intentos, stock)
+    perdidas, stock_final, aceptados, unidades = correr(
+        "transaccional", cobro_transaccional, sesiones, intentos, stock
+    )
+
+    assert perdidas == 0, "hubo actualizaciones perdidas"
+    assert stock_final >= 0, "se vendió más stock del disponible"
+    assert aceptados == unidades, "cobros aceptados sin fila en ventas"
+    print("OK: sin actualizaciones perdidas ni sobreventa")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""
+Sustituto en memoria de gspread (Spreadsheet / Worksheet) para los
+benchmarks. Implementa solo los métodos que usa pos_datos y cuenta
+llamadas y celdas enviadas para comparar estrategias de escritura.
+
+Opcionalmente simula la red: cada llamada espera `latencia` segundos y,
+si se pasa de la cuota por minuto de lecturas o escrituras, responde con
+un APIError 429 como la API real.
+"""
+import time
+from collections import Counter, deque
+
+from gspread.exceptions import APIError
+from gspread.utils import a1_range_to_grid_range
+
+METODOS_ESCRITURA = {
+    "update",
+    "batch_update",
+    "append_rows",
+    "clear",
+    "batch_clear",
+    "delete_rows",
+}
+
+
+class RespuestaFalsa:
+    """
+    Lo mínimo de requests.Response que necesita APIError.
+    """
+
+    def __init__(self, codigo, mensaje):
+        self.status_code = codigo
+        self.text = mensaje
+        self._error = {"code": codigo, "message": mensaje, "status": "RESOURCE_EXHAUSTED"}
+
+    def json(self):
+        return {"error": self._error}
+
+
+class LibroFalso:
+    def __init__(self, latencia=0.0, cuota_lecturas=None, cuota_escrituras=None):
+        self.hojas = {}
+        self.llamadas = Counter()
+        self.celdas_escritas = 0
+        self.latencia = latencia
+        self.cuotas = {"lectura": cuota_lecturas, "escritura": cuota_escrituras}
+        self.rechazos_cuota = 0
+        self._historial = {"lectura": deque(), "escritura": deque()}
+
+    def registrar_llamada(self, metodo, celdas=0):
+        """
+        Cuenta la llamada, espera la latencia simulada y aplica la cuota
+        por minuto (APIError 429 si se excede).
+        """
+        tipo = "escritura" if metodo in METODOS_ESCRITURA else "lectura"
+        self.llamadas[metodo] += 1
+
+        if self.latencia:
+            time.sleep(self.latencia)
+
+        cuota = self.cuotas[tipo]
+        if cuota is not None:
+            ahora = time.monotonic()
+            marcas = self._historial[tipo]
+            while marcas and ahora - marcas[0] >= 60:
+                marcas.popleft()
+            if len(marcas) >= cuota:
+                self.rechazos_cuota += 1
+                raise APIError(RespuestaFalsa(429, f"Quota exceeded ({tipo})"))
+            marcas.append(ahora)
+
+        self.celdas_escritas += celdas
+
+    def agregar_hoja(self, titulo, valores):
+        self.hojas[titulo] = HojaFalsa(self, titulo, valores)
+        return self.hojas[titulo]
+
+    def worksheet(self, titulo):
+        self.registrar_llamada("worksheet")
+        return self.hojas[titulo]
+
+    def reiniciar_contadores(self):
+        self.llamadas.clear()
+        self.celdas_escritas = 0
+        self.rechazos_cuota = 0
+
+
+class HojaFalsa:
+    def __init__(self, libro, titulo, valores):
+        self.libro = libro
+        self.title = titulo
+        self.valores = [list(f) for f in valores]
+        self.row_count = max(len(self.valores), 1000)
+
+    @property
+    def col_count(self):
+        return max((len(f) for f in self.valores), default=0)
+
+    def _contar(self, metodo, celdas=0):
+        self.libro.registrar_llamada(metodo, celdas)
+
+    def _asegurar_filas(self, n):
+        while len(self.valores) < n:
+            self.valores.append([])
+        self.row_count = max(self.row_count, n)
+
+    def _escribir(self, fila0, col0, datos):
+        self._asegurar_filas(fila0 + len(datos))
+        for i, fila in enumerate(datos):
+            destino = self.valores[fila0 + i]
+            if len(destino) < col0 + len(fila):
+                destino.extend([""] * (col0 + len(fila) - len(destino)))
+            destino[col0:col0 + len(fila)] = fila
+
+    def _recortar(self):
+        while self.valores and not any(v != "" for v in self.valores[-1]):
+            self.valores.pop()
+
+    # ---------- Lecturas ----------
+
+    def get_all_values(self, *args, **kwargs):
+        self._contar("get_all_values")
+        return [list(f) for f in self.valores]
+
+    def get_all_records(self, *args, **kwargs):
+        self._contar("get_all_records")
+        if not self.valores:
+            return []
+        encabezado = self.valores[0]
+        return [
+            {
+                col: (fila[i] if i < len(fila) else "")
+                for i, col in enumerate(encabezado)
+            }
+            for fila in self.valores[1:]
+        ]
+
+    def get(self, range_name=None, *args, **kwargs):
+        self._contar("get")
+        rango = a1_range_to_grid_range(range_name or "A1")
+        ini = rango.get("startRowIndex", 0)
+        fin = rango.get("endRowIndex", len(self.valores))
+        col_ini = rango.get("startColumnIndex", 0)
+        col_fin = rango.get("endColumnIndex")
+        filas = []
+        for fila in self.valores[ini:fin]:
+            valores = list(fila[col_ini:col_fin])
+            while valores and valores[-1] == "":
+                valores.pop()
+            filas.append(valores)
+        while filas and not filas[-1]:
+            filas.pop()
+        return filas
+
+    def row_values(self, fila, *args, **kwargs):
+        self._contar("row_values")
+        if fila > len(self.valores):
+            return []
+        valores = list(self.valores[fila - 1])
+        while valores and valores[-1] == "":
+            valores.pop()
+        return valores
+
+    # ---------- Escrituras ----------
+
+    def update(self, range_name=None, values=None, *args, **kwargs):
+        # Acepta el orden de gspread 5 ("A1", datos) y el de gspread 6
+        if isinstance(range_name, list):
+            range_name, values = values, range_name
+        rango = a1_range_to_grid_range(range_name or "A1")
+        celdas = sum(len(f) for f in values)
+        self._contar("update", celdas)
+        self._escribir(
+            rango.get("startRowIndex", 0),
+            rango.get("startColumnIndex", 0),
+            values,
+        )
+        self._recortar()
+
+    def batch_update(self, data, *args, **kwargs):
+        celdas = sum(len(f) for d in data for f in d["values"])
+        self._contar("batch_update", celdas)
+        for d in data:
+            rango = a1_range_to_grid_range(d["range"])
+            self._escribir(
+                rango.get("startRowIndex", 0),
+                rango.get("startColumnIndex", 0),
+                d["values"],
+            )
+        self._recortar()
+
+    def append_rows(self, values, *args, **kwargs):
+        celdas = sum(len(f) for f in values)
+        self._contar("append_rows", celdas)
+        self._recortar()
+        self.valores.extend(list(f) for f in values)
+        self.row_count = max(self.row_count, len(self.valores))
+
+    def clear(self):
+        self._contar("clear")
+        self.valores = []
+
+    def batch_clear(self, ranges):
+        self._contar("batch_clear")
+        for r in ranges:
+            rango = a1_range_to_grid_range(r)
+            ini = rango.get("startRowIndex", 0)
+            fin = rango.get("endRowIndex", len(self.valores))
+            col_ini = rango.get("startColumnIndex", 0)
+            col_fin = rango.get("endColumnIndex")
+            for fila in self.valores[ini:fin]:
+                fin_c = len(fila) if col_fin is None else min(col_fin, len(fila))
+                for c in range(col_ini, fin_c):
+                    fila[c] = ""
+        self._recortar()
+
+    def delete_rows(self, start_index, end_index=None):
+        self._contar("delete_rows")
+        end_index = end_index or start_index
+        del self.valores[start_index - 1:end_index]
@@ -2,36 +2,65 @@ import streamlit as st
 import pandas as pd
 from datetime import datetime, date
 import datetime as dt
-from io import BytesIO
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
 import os
+from functools import partial
 import plotly.express as px
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
-
-@st.cache_resource
-def conectar_sheets():
-    scope = [
-        "https://spreadsheets.google.com/feeds",
-        "https://www.googleapis.com/auth/drive"
-    ]
-    
-    st.write(st.secrets["gcp_service_account"]["client_email"])
-
-    creds = ServiceAccountCredentials.from_json_keyfile_dict(
-        st.secrets["gcp_service_account"],
-        scope
-    )
+from pos_datos import (
+    cargar_ventas,
+    eliminar_venta,
+    invalidar_cache,
+    obtener_almacen,
+    posiciones_productos,
+)
+from pos_bitacora import (
+    ConflictoRevision,
+    obtener_bitacora,
+    cargar_productos_al_dia,
+    cargar_ventas_al_dia,
+    guardar_productos_editados,
+)
+from pos_caja import (
+    Carrito,
+    StockInsuficiente,
+    validar_stock,
+    confirmar_venta,
+)
+from pos_archivo import obtener_archivo
+from pos_busqueda import buscar_productos
+from pos_cierres import DiaYaCerrado, corte_del_dia, diferencias, obtener_cierres
+from pos_exportar import MIME_CSV, MIME_XLSX, exportar_csv, exportar_xlsx
+from pos_graficas import figura
+from pos_reportes import (
+    DIAS_SEMANA,
+    analisis_margen,
+    analisis_rango,
+    clasificacion_abc,
+    demanda_por_hora,
+    productos_destacados,
+    restar_venta,
+    top_con_otros,
+    ventas_entre,
+)
+from pos_tickets import (
+    COLUMNAS_TERMICA,
+    FORMATO_PDF,
+    FORMATOS_TICKET,
+    ErrorImpresion,
+    generar_ticket_pdf_en_hilo,
+    imprimir,
+    impresoras,
+    texto_ticket,
+    ticket_escpos,
+)
 
-    client = gspread.authorize(creds)
-    return client.open_by_url(
-    "https://docs.google.com/spreadsheets/d/1gBNATNp8eYb2m0kPoInfbkuQHmjIVdD21x2LNxnOlbk/edit"
-    )
 # ============================================
 # Archivos y catálogos
 # ============================================
 
+# Productos activos hasta los que "Registrar venta" muestra de entrada la
+# lista por categoría; con más, se usa la entrada rápida
+MAX_PRODUCTOS_LISTA = 60
+
 CATEGORIAS_PRODUCTOS = [
     "Piramide",
     "Fina",
@@ -46,203 +75,6 @@ CATEGORIAS_PRODUCTOS = [
     "Otros",
 ]
 # ============================================
-# Funciones auxiliares
-# ============================================
-
-def guardar_productos(df):
-    sheet = conectar_sheets()
-    productos = sheet.worksheet("productos")
-
-    # Limpiar hoja
-    productos.clear()
-
-    # Convertir NaN a vacío
-    df = df.fillna("")
-
-    # Crear matriz completa
-    datos = [df.columns.tolist()] + df.values.tolist()
-
-    # Escribir todo de una sola vez
-    productos.update("A1", datos)
-        
-def cargar_productos():
-    sheet = conectar_sheets()
-    productos = sheet.worksheet("productos")
-    data = productos.get_all_records()
-
-    df = pd.DataFrame(data)
-
-    # Limpiar nombres de columnas
-    df.columns = df.columns.astype(str).str.strip().str.lower()
-
-    # --- Crear columnas si no existen ---
-    if "nombre" not in df.columns:
-        df["nombre"] = ""
-
-    if "categoria" not in df.columns:
-        df["categoria"] = ""
-
-    if "precio" not in df.columns:
-        df["precio"] = 0.0
-
-    if "costo" not in df.columns:
-        df["costo"] = 0.0
-
-    if "stock" not in df.columns:
-        df["stock"] = 0
-
-    if "stock_minimo" not in df.columns:
-        df["stock_minimo"] = 5
-
-    if "activa" not in df.columns:
-        df["activa"] = True
-
-# --- Convertir tipos ---
-    df["precio"] = pd.to_numeric(df["precio"], errors="coerce").fillna(0.0)
-    df["costo"] = pd.to_numeric(df["costo"], errors="coerce").fillna(0.0)
-    df["stock"] = pd.to_numeric(df["stock"], errors="coerce").fillna(0).astype(int)
-    df["stock_minimo"] = pd.to_numeric(df["stock_minimo"], errors="coerce").fillna(5).astype(int)
-
-    df["activa"] = (
-        df["activa"]
-        .astype(str)
-        .str.lower()
-        .isin(["si", "true", "1"])
-    )
-
-    return df
-    
-def cargar_ventas():
-    sheet = conectar_sheets()
-    ventas = sheet.worksheet("ventas")
-    data = ventas.get_all_records()
-
-    df = pd.DataFrame(data)
-
-    if df.empty:
-        return pd.DataFrame(
-            columns=[
-                "fecha",
-                "hora",
-                "id_producto",
-                "producto",
-                "categoria",
-                "cantidad",
-                "precio",
-                "descuento",
-                "extra",
-                "total",
-                "metodo_pago",
-            ]
-        )
-
-    # Tipos numéricos
-    for col in ["cantidad", "precio", "total", "descuento"]:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0.0)
-
-    return df
-
-def guardar_ventas(df):
-    sheet = conectar_sheets()
-    ventas = sheet.worksheet("ventas")
-
-    ventas.clear()
-
-    df = df.fillna("")
-
-    datos = [df.columns.tolist()] + df.values.tolist()
-
-    ventas.update("A1", datos)
-
-def generar_ticket_pdf(ticket: dict) -> BytesIO:
-    """
-    Genera un ticket en PDF y devuelve un buffer BytesIO.
-    """
-    buffer = BytesIO()
-    c = canvas.Canvas(buffer, pagesize=letter)
-    width, height = letter
-
-    y = height - 50
-    c.setFont("Helvetica-Bold", 14)
-    c.drawString(50, y, "Ticket de venta")
-    y -= 25
-
-    c.setFont("Helvetica", 10)
-    c.drawString(50, y, f"Fecha: {ticket['fecha']}   Hora: {ticket['hora']}")
-    y -= 15
-    c.drawString(50, y, f"Método de pago: {ticket['metodo_pago']}")
-    y -= 25
-
-    c.setFont("Helvetica-Bold", 11)
-    c.drawString(50, y, "Detalle de productos:")
-    y -= 18
-
-    c.setFont("Helvetica", 10)
-
-    for item in ticket["items"]:
-
-        linea1 = (
-            f"- ID: {item['id_producto']} | "
-            f"{item['categoria']} - {item['producto']}"
-        )
-
-        linea2 = (
-            f"  Cant: {item['cantidad']}  "
-            f"Precio: ${item['precio']:.2f}"
-        )
-
-        linea3 = ""
-
-        if item.get("extra", 0) > 0:
-            linea3 += f"  Extra: +${item['extra']:.2f}"
-
-        if item.get("descuento", 0) > 0:
-            linea3 += f"  Descuento: -${item['descuento']:.2f}"
-
-        if y < 100:
-            c.showPage()
-            y = height - 50
-
-        c.setFont("Helvetica", 10)
-        c.drawString(50, y, linea1)
-        y -= 15
-
-        c.drawString(50, y, linea2)
-        y -= 15
-
-        if linea3:
-            c.drawString(50, y, linea3)
-            y -= 15
-
-        # 🔥 Total resaltado
-        c.setFont("Helvetica", 11)
-        c.drawString(50, y, f"Subtotal: ${float(item.get('subtotal', 0)):.2f}")
-        y -= 20
-        
-    # Línea separadora final
-    y -= 10
-    c.line(50, y, width - 50, y)
-    y -= 20
-
-    # TOTAL GENERAL 
-    c.setFont("Helvetica-Bold", 12)
-    c.drawString(50, y, f"TOTAL A PAGAR: ${ticket['total']:.2f}")
-    y -= 25
-
-    c.setFont("Helvetica", 10)
-    c.drawString(50, y, "¡Gracias por su compra!")
-        
-    c.showPage()
-    c.save()
-    buffer.seek(0)
-    return buffer
-
-def eliminar_venta_sheet(indice_fila):
-    sheet = conectar_sheets()
-    ventas = sheet.worksheet("ventas")
-    ventas.delete_rows(indice_fila)
-# ============================================
 # Configuración de página
 # ============================================
 st.set_page_config(
@@ -257,12 +89,16 @@ st.title("🧾 PALETERÍA")
 # ============================================
 # Cargar datos
 # ============================================
-df_productos = cargar_productos()
-df_ventas = cargar_ventas()
+# Las revisiones se leen antes que el catálogo: un cobro validado con
+# este df_productos solo se registra si siguen iguales
+revisiones_vistas = obtener_bitacora().revisiones()
+df_productos = cargar_productos_al_dia()
+df_productos_base = df_productos.copy()
+df_ventas = cargar_ventas_al_dia()
 
 # Inicializar carrito en sesión
-if "carrito" not in st.session_state:
-    st.session_state["carrito"] = []
+if not isinstance(st.session_state.get("carrito"), Carrito):
+    st.session_state["carrito"] = Carrito()
 
 # ============================================
 # Menú lateral
@@ -294,6 +130,43 @@ seccion = st.sidebar.selectbox(
     "Selecciona una sección",
     opciones_menu
 )
+
+# Los datos se sirven de caché; este botón fuerza leer de nuevo Sheets
+if st.sidebar.button("🔄 Recargar datos"):
+    invalidar_cache()
+    st.rerun()
+
+# Ticket de esta caja: cada navegador elige formato e impresora
+formato_ticket = st.sidebar.selectbox("🖨️ Formato de ticket", FORMATOS_TICKET)
+impresoras_caja = impresoras()
+impresora_sel = None
+if formato_ticket != FORMATO_PDF and impresoras_caja:
+    impresora_sel = st.sidebar.selectbox(
+        "Impresora",
+        ["Ninguna (solo descargar)", *impresoras_caja],
+    )
+
+# Indicador de ventas pendientes de subir a Sheets
+estado_sync = obtener_bitacora().estado()
+if estado_sync["pendientes"] == 0:
+    st.sidebar.caption("🟢 Ventas sincronizadas con Sheets")
+else:
+    st.sidebar.warning(
+        f"🟠 {estado_sync['pendientes']} venta(s) pendientes de sincronizar"
+    )
+    if estado_sync["ultimo_error"]:
+        st.sidebar.caption(
+            f"Reintento {estado_sync['intentos']}: {estado_sync['ultimo_error']}"
+        )
+
+# Consumo de la cuota de Google Sheets (solo con almacén en Sheets)
+uso_api = obtener_almacen().uso_api()
+if uso_api is not None:
+    st.sidebar.caption(
+        f"Sheets último minuto: {uso_api['lecturas']}/{uso_api['limite_lecturas']} "
+        f"lecturas, {uso_api['escrituras']}/{uso_api['limite_escrituras']} escrituras"
+    )
+
 def generar_id_producto(df):
     """
     Genera ID_PRODUCTO consecutivo tipo P-001, P-002, ...
@@ -472,7 +345,7 @@ if seccion == "Administrar inventario":
                         row["activa"],
                     ]
 
-            guardar_productos(df_productos)
+            guardar_productos_editados(df_productos, df_productos_base)
             if "carga_masiva_ok" not in st.session_state:
                 st.session_state["carga_masiva_ok"] = False
                 st.session_state["carga_masiva_file"] = True
@@ -550,7 +423,7 @@ if seccion == "Administrar inventario":
             [df_productos, pd.DataFrame([nueva])],
             ignore_index=True
         )
-        guardar_productos(df_productos)
+        guardar_productos_editados(df_productos, df_productos_base)
         st.success("✅ Producto registrado correctamente.")
 
     st.markdown("---")
@@ -658,12 +531,12 @@ if seccion == "Administrar inventario":
     # PROCESAR GUARDADO
     # =========================
     if guardar_cambios:
-        mask_target = (
-            df_productos["id_producto"] == fila_sel["id_producto"]
-        )
+        posicion = posiciones_productos(
+            df_productos, [fila_sel["id_producto"]]
+        )[str(fila_sel["id_producto"])]
 
         df_productos.loc[
-            mask_target,
+            df_productos.index[posicion],
             ["categoria", "nombre", "costo", "precio", "stock", "activa"],
         ] = [
             nueva_categoria,
@@ -673,7 +546,7 @@ if seccion == "Administrar inventario":
             int(nuevo_stock),
             nueva_activa,
         ]
-        guardar_productos(df_productos)
+        guardar_productos_editados(df_productos, df_productos_base)
         st.success("✅ Cambios guardados correctamente.")
     # ----------------------------------------
     # 3) Productos registrados y resumen de inventario
@@ -777,13 +650,12 @@ if seccion == "Administrar inventario":
         # ----------------------------------------
         # 💾 Descargar CSV
         # ----------------------------------------
-        csv_inv = df_filtrado.to_csv(index=False).encode("utf-8")
-
+        # El archivo se genera al hacer clic, no en cada tecla del buscador
         st.download_button(
             "💾 Descargar inventario en CSV",
-            csv_inv,
+            partial(exportar_csv, df_filtrado),
             file_name="inventario_productos.csv",
-            mime="text/csv",
+            mime=MIME_CSV,
         )
         # ============================
         # Totales por categoría
@@ -817,20 +689,21 @@ if seccion == "Administrar inventario":
         # ----------------------------------------
         # 📊 Gráfica profesional
         # ----------------------------------------
-        fig_inv_cat = px.bar(
+        fig_inv_cat = figura(
+            px.bar,
             resumen_cat,
             x="categoria",
             y="stock",
-            text="stock"
-        )
-        fig_inv_cat.update_traces(
-            texttemplate="%{text}",
-            textposition="outside"
-        )
-        fig_inv_cat.update_layout(
-            xaxis_title="Categoría",
-            yaxis_title="Cantidad en inventario",
-            template="plotly_white"
+            text="stock",
+            trazas=dict(
+                texttemplate="%{text}",
+                textposition="outside"
+            ),
+            diseno=dict(
+                xaxis_title="Categoría",
+                yaxis_title="Cantidad en inventario",
+                template="plotly_white"
+            ),
         )
         st.plotly_chart(fig_inv_cat, use_container_width=True)
         # ============================
@@ -852,7 +725,8 @@ if seccion == "Administrar inventario":
             + " - "
             + stock_sabor["nombre"]
         )
-        fig_sabor = px.bar(
+        fig_sabor = figura(
+            px.bar,
             stock_sabor,
             x="categoria_producto",
             y="stock",
@@ -867,8 +741,8 @@ if seccion == "Administrar inventario":
 # ----------------------------------------
 # Inicialización de estado
 # ----------------------------------------
-if "carrito" not in st.session_state:
-    st.session_state["carrito"] = []
+if not isinstance(st.session_state.get("carrito"), Carrito):
+    st.session_state["carrito"] = Carrito()
 
 if "input_reset_counter" not in st.session_state:
     st.session_state["input_reset_counter"] = 0
@@ -907,175 +781,212 @@ if seccion == "Registrar venta":
         st.markdown("### 1️⃣ Agregar productos al carrito")
 
         # ----------------------------------------
-        # Selección de categoría
+        # Entrada rápida (teclado o lector de código de barras)
         # ----------------------------------------
-        categorias_disponibles = sorted(
-            productos_activos["categoria"].unique().tolist()
-        )
+        # Enter en la caja agrega una pieza si el texto corresponde a un
+        # solo producto; si hay varios, se muestran para elegir
+        with st.form("entrada_rapida", clear_on_submit=True):
+            texto_rapido = st.text_input(
+                "Escanea o escribe ID, código de barras o nombre",
+                placeholder="p. ej. P-001, 7501234567890 o limon",
+            )
+            btn_rapido = st.form_submit_button("Agregar al carrito ⏎")
 
-        categoria_sel = st.radio(
-            "Categoría",
-            categorias_disponibles,
-            horizontal=True,
-        )
+        if btn_rapido and texto_rapido.strip():
+            encontrados = buscar_productos(texto_rapido)
+            st.session_state["resultados_rapidos"] = []
 
-        productos_cat = (
-            productos_activos[
-                productos_activos["categoria"] == categoria_sel
-            ]
-            .sort_values("nombre")
-            .copy()
-        )
-        if "cantidad" not in st.session_state:
-            st.session_state["cantidad"] = 1
+            if len(encontrados) == 1:
+                try:
+                    st.session_state["carrito"].agregar_del_catalogo(
+                        df_productos, encontrados[0]
+                    )
+                except StockInsuficiente as e:
+                    st.error(f"Sin stock. {e}")
+                else:
+                    st.success(f"Se agregó 1 x {encontrados[0]} al carrito.")
+            elif encontrados:
+                st.session_state["resultados_rapidos"] = encontrados
+            else:
+                st.warning(f"No se encontró ningún producto para «{texto_rapido}».")
+
+        resultados_rapidos = st.session_state.get("resultados_rapidos", [])
+        if resultados_rapidos:
+            st.caption("Varios productos coinciden; elige uno:")
+            posiciones = posiciones_productos(df_productos, resultados_rapidos)
+            for id_prod in resultados_rapidos:
+                if id_prod not in posiciones:
+                    continue
+                prod = df_productos.iloc[posiciones[id_prod]]
+                if st.button(
+                    f"{id_prod} | {prod['categoria']} - {prod['nombre']} "
+                    f"(${float(prod['precio']):,.2f})",
+                    key=f"rapido_{id_prod}",
+                ):
+                    try:
+                        st.session_state["carrito"].agregar_del_catalogo(
+                            df_productos, id_prod
+                        )
+                    except StockInsuficiente as e:
+                        st.error(f"Sin stock. {e}")
+                    else:
+                        st.session_state["resultados_rapidos"] = []
+                        st.rerun()
 
-        if "descuento_item" not in st.session_state:
-            st.session_state["descuento_item"] = 0.0
+        # Con catálogos grandes la lista por categoría es lenta de dibujar:
+        # se abre solo si se pide
+        usar_lista = st.toggle(
+            "Elegir de la lista por categoría",
+            value=len(productos_activos) <= MAX_PRODUCTOS_LISTA,
+        )
 
-        if "extra_item" not in st.session_state:
-            st.session_state["extra_item"] = 0.0        
-        if productos_cat.empty:
-            st.info("No hay productos activos en esta categoría.")
-        else:
-            st.markdown("#### Elige el producto")
+        if usar_lista:
+            # ----------------------------------------
+            # Selección de categoría
+            # ----------------------------------------
+            categorias_disponibles = sorted(
+                productos_activos["categoria"].unique().tolist()
+            )
 
-            producto_sel = st.radio(
-                "Producto",
-                productos_cat["nombre"].tolist(),
+            categoria_sel = st.radio(
+                "Categoría",
+                categorias_disponibles,
                 horizontal=True,
             )
 
-            fila = productos_cat[
-                productos_cat["nombre"] == producto_sel
-            ].iloc[0]
-
-            precio_unit = float(fila["precio"])
-            stock_original = int(fila["stock"])
-            id_producto = fila["id_producto"]
-
-            # Stock disponible considerando carrito
-            cantidad_en_carrito = sum(
-                item["cantidad"]
-                for item in st.session_state["carrito"]
-                if item["id_producto"] == id_producto
+            productos_cat = (
+                productos_activos[
+                    productos_activos["categoria"] == categoria_sel
+                ]
+                .sort_values("nombre")
+                .copy()
             )
+            if "cantidad" not in st.session_state:
+                st.session_state["cantidad"] = 1
 
-            stock_disp = max(stock_original - cantidad_en_carrito, 0)
+            if "descuento_item" not in st.session_state:
+                st.session_state["descuento_item"] = 0.0
 
-            col_info, col_cant = st.columns(2)
+            if "extra_item" not in st.session_state:
+                st.session_state["extra_item"] = 0.0        
+            if productos_cat.empty:
+                st.info("No hay productos activos en esta categoría.")
+            else:
+                st.markdown("#### Elige el producto")
 
-            with col_info:
-                st.info(
-                    f"ID: **{id_producto}**  \n"
-                    f"Categoría: **{fila['categoria']}**  \n"
-                    f"Precio unitario: **${precio_unit:,.2f}**  \n"
-                    f"Stock disponible: **{stock_disp}**"
+                producto_sel = st.radio(
+                    "Producto",
+                    productos_cat["nombre"].tolist(),
+                    horizontal=True,
                 )
 
-            with col_cant:
-                if stock_disp <= 0:
-                    st.error("No hay stock disponible.")
-                    cantidad = 0
-                    btn_agregar = st.button(
-                        "Agregar al carrito",
-                        disabled=True
-                    )
-                else:
-                    cantidad = st.number_input(
-                        "Cantidad a agregar al carrito",
-                        min_value=1,
-                        max_value=stock_disp,
-                        step=1,
-                        format="%d",
-                        key=f"cantidad_{st.session_state['input_reset_counter']}"
+                fila = productos_cat[
+                    productos_cat["nombre"] == producto_sel
+                ].iloc[0]
+
+                precio_unit = float(fila["precio"])
+                stock_original = int(fila["stock"])
+                id_producto = fila["id_producto"]
+
+                # Stock disponible considerando carrito
+                cantidad_en_carrito = st.session_state["carrito"].reservado(id_producto)
+
+                stock_disp = max(stock_original - cantidad_en_carrito, 0)
+
+                col_info, col_cant = st.columns(2)
+
+                with col_info:
+                    st.info(
+                        f"ID: **{id_producto}**  \n"
+                        f"Categoría: **{fila['categoria']}**  \n"
+                        f"Precio unitario: **${precio_unit:,.2f}**  \n"
+                        f"Stock disponible: **{stock_disp}**"
                     )
+
+                with col_cant:
+                    if stock_disp <= 0:
+                        st.error("No hay stock disponible.")
+                        cantidad = 0
+                        btn_agregar = st.button(
+                            "Agregar al carrito",
+                            disabled=True
+                        )
+                    else:
+                        cantidad = st.number_input(
+                            "Cantidad a agregar al carrito",
+                            min_value=1,
+                            max_value=stock_disp,
+                            step=1,
+                            format="%d",
+                            key=f"cantidad_{st.session_state['input_reset_counter']}"
+                        )
                     
-                    st.markdown("### Ajustes del producto")
+                        st.markdown("### Ajustes del producto")
                     
-                    descuento_item = st.number_input(
-                        "Descuento para este producto",
-                        min_value=0.0,
-                        max_value=precio_unit * cantidad,
-                        step=1.0,
-                        value=0.0,
-                        key=f"descuento_item_{st.session_state['input_reset_counter']}"
-                    )
+                        descuento_item = st.number_input(
+                            "Descuento para este producto",
+                            min_value=0.0,
+                            max_value=precio_unit * cantidad,
+                            step=1.0,
+                            value=0.0,
+                            key=f"descuento_item_{st.session_state['input_reset_counter']}"
+                        )
 
-                    extra_item = st.number_input(
-                        "Extra / Recargo para este producto",
-                        min_value=0.0,
-                        step=1.0,
-                        value=0.0,
-                        key=f"extra_item_{st.session_state['input_reset_counter']}"
-                    )
+                        extra_item = st.number_input(
+                            "Extra / Recargo para este producto",
+                            min_value=0.0,
+                            step=1.0,
+                            value=0.0,
+                            key=f"extra_item_{st.session_state['input_reset_counter']}"
+                        )
                     
-                    btn_agregar = st.button("Agregar al carrito")
+                        btn_agregar = st.button("Agregar al carrito")
 
-            if btn_agregar and cantidad > 0:
+                if btn_agregar and cantidad > 0:
                 
-                st.session_state["carrito"].append(
-                    {
-                        "id_producto": id_producto,
-                        "categoria": categoria_sel,
-                        "producto": producto_sel,
-                        "cantidad": int(cantidad),
-                        "precio": precio_unit,
-                        "descuento": descuento_item,
-                        "extra": extra_item,
-                    }
-                )
-                st.success(
-                    f"Se agregaron {cantidad} x {producto_sel} al carrito."
-                )
-                st.session_state["input_reset_counter"] += 1
-                st.rerun()
+                    st.session_state["carrito"].agregar(
+                        id_producto,
+                        producto_sel,
+                        categoria_sel,
+                        int(cantidad),
+                        precio_unit,
+                        descuento=descuento_item,
+                        extra=extra_item,
+                    )
+                    st.success(
+                        f"Se agregaron {cantidad} x {producto_sel} al carrito."
+                    )
+                    st.session_state["input_reset_counter"] += 1
+                    st.rerun()
         # ----------------------------------------
         # Carrito actual
         # ----------------------------------------
         st.markdown("---")
         st.markdown("### 2️⃣ Carrito actual")
 
-        if not st.session_state["carrito"]:
+        carrito = st.session_state["carrito"]
+
+        if not carrito:
             st.info("El carrito está vacío.")
         else:
-            df_carrito = pd.DataFrame(st.session_state["carrito"])
-            
-            df_carrito["subtotal"] = (
-                df_carrito["cantidad"] * df_carrito["precio"]
-                + df_carrito["extra"]
-                - df_carrito["descuento"]
-            )
-
-            df_carrito_mostrar = df_carrito[
-                [
-                    "id_producto",
-                    "categoria",
-                    "producto",
-                    "cantidad",
-                    "precio",
-                    "extra",
-                    "descuento",
-                    "subtotal",
-                ]
-            ]
-
+            # Una línea por producto; totales llevados por el carrito
             st.dataframe(
-                df_carrito_mostrar,
+                carrito.tabla(),
                 use_container_width=True
             )
 
-            total_bruto = float(df_carrito["subtotal"].sum())
+            total_bruto = carrito.total
             st.markdown("### 🗑 Eliminar producto del carrito")
 
-            for i, row in df_carrito.iterrows():
+            for row in carrito.lineas():
                 col1, col2 = st.columns([4,1])
 
                 with col1:
                     st.write(f"{row['producto']} x{row['cantidad']}")
 
                 with col2:
-                    if st.button("Eliminar", key=f"del_{i}"):
-                        st.session_state["carrito"].pop(i)
+                    if st.button("Eliminar", key=f"del_{row['id_producto']}"):
+                        carrito.quitar(row["id_producto"])
                         st.rerun()
 
             # ----------------------------------------
@@ -1113,116 +1024,108 @@ if seccion == "Registrar venta":
             )
 
             if btn_registrar:
-                df_prod_local = df_productos.copy()
-                error_stock = False
+                lineas = carrito.lineas()
+                faltantes = validar_stock(df_productos, lineas)
 
-                for _, item in df_carrito.iterrows():
-                    mask = (
-                        df_prod_local["id_producto"]
-                        == item["id_producto"]
+                for f in faltantes:
+                    st.error(
+                        f"Stock insuficiente para {f['producto']} "
+                        f"(disponible: {f['disponible']})."
                     )
 
-                    if not mask.any():
-                        st.error(
-                            f"No se encontró el producto "
-                            f"ID {item['id_producto']}."
+                if not faltantes:
+                    # Registrar ventas
+                    ahora = datetime.now()
+                    hora_str = ahora.strftime("%H:%M:%S")
+                    fecha_str = fecha_venta.isoformat()
+
+                    filas = []
+
+                    for item in lineas:
+                        filas.append(
+                            {
+                                "fecha": fecha_str,
+                                "hora": hora_str,
+                                "id_producto": item["id_producto"],
+                                "producto": item["producto"],
+                                "categoria": item["categoria"],
+                                "cantidad": int(item["cantidad"]),
+                                "precio": float(item["precio"]),
+                                "extra": float(item["extra"]),
+                                "descuento": float(item["descuento"]),
+                                "total": item["subtotal"],
+                                "metodo_pago": metodo_pago,
+                            }
                         )
-                        error_stock = True
-                        break
-
-                    idx = df_prod_local.index[mask][0]
-                    stock_actual = int(
-                        df_prod_local.loc[idx, "stock"]
-                    )
 
-                    if item["cantidad"] > stock_actual:
+                    # La venta queda en la bitácora local solo si nadie
+                    # movió esos productos desde que se validó; el stock
+                    # y las filas se suben a Sheets en segundo plano
+                    try:
+                        confirmar_venta(filas, df_productos, revisiones_vistas)
+                    except StockInsuficiente as e:
+                        st.error(f"Otra caja vendió primero. {e}")
+                    except ConflictoRevision:
                         st.error(
-                            f"Stock insuficiente para "
-                            f"{item['producto']}."
-                        )
-                        error_stock = True
-                        break
-
-                if not error_stock:
-                    # Descontar stock
-                    for _, item in df_carrito.iterrows():
-                        mask = (
-                            df_prod_local["id_producto"]
-                            == item["id_producto"]
+                            "El inventario cambió mientras se cobraba. "
+                            "Intenta de nuevo."
                         )
-                        idx = df_prod_local.index[mask][0]
-                        df_prod_local.loc[idx, "stock"] -= int(
-                            item["cantidad"]
-                        )
-
-                guardar_productos(df_prod_local)
-
-                # Registrar ventas
-                ahora = datetime.now()
-                hora_str = ahora.strftime("%H:%M:%S")
-                fecha_str = fecha_venta.isoformat()
-
-                filas = []
-
-                for _, item in df_carrito.iterrows():
-
-                    subtotal_item = (
-                        float(item["cantidad"]) * float(item["precio"])
-                        + float(item["extra"])
-                        - float(item["descuento"])
-                    )
-
-                    filas.append(
-                        {
+                    else:
+                        ticket_data = {
                             "fecha": fecha_str,
                             "hora": hora_str,
-                            "id_producto": item["id_producto"],
-                            "producto": item["producto"],
-                            "categoria": item["categoria"],
-                            "cantidad": int(item["cantidad"]),
-                            "precio": float(item["precio"]),
-                            "extra": float(item["extra"]),
-                            "descuento": float(item["descuento"]),
-                            "total": subtotal_item,
                             "metodo_pago": metodo_pago,
+                            "total_bruto": total_bruto,
+                            "descuento": descuento,
+                            "total": total_final,
+                            "items": lineas,
                         }
-                    )
 
-                df_ventas = pd.concat(
-                    [df_ventas, pd.DataFrame(filas)],
-                    ignore_index=True
-                )
-                guardar_ventas(df_ventas)
-
-                ticket_data = {
-                    "fecha": fecha_str,
-                    "hora": hora_str,
-                    "metodo_pago": metodo_pago,
-                    "total_bruto": total_bruto,
-                    "descuento": descuento,
-                    "total": total_final,
-                    "items": df_carrito_mostrar.to_dict(
-                        orient="records"
-                    ),
-                }
-
-                buffer_pdf = generar_ticket_pdf(ticket_data)
-
-                st.success(
-                    f"Venta registrada por ${total_final:,.2f}"
-                )
-                st.balloons()
+                        # El PDF se genera en otro hilo; la descarga lo espera
+                        if formato_ticket == FORMATO_PDF:
+                            ticket_pdf = generar_ticket_pdf_en_hilo(ticket_data)
 
-                st.download_button(
-                    "🧾 Descargar ticket en PDF",
-                    buffer_pdf,
-                    file_name=(
-                        f"ticket_{ahora.strftime('%Y%m%d_%H%M%S')}.pdf"
-                    ),
-                    mime="application/pdf",
-                )
-
-                st.session_state["carrito"] = []
+                        st.success(
+                            f"Venta registrada por ${total_final:,.2f}"
+                        )
+                        st.balloons()
+
+                        nombre_ticket = f"ticket_{ahora.strftime('%Y%m%d_%H%M%S')}"
+
+                        if formato_ticket == FORMATO_PDF:
+                            st.download_button(
+                                "🧾 Descargar ticket en PDF",
+                                data=ticket_pdf.result,
+                                file_name=f"{nombre_ticket}.pdf",
+                                mime="application/pdf",
+                            )
+                        else:
+                            columnas = COLUMNAS_TERMICA[formato_ticket]
+                            datos_ticket = ticket_escpos(ticket_data, columnas)
+                            st.code(
+                                texto_ticket(ticket_data, columnas),
+                                language=None,
+                            )
+
+                            if impresora_sel in impresoras_caja:
+                                try:
+                                    imprimir(
+                                        datos_ticket,
+                                        impresoras_caja[impresora_sel],
+                                    )
+                                except ErrorImpresion as e:
+                                    st.warning(f"No se pudo imprimir el ticket. {e}")
+                                else:
+                                    st.caption(f"🖨️ Ticket enviado a {impresora_sel}")
+
+                            st.download_button(
+                                "🧾 Descargar ticket para impresora térmica",
+                                datos_ticket,
+                                file_name=f"{nombre_ticket}.bin",
+                                mime="application/octet-stream",
+                            )
+
+                        carrito.vaciar()
 
 # ============================================
 # Sección: REPORTES
@@ -1230,14 +1133,23 @@ if seccion == "Registrar venta":
 elif seccion == "Reportes":
     st.subheader("📊 Reportes de ventas")
 
-    df_ventas = cargar_ventas()
+    df_ventas = cargar_ventas_al_dia()
 
     if df_ventas.empty:
         st.info("Aún no hay ventas registradas.")
     else:
-        tab_corte, tab_rango = st.tabs(
-            ["Corte del día", "Análisis por rango"]
-        )
+        # Los totales salen del resumen diario (analisis_rango), el
+        # detalle del corte se ubica por búsqueda binaria y las ventas de
+        # un rango se exportan desde el archivo por mes; ninguno recorre
+        # el historial completo
+        archivo = obtener_archivo()
+        archivo.espejar(df_ventas)
+
+        nombres_tabs = ["Corte del día", "Análisis por rango", "Horarios de venta"]
+        # La utilidad muestra costos: solo para administradores
+        if rol == "Administrador":
+            nombres_tabs.append("Utilidad")
+        tab_corte, tab_rango, tab_horas, *tab_utilidad = st.tabs(nombres_tabs)
 
         # =========================
         # 1) CORTE DEL DÍA
@@ -1251,9 +1163,64 @@ elif seccion == "Reportes":
             )
             fecha_sel_str = fecha_sel.isoformat()
 
-            df_dia = df_ventas[
-                df_ventas["fecha"] == fecha_sel_str
-            ]
+            # ----------------------------------------
+            # 🔒 Cierre de caja
+            # ----------------------------------------
+            cierres = obtener_cierres()
+            cierre = cierres.obtener(fecha_sel_str)
+
+            # Resultado del último clic en "Cerrar caja" (antes del rerun)
+            aviso_cierre = st.session_state.pop("aviso_cierre", None)
+            if aviso_cierre is not None:
+                tipo, mensaje = aviso_cierre
+                (st.success if tipo == "ok" else st.warning)(mensaje)
+
+            if cierre is None:
+                if fecha_sel <= dt.date.today() and st.button(
+                    "🔒 Cerrar caja de este día",
+                    help="Congela el corte del día; los cambios posteriores "
+                         "a sus ventas se marcarán como discrepancia.",
+                ):
+                    try:
+                        cierres.cerrar(df_ventas, fecha_sel_str)
+                        st.session_state["aviso_cierre"] = (
+                            "ok", f"Caja del {fecha_sel_str} cerrada."
+                        )
+                    except DiaYaCerrado as e:
+                        st.session_state["aviso_cierre"] = ("aviso", str(e))
+                    st.rerun()
+            else:
+                st.markdown(
+                    f"**🔒 Caja cerrada el {cierre['cerrado'].replace('T', ' ')}**"
+                )
+                col1, col2, col3 = st.columns(3)
+                col1.metric("Líneas al cierre", cierre["lineas"])
+                col2.metric("Artículos al cierre", f"{cierre['cantidad']:,.0f}")
+                col3.metric("Total al cierre", f"${cierre['total']:,.2f}")
+
+                # Se compara la huella del cierre con las ventas actuales
+                cambios = diferencias(
+                    cierre, corte_del_dia(df_ventas, fecha_sel_str)
+                )
+                if cambios:
+                    st.error(
+                        "⚠ Las ventas de este día cambiaron después del "
+                        "cierre de caja."
+                    )
+                    st.table(pd.DataFrame(cambios))
+
+            with st.expander("🔎 Revisar todos los cierres"):
+                if st.button("Revisar cierres", key="revisar_cierres"):
+                    discrepancias = cierres.revisar(df_ventas)
+                    if not discrepancias:
+                        st.success(
+                            f"{len(cierres.fechas())} cierre(s) sin cambios."
+                        )
+                    for fecha_cierre, cambios in discrepancias.items():
+                        st.error(f"⚠ {fecha_cierre}")
+                        st.table(pd.DataFrame(cambios))
+
+            df_dia = ventas_entre(df_ventas, fecha_sel_str, fecha_sel_str)
 
             if df_dia.empty:
                 st.warning(
@@ -1264,15 +1231,18 @@ elif seccion == "Reportes":
                     f"### Resumen del {fecha_sel_str}"
                 )
 
+                tablas_dia = analisis_rango(
+                    df_ventas, fecha_sel_str, fecha_sel_str
+                )
+
                 # Totales por método de pago
                 resumen_metodo = (
-                    df_dia
-                    .groupby("metodo_pago", as_index=False)
-                    .agg(
-                        total_venta=("total", "sum"),
-                        productos_vendidos=("cantidad", "sum"),
-                    )
-                    .sort_values("total_venta", ascending=False)
+                    tablas_dia["por_metodo"]
+                    .rename(columns={
+                        "total": "total_venta",
+                        "cantidad": "productos_vendidos",
+                    })
+                    [["metodo_pago", "total_venta", "productos_vendidos"]]
                 )
 
                 # Formato moneda
@@ -1285,16 +1255,14 @@ elif seccion == "Reportes":
                 # 🏆 Producto más vendido del día
                 # ----------------------------------------
 
-                if not df_dia.empty:
+                if not tablas_dia["por_producto"].empty:
 
                     producto_top = (
-                        df_dia
-                        .groupby(["id_producto", "producto", "categoria"], as_index=False)
-                        .agg(
-                            cantidad_vendida=("cantidad", "sum"),
-                            total_generado=("total", "sum"),
-                        )
-                        .sort_values("cantidad_vendida", ascending=False)
+                        tablas_dia["por_producto"]
+                        .rename(columns={
+                            "cantidad": "cantidad_vendida",
+                            "total": "total_generado",
+                        })
                         .iloc[0]
                     )
 
@@ -1343,17 +1311,23 @@ elif seccion == "Reportes":
                     use_container_width=True
                 )
 
-                csv_corte = (
-                    df_dia[columnas_orden]
-                    .to_csv(index=False)
-                    .encode("utf-8")
-                )
-
-                st.download_button(
+                col_csv, col_xlsx = st.columns(2)
+                col_csv.download_button(
                     label="💾 Descargar corte en CSV",
-                    data=csv_corte,
+                    data=partial(exportar_csv, df_dia, columnas_orden),
                     file_name=f"corte_{fecha_sel_str}.csv",
-                    mime="text/csv",
+                    mime=MIME_CSV,
+                )
+                col_xlsx.download_button(
+                    label="📗 Descargar corte en Excel",
+                    data=partial(exportar_xlsx, {
+                        "Ventas": df_dia[columnas_orden],
+                        "Por método de pago": tablas_dia["por_metodo"],
+                        "Por producto": tablas_dia["por_producto"],
+                        "Por categoría": tablas_dia["por_categoria"],
+                    }),
+                    file_name=f"corte_{fecha_sel_str}.xlsx",
+                    mime=MIME_XLSX,
                 )
                 # ----------------------------------------
                 # 📦 Grafica VENTAS por categoría (Cantidad)
@@ -1361,23 +1335,21 @@ elif seccion == "Reportes":
 
                 st.markdown("### 📦 Ventas por categoría (Cantidad)")
                 ventas_categoria = (
-                    df_dia
-                    .groupby("categoria", as_index=False)["cantidad"]
-                    .sum()
+                    tablas_dia["por_categoria"][["categoria", "cantidad"]]
                     .rename(columns={"cantidad": "cantidad_vendida"})
                     .sort_values("cantidad_vendida", ascending=False)
                 )
 
-                fig = px.bar(
+                fig = figura(
+                    px.bar,
                     ventas_categoria,
                     x="categoria",
                     y="cantidad_vendida",
                     text="cantidad_vendida",
-                )
-
-                fig.update_layout(
-                    xaxis_title="Categoría",
-                    yaxis_title="Cantidad vendida",
+                    diseno=dict(
+                        xaxis_title="Categoría",
+                        yaxis_title="Cantidad vendida",
+                    ),
                 )
 
                 st.plotly_chart(fig, use_container_width=True)
@@ -1390,33 +1362,29 @@ elif seccion == "Reportes":
                 # ----------------------------------------
 
                 ingresos_categoria = (
-                    df_dia
-                    .groupby("categoria", as_index=False)["total"]
-                    .sum()
+                    tablas_dia["por_categoria"][["categoria", "total"]]
                     .rename(columns={"total": "ingresos"})
-                    .sort_values("ingresos", ascending=False)
                 )
                 st.markdown("### 📦 Ingresos por categoría ($)")
                 
-                fig_ing = px.bar(
+                fig_ing = figura(
+                    px.bar,
                     ingresos_categoria,
                     x="categoria",
                     y="ingresos",
                     text="ingresos",
-                )
-
-                # Formato de texto encima de barras
-                fig_ing.update_traces(
-                    texttemplate="$%{text:,.2f}",
-                    textposition="outside"
-                )
-
-                # Formato de eje Y como moneda
-                fig_ing.update_layout(
-                    xaxis_title="Categoría",
-                    yaxis_title="Ingresos ($ MXN)",
-                    yaxis_tickprefix="$",
-                    yaxis_tickformat=",.2f"
+                    # Formato de texto encima de barras
+                    trazas=dict(
+                        texttemplate="$%{text:,.2f}",
+                        textposition="outside"
+                    ),
+                    # Formato de eje Y como moneda
+                    diseno=dict(
+                        xaxis_title="Categoría",
+                        yaxis_title="Ingresos ($ MXN)",
+                        yaxis_tickprefix="$",
+                        yaxis_tickformat=",.2f"
+                    ),
                 )
 
                 st.plotly_chart(fig_ing, use_container_width=True)
@@ -1454,10 +1422,10 @@ elif seccion == "Reportes":
                 f_ini = fecha_ini.isoformat()
                 f_fin = fecha_fin.isoformat()
 
-                df_rango = df_ventas[
-                    (df_ventas["fecha"] >= f_ini) &
-                    (df_ventas["fecha"] <= f_fin)
-                ].copy()
+                # Todas las tablas del rango en una sola pasada (y en
+                # caché mientras no cambien las ventas)
+                tablas_rango = analisis_rango(df_ventas, f_ini, f_fin)
+                df_rango = tablas_rango["por_producto"]
 
                 if df_rango.empty:
                     st.warning(
@@ -1469,13 +1437,12 @@ elif seccion == "Reportes":
                     )
                     ######
                     resumen_metodo = (
-                    df_rango
-                    .groupby("metodo_pago", as_index=False)
-                    .agg(
-                        total_venta=("total", "sum"),
-                        productos_vendidos=("cantidad", "sum"),
-                    )
-                    .sort_values("total_venta", ascending=False)
+                    tablas_rango["por_metodo"]
+                    .rename(columns={
+                        "total": "total_venta",
+                        "cantidad": "productos_vendidos",
+                    })
+                    [["metodo_pago", "total_venta", "productos_vendidos"]]
                 )
 
                 # Formato moneda
@@ -1493,12 +1460,10 @@ elif seccion == "Reportes":
 
                     producto_top = (
                         df_rango
-                        .groupby(["id_producto", "producto", "categoria"], as_index=False)
-                        .agg(
-                            cantidad_vendida=("cantidad", "sum"),
-                            total_generado=("total", "sum"),
-                        )
-                        .sort_values("cantidad_vendida", ascending=False)
+                        .rename(columns={
+                            "cantidad": "cantidad_vendida",
+                            "total": "total_generado",
+                        })
                         .iloc[0]
                     )
 
@@ -1522,28 +1487,16 @@ elif seccion == "Reportes":
                         f"${producto_top['total_generado']:,.2f}"
                     )
                         ##########
-                    # Columna combinada
-                    df_rango["categoria_producto"] = (
-                        df_rango["categoria"]
-                        + " - "
-                        + df_rango["producto"]
-                    )
-
                     # 2.1 Cantidad vendida
                     st.markdown(
                         "#### 🟦 Cantidad de artículos vendidos"
                     )
-                    ventas_cant = (
-                        df_rango
-                        .groupby(
-                            ["id_producto", "categoria_producto"],
-                            as_index=False
-                        )["cantidad"]
-                        .sum()
-                        .sort_values("cantidad", ascending=False)
-                    )
+                    ventas_cant = df_rango[
+                        ["id_producto", "categoria_producto", "cantidad"]
+                    ]
 
-                    fig_cant = px.bar(
+                    fig_cant = figura(
+                        px.bar,
                         ventas_cant,
                         x="categoria_producto",
                         y="cantidad",
@@ -1563,16 +1516,12 @@ elif seccion == "Reportes":
                         "#### 🟩 Ventas en $ por producto"
                     )
                     ventas_total = (
-                        df_rango
-                        .groupby(
-                            ["id_producto", "categoria_producto"],
-                            as_index=False
-                        )["total"]
-                        .sum()
+                        df_rango[["id_producto", "categoria_producto", "total"]]
                         .sort_values("total", ascending=False)
                     )
 
-                    fig_total = px.bar(
+                    fig_total = figura(
+                        px.bar,
                         ventas_total,
                         x="categoria_producto",
                         y="total",
@@ -1591,16 +1540,10 @@ elif seccion == "Reportes":
                     st.markdown(
                         "#### 🟣 Distribución por método de pago"
                     )
-                    ventas_pago = (
-                        df_rango
-                        .groupby(
-                            "metodo_pago",
-                            as_index=False
-                        )["total"]
-                        .sum()
-                    )
+                    ventas_pago = tablas_rango["por_metodo"]
 
-                    fig_pago = px.pie(
+                    fig_pago = figura(
+                        px.pie,
                         ventas_pago,
                         names="metodo_pago",
                         values="total",
@@ -1615,17 +1558,10 @@ elif seccion == "Reportes":
                     st.markdown(
                         "#### 🟠 Ventas por categoría"
                     )
-                    ventas_cat = (
-                        df_rango
-                        .groupby(
-                            "categoria",
-                            as_index=False
-                        )["total"]
-                        .sum()
-                        .sort_values("total", ascending=False)
-                    )
+                    ventas_cat = tablas_rango["por_categoria"]
 
-                    fig_cat = px.bar(
+                    fig_cat = figura(
+                        px.bar,
                         ventas_cat,
                         x="categoria",
                         y="total",
@@ -1644,17 +1580,10 @@ elif seccion == "Reportes":
                     st.markdown(
                         "#### 📅 Total vendido por día ($)"
                     )
-                    ventas_dia_total = (
-                        df_rango
-                        .groupby(
-                            "fecha",
-                            as_index=False
-                        )["total"]
-                        .sum()
-                        .sort_values("fecha")
-                    )
+                    ventas_dia_total = tablas_rango["por_dia"]
 
-                    fig_dia_total = px.bar(
+                    fig_dia_total = figura(
+                        px.bar,
                         ventas_dia_total,
                         x="fecha",
                         y="total",
@@ -1673,17 +1602,10 @@ elif seccion == "Reportes":
                     st.markdown(
                         "#### 📦 Cantidad de productos vendidos por día"
                     )
-                    ventas_dia_cant = (
-                        df_rango
-                        .groupby(
-                            "fecha",
-                            as_index=False
-                        )["cantidad"]
-                        .sum()
-                        .sort_values("fecha")
-                    )
+                    ventas_dia_cant = tablas_rango["por_dia"]
 
-                    fig_dia_cant = px.bar(
+                    fig_dia_cant = figura(
+                        px.bar,
                         ventas_dia_cant,
                         x="fecha",
                         y="cantidad",
@@ -1697,21 +1619,346 @@ elif seccion == "Reportes":
                         fig_dia_cant,
                         use_container_width=True
                     )
+
+                    # 2.7 Clasificación ABC
+                    st.markdown(
+                        "#### 🅰️ Clasificación ABC (Pareto)"
+                    )
+                    abc = clasificacion_abc(df_rango)
+
+                    col_a, col_b, col_c = st.columns(3)
+                    for col, clase in zip((col_a, col_b, col_c), "ABC"):
+                        de_clase = abc[abc["clase"] == clase]
+                        col.metric(
+                            f"Clase {clase}",
+                            f"{len(de_clase)} productos",
+                            f"{de_clase['participacion'].sum():.0%} de las ventas",
+                            delta_color="off",
+                        )
+
+                    n_top = st.slider(
+                        "Productos a mostrar",
+                        min_value=5,
+                        max_value=50,
+                        value=15,
+                        key="abc_top",
+                    )
+                    abc_top = top_con_otros(abc, n_top)
+
+                    fig_abc = figura(
+                        px.bar,
+                        abc_top,
+                        x="categoria_producto",
+                        y="total",
+                        color="clase",
+                        title="Ventas por producto y clase",
+                        labels={
+                            "categoria_producto": "Producto",
+                            "total": "Ventas ($)",
+                            "clase": "Clase",
+                        },
+                        category_orders={
+                            "categoria_producto": list(abc_top["categoria_producto"]),
+                        },
+                    )
+                    st.plotly_chart(fig_abc, use_container_width=True)
+
+                    st.dataframe(
+                        abc_top[[
+                            "categoria_producto", "cantidad", "total",
+                            "participacion", "acumulada", "clase",
+                        ]].style.format({
+                            "total": "${:,.2f}",
+                            "participacion": "{:.1%}",
+                            "acumulada": "{:.1%}",
+                        }, na_rep="").hide(axis="index"),
+                        use_container_width=True,
+                    )
+
+                    with st.expander("🏅 Más vendidos de todo el historial"):
+                        # Conteo que se actualiza con cada cobro; no
+                        # depende del rango ni recorre el historial
+                        destacados, exacto = productos_destacados(df_ventas, n_top)
+                        if not exacto:
+                            st.caption(
+                                "Cifras aproximadas: hay más productos de los "
+                                "que se vigilan. «error» es lo que el total "
+                                "puede tener de más."
+                            )
+                        st.dataframe(
+                            destacados[
+                                ["categoria_producto", "cantidad", "total"]
+                                + ([] if exacto else ["error"])
+                            ].style.format({
+                                "total": "${:,.2f}",
+                                "error": "${:,.2f}",
+                            }).hide(axis="index"),
+                            use_container_width=True,
+                        )
+
+                    # 2.8 Exportar
+                    st.markdown(
+                        "#### 💾 Exportar el rango"
+                    )
+                    # Las líneas de venta se leen del archivo al hacer
+                    # clic: solo los meses y columnas del rango
+                    hojas_rango = {
+                        "Ventas": partial(archivo.consultar, f_ini, f_fin),
+                        "Por producto": df_rango,
+                        "Por método de pago": tablas_rango["por_metodo"],
+                        "Por categoría": tablas_rango["por_categoria"],
+                        "Por día": tablas_rango["por_dia"],
+                    }
+                    contenido_csv = st.selectbox(
+                        "Contenido del CSV",
+                        list(hojas_rango),
+                        key="rango_contenido_csv",
+                    )
+
+                    # Se escriben por lotes al hacer clic, en otro hilo
+                    col_csv, col_xlsx = st.columns(2)
+                    col_csv.download_button(
+                        "💾 Descargar CSV",
+                        partial(exportar_csv, hojas_rango[contenido_csv]),
+                        file_name=(
+                            f"ventas_{f_ini}_{f_fin}_"
+                            f"{contenido_csv.lower().replace(' ', '_')}.csv"
+                        ),
+                        mime=MIME_CSV,
+                    )
+                    col_xlsx.download_button(
+                        "📗 Descargar Excel (todas las hojas)",
+                        partial(exportar_xlsx, hojas_rango),
+                        file_name=f"ventas_{f_ini}_{f_fin}.xlsx",
+                        mime=MIME_XLSX,
+                    )
+
+        # =========================
+        # 3) HORARIOS DE VENTA
+        # =========================
+        with tab_horas:
+            st.markdown("### 🕒 Horarios de venta")
+
+            col_h1, col_h2 = st.columns(2)
+            with col_h1:
+                horas_ini = st.date_input(
+                    "Desde",
+                    dt.date.today() - dt.timedelta(days=364),
+                    key="horas_ini",
+                )
+            with col_h2:
+                horas_fin = st.date_input(
+                    "Hasta",
+                    dt.date.today(),
+                    key="horas_fin",
+                )
+
+            col_h3, col_h4 = st.columns(2)
+            with col_h3:
+                categorias_horas = ["Todas"] + sorted(
+                    df_ventas["categoria"].dropna().astype(str).unique()
+                )
+                categoria_horas = st.selectbox(
+                    "Categoría",
+                    categorias_horas,
+                    key="horas_categoria",
+                )
+            with col_h4:
+                medida_horas = st.radio(
+                    "Mostrar",
+                    ["Unidades", "Ventas ($)"],
+                    horizontal=True,
+                    key="horas_medida",
+                )
+
+            if horas_ini > horas_fin:
+                st.error(
+                    "La fecha inicial no puede ser mayor que la final."
+                )
+            else:
+                # Sale de la tabla por hora que se actualiza con cada
+                # cobro; no se vuelve a leer la hora de cada venta
+                demanda = demanda_por_hora(
+                    df_ventas,
+                    horas_ini.isoformat(),
+                    horas_fin.isoformat(),
+                    None if categoria_horas == "Todas" else categoria_horas,
+                )
+                columna = "cantidad" if medida_horas == "Unidades" else "total"
+
+                if demanda["cantidad"].sum() == 0:
+                    st.warning(
+                        "No hay ventas en el rango seleccionado."
+                    )
+                else:
+                    # Solo las horas en que el negocio tuvo ventas
+                    con_ventas = demanda.loc[demanda["cantidad"] > 0, "hora"]
+                    mapa = (
+                        demanda
+                        .pivot(index="hora", columns="dia_semana", values=columna)
+                        .loc[con_ventas.min():con_ventas.max()]
+                    )
+                    mapa.columns = DIAS_SEMANA
+                    mapa.index = [f"{h:02d}:00" for h in mapa.index]
+
+                    fig_horas = figura(
+                        px.imshow,
+                        mapa,
+                        aspect="auto",
+                        text_auto=True if columna == "cantidad" else ".0f",
+                        color_continuous_scale="YlOrRd",
+                        labels={
+                            "x": "Día",
+                            "y": "Hora",
+                            "color": medida_horas,
+                        },
+                        title=f"{medida_horas} por hora y día de la semana",
+                    )
+                    st.plotly_chart(fig_horas, use_container_width=True)
+
+                    pico = demanda.loc[demanda[columna].idxmax()]
+                    por_dia = demanda.groupby("dia_semana")[columna].sum()
+                    por_hora = demanda.groupby("hora")[columna].sum()
+
+                    col1, col2, col3 = st.columns(3)
+                    col1.metric(
+                        "Hora pico",
+                        f"{DIAS_SEMANA[int(pico['dia_semana'])]} "
+                        f"{int(pico['hora']):02d}:00"
+                    )
+                    col2.metric(
+                        "Día más fuerte",
+                        DIAS_SEMANA[int(por_dia.idxmax())]
+                    )
+                    col3.metric(
+                        "Hora más fuerte",
+                        f"{int(por_hora.idxmax()):02d}:00"
+                    )
+
+        # =========================
+        # 4) UTILIDAD
+        # =========================
+        if tab_utilidad:
+            with tab_utilidad[0]:
+                st.markdown("### 💹 Utilidad bruta")
+
+                col_u1, col_u2 = st.columns(2)
+                with col_u1:
+                    utilidad_ini = st.date_input(
+                        "Desde",
+                        dt.date.today().replace(day=1),
+                        key="utilidad_ini",
+                    )
+                with col_u2:
+                    utilidad_fin = st.date_input(
+                        "Hasta",
+                        dt.date.today(),
+                        key="utilidad_fin",
+                    )
+
+                if utilidad_ini > utilidad_fin:
+                    st.error(
+                        "La fecha inicial no puede ser mayor que la final."
+                    )
+                else:
+                    # Con el costo guardado en cada venta al cobrarla, no con
+                    # el costo actual del catálogo
+                    margen = analisis_margen(
+                        df_ventas,
+                        utilidad_ini.isoformat(),
+                        utilidad_fin.isoformat(),
+                    )
+                    totales = margen["por_metodo"]
+
+                    if totales.empty:
+                        st.warning(
+                            "No hay ventas en el rango seleccionado."
+                        )
+                    else:
+                        ventas_con_costo = totales["total"].sum() - totales["sin_costo"].sum()
+                        utilidad_total = totales["utilidad"].sum()
+
+                        col1, col2, col3, col4 = st.columns(4)
+                        col1.metric("Ventas con costo", f"${ventas_con_costo:,.2f}")
+                        col2.metric("Costo de lo vendido", f"${totales['costo'].sum():,.2f}")
+                        col3.metric("Utilidad bruta", f"${utilidad_total:,.2f}")
+                        col4.metric(
+                            "Margen",
+                            f"{utilidad_total / ventas_con_costo:.1%}"
+                            if ventas_con_costo else "—",
+                        )
+
+                        if totales["sin_costo"].sum() > 0:
+                            st.caption(
+                                f"${totales['sin_costo'].sum():,.2f} en ventas sin "
+                                "costo registrado (cobradas antes de que se "
+                                "guardara) no entran en la utilidad."
+                            )
+
+                        vistas = {
+                            "Producto": ("por_producto", "categoria_producto"),
+                            "Categoría": ("por_categoria", "categoria"),
+                            "Día": ("por_dia", "fecha"),
+                            "Método de pago": ("por_metodo", "metodo_pago"),
+                        }
+                        vista = st.radio(
+                            "Ver por",
+                            list(vistas),
+                            horizontal=True,
+                            key="utilidad_vista",
+                        )
+                        tabla, eje = vistas[vista]
+                        df_margen = margen[tabla]
+
+                        fig_utilidad = figura(
+                            px.bar,
+                            df_margen,
+                            x=eje,
+                            y="utilidad",
+                            title=f"Utilidad bruta por {vista.lower()}",
+                            labels={eje: vista, "utilidad": "Utilidad ($)"},
+                        )
+                        st.plotly_chart(fig_utilidad, use_container_width=True)
+
+                        st.dataframe(
+                            df_margen[[
+                                eje, "cantidad", "total", "costo",
+                                "utilidad", "margen", "sin_costo",
+                            ]].style.format({
+                                "total": "${:,.2f}",
+                                "costo": "${:,.2f}",
+                                "utilidad": "${:,.2f}",
+                                "margen": "{:.1%}",
+                                "sin_costo": "${:,.2f}",
+                            }, na_rep="—").hide(axis="index"),
+                            use_container_width=True,
+                        )
 ###---Seccion eliminar venta--- ####
 elif seccion == "Eliminar venta":
 
     st.subheader("🗑️ Eliminar venta registrada")
 
+    # Solo ventas ya guardadas en el almacén (el índice es su posición)
     df_ventas = cargar_ventas()
 
+    if estado_sync["pendientes"]:
+        st.info(
+            "Las ventas pendientes de sincronizar aparecerán aquí "
+            "cuando lleguen a Sheets."
+        )
+
     if df_ventas.empty:
         st.info("No hay ventas registradas.")
 
     else:
-        # 🔹 Resetear índice para usar selectbox
-        df_ventas_reset = df_ventas.reset_index(drop=True)
+        # 🔹 En orden cronológico; el índice es la posición de cada venta
+        # en el almacén y es lo que recibe eliminar_venta
+        df_ventas_reset = df_ventas
 
-        st.dataframe(df_ventas_reset, use_container_width=True)
+        st.dataframe(
+            df_ventas_reset.drop(columns=["momento"]),
+            use_container_width=True
+        )
 
         opcion = st.selectbox(
             "Selecciona la venta a eliminar",
@@ -1722,6 +1969,13 @@ elif seccion == "Eliminar venta":
                 f"${df_ventas_reset.loc[x,'total']}"
             )
         )
+        fecha_venta = str(df_ventas_reset.loc[opcion, "fecha"])
+        if obtener_cierres().obtener(fecha_venta) is not None:
+            st.warning(
+                f"🔒 La caja del {fecha_venta} ya está cerrada: eliminar "
+                "esta venta dejará una discrepancia en su cierre."
+            )
+
         if st.button("Eliminar venta seleccionada"):
 
             # 🔹 Obtener datos de la venta seleccionada
@@ -1730,28 +1984,24 @@ elif seccion == "Eliminar venta":
             id_producto = venta_sel["id_producto"]
             cantidad_devuelta = int(venta_sel["cantidad"])
 
-            # 🔹 Cargar productos actuales
-            df_productos = cargar_productos()
+            # 🔹 Eliminar venta del almacén y del resumen diario
+            eliminar_venta(int(opcion))
+            restar_venta(
+                df_ventas_reset,
+                df_ventas_reset.index.get_loc(opcion)
+            )
 
             # 🔹 Buscar producto en inventario
-            mask = df_productos["id_producto"] == id_producto
-
-            if mask.any():
-                idx = df_productos.index[mask][0]
-
-                # 🔥 Devolver stock
-                df_productos.loc[idx, "stock"] += cantidad_devuelta
-
-                # Guardar inventario actualizado
-                guardar_productos(df_productos)
+            if posiciones_productos(df_productos, [id_producto]):
+                # 🔥 Devolver stock (se replica como las ventas)
+                obtener_bitacora().registrar_devolucion(
+                    id_producto,
+                    cantidad_devuelta
+                )
 
             else:
                 st.warning("No se encontró el producto en inventario.")
 
-            # 🔹 Eliminar venta del Sheet
-            fila_sheet = int(opcion) + 2  # encabezado + base 1
-            eliminar_venta_sheet(fila_sheet)
-
             st.success("Venta eliminada y stock actualizado correctamente.")
             st.rerun()
 
@@ -0,0 +1,711 @@
+import csv
+import os
+import sqlite3
+import threading
+import time
+
+import streamlit as st
+import numpy as np
+import pandas as pd
+import gspread
+from gspread.utils import rowcol_to_a1
+from oauth2client.service_account import ServiceAccountCredentials
+
+from pos_sheets import ClienteSheets
+
+# ============================================
+# Configuración
+# ============================================
+
+URL_HOJA_PREDETERMINADA = (
+    "https://docs.google.com/spreadsheets/d/1gBNATNp8eYb2m0kPoInfbkuQHmjIVdD21x2LNxnOlbk/edit"
+)
+
+def config_almacen(clave, defecto=None):
+    """
+    Lee una opción de almacenamiento: primero la variable de entorno
+    PALETERIA_<CLAVE> y, si no existe, la sección [almacen] de
+    st.secrets.
+    """
+    valor = os.environ.get(f"PALETERIA_{clave.upper()}")
+    if valor is not None:
+        return valor
+
+    try:
+        return st.secrets["almacen"][clave]
+    except Exception:
+        return defecto
+
+# ============================================
+# Conexión a Google Sheets
+# ============================================
+
+@st.cache_resource
+def conectar_sheets():
+    scope = [
+        "https://spreadsheets.google.com/feeds",
+        "https://www.googleapis.com/auth/drive"
+    ]
+
+    st.write(st.secrets["gcp_service_account"]["client_email"])
+
+    creds = ServiceAccountCredentials.from_json_keyfile_dict(
+        st.secrets["gcp_service_account"],
+        scope
+    )
+
+    client = gspread.authorize(creds)
+    return client.open_by_url(
+        config_almacen("url_hoja", URL_HOJA_PREDETERMINADA)
+    )
+
+COLUMNAS_VENTAS = [
+    "fecha",
+    "hora",
+    "id_producto",
+    "producto",
+    "categoria",
+    "cantidad",
+    "precio",
+    "descuento",
+    "extra",
+    "total",
+    "metodo_pago",
+    # Costo unitario del producto al momento de la venta (vacío en
+    # ventas registradas antes de que se guardara)
+    "costo",
+]
+
+# ============================================
+# Normalización común
+# ============================================
+
+def normalizar_productos(df):
+    """
+    Limpia nombres de columnas, agrega las que falten y convierte tipos
+    del catálogo, venga de donde venga.
+    """
+    df = df.copy()
+
+    # Limpiar nombres de columnas
+    df.columns = df.columns.astype(str).str.strip().str.lower()
+
+    # --- Crear columnas si no existen ---
+    if "nombre" not in df.columns:
+        df["nombre"] = ""
+
+    if "categoria" not in df.columns:
+        df["categoria"] = ""
+
+    if "precio" not in df.columns:
+        df["precio"] = 0.0
+
+    if "costo" not in df.columns:
+        df["costo"] = 0.0
+
+    if "stock" not in df.columns:
+        df["stock"] = 0
+
+    if "stock_minimo" not in df.columns:
+        df["stock_minimo"] = 5
+
+    if "activa" not in df.columns:
+        df["activa"] = True
+
+# --- Convertir tipos ---
+    df["precio"] = pd.to_numeric(df["precio"], errors="coerce").fillna(0.0)
+    df["costo"] = pd.to_numeric(df["costo"], errors="coerce").fillna(0.0)
+    df["stock"] = pd.to_numeric(df["stock"], errors="coerce").fillna(0).astype(int)
+    df["stock_minimo"] = pd.to_numeric(df["stock_minimo"], errors="coerce").fillna(5).astype(int)
+
+    df["activa"] = (
+        df["activa"]
+        .astype(str)
+        .str.lower()
+        .isin(["si", "true", "1"])
+    )
+
+    return df
+
+def _momentos(fechas, horas=None):
+    """
+    fecha + hora como datetime64. Una hora capturada a mano sin segundos
+    ("9:05") se lee como HH:MM; si la hora no se entiende, la venta
+    queda a las 00:00 de su fecha para que no desaparezca de los cortes
+    por fecha ni rompa el orden.
+    """
+    fechas = fechas.astype(str).str.strip()
+    momentos = pd.Series(pd.NaT, index=fechas.index, dtype="datetime64[us]")
+
+    if horas is not None:
+        texto = fechas + " " + horas.astype(str).str.strip()
+        for formato in ["%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M"]:
+            faltan = momentos.isna()
+            if not faltan.any():
+                return momentos
+            momentos[faltan] = pd.to_datetime(
+                texto[faltan], format=formato, errors="coerce"
+            )
+
+    faltan = momentos.isna()
+    if faltan.any():
+        momentos[faltan] = pd.to_datetime(
+            fechas[faltan], format="%Y-%m-%d", errors="coerce"
+        )
+    return momentos
+
+def normalizar_ventas(df):
+    """
+    Convierte tipos numéricos del historial de ventas y agrega "momento"
+    (fecha + hora como datetime64). El resultado queda ordenado por
+    momento; el índice conserva la posición de cada venta en el almacén.
+    """
+    if df.empty:
+        return pd.DataFrame(columns=COLUMNAS_VENTAS + ["momento"]).astype(
+            {"momento": "datetime64[us]"}
+        )
+
+    df = df.copy()
+
+    # Tipos numéricos
+    for col in ["cantidad", "precio", "total", "descuento", "extra"]:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0.0)
+
+    # Sin costo registrado queda NaN (no 0): esa venta no entra al margen
+    if "costo" in df.columns:
+        df["costo"] = pd.to_numeric(df["costo"], errors="coerce")
+    else:
+        df["costo"] = np.nan
+
+    # Marca de tiempo única para rebanar por fecha con búsqueda binaria.
+    # Las ventas llegan casi siempre en orden, así que ordenar es raro.
+    if "fecha" in df.columns and "hora" in df.columns:
+        df["momento"] = _momentos(df["fecha"], df["hora"])
+    elif "fecha" in df.columns:
+        df["momento"] = _momentos(df["fecha"])
+    else:
+        df["momento"] = pd.NaT
+    if not df["momento"].is_monotonic_increasing:
+        df = df.sort_values("momento", kind="stable")
+
+    return df
+
+def _valor_celda(valor):
+    """
+    Convierte un valor de pandas/numpy a algo serializable para Sheets.
+    """
+    if hasattr(valor, "item"):
+        valor = valor.item()
+    if valor is None or (isinstance(valor, float) and valor != valor):
+        return ""
+    return valor
+
+def _ajustar_fila(fila, n):
+    """
+    Rellena o recorta una fila leída de Sheets a n columnas.
+    """
+    fila = list(fila[:n])
+    return fila + [""] * (n - len(fila))
+
+def _columnas_de(filas):
+    columnas = []
+    for fila in filas:
+        for col in fila:
+            if col not in columnas:
+                columnas.append(col)
+    return columnas
+
+# ============================================
+# Interfaz de almacenamiento
+# ============================================
+
+class Almacen:
+    """
+    Interfaz común de persistencia para el catálogo ("productos") y el
+    historial ("ventas"). Las lecturas devuelven DataFrames sin
+    normalizar; pos_datos se encarga de tipos, caché y versiones.
+    """
+
+    nombre = ""
+
+    # Sube cuando leer_ventas relee el historial completo y encuentra
+    # filas distintas a las que tenía (p. ej. editadas a mano en medio de
+    # la hoja); los resúmenes incrementales se recalculan cuando cambia.
+    generacion_ventas = 0
+
+    def leer_productos(self):
+        raise NotImplementedError
+
+    def productos_leidos(self, df):
+        """
+        Se llama con el catálogo ya normalizado después de cada lectura.
+        """
+
+    def escribir_productos(self, df):
+        raise NotImplementedError
+
+    def leer_ventas(self):
+        raise NotImplementedError
+
+    def escribir_ventas(self, df):
+        """
+        Reescribe el historial completo.
+        """
+        raise NotImplementedError
+
+    def agregar_ventas(self, filas, df_ventas=None):
+        """
+        Agrega las filas de un ticket al final del historial. Si el
+        formato guardado no admite las columnas del ticket, reescribe el
+        historial completo con df_ventas (o lo leído) más las filas.
+        """
+        raise NotImplementedError
+
+    def eliminar_venta(self, posicion):
+        """
+        Elimina la venta en la posición dada (base 0, orden de registro).
+        """
+        raise NotImplementedError
+
+    def uso_api(self):
+        """
+        Uso de la API remota en el último minuto, o None si el almacén es
+        local.
+        """
+        return None
+
+    def _agregar_con_reescritura(self, filas, df_ventas):
+        if df_ventas is None:
+            df_ventas = self.leer_ventas()
+
+        df = pd.concat(
+            [df_ventas, pd.DataFrame(filas)],
+            ignore_index=True
+        )
+        self.escribir_ventas(df)
+
+# ============================================
+# Google Sheets
+# ============================================
+
+def _reescribir_hoja(hoja, df):
+    """
+    Reescribe una hoja completa sin dejarla vacía en ningún momento:
+    primero escribe los datos nuevos y después limpia solo las filas
+    sobrantes al final.
+    """
+    df = df.fillna("")
+
+    datos = [df.columns.tolist()] + df.values.tolist()
+
+    hoja.update(range_name="A1", values=datos)
+
+    # Rango abierto hasta el final de la hoja: no depende de row_count,
+    # que puede estar desactualizado si la hoja creció con append_rows
+    ultima_col = rowcol_to_a1(1, max(hoja.col_count, len(datos[0]))).rstrip("0123456789")
+    hoja.batch_clear([f"A{len(datos) + 1}:{ultima_col}"])
+
+def _matriz_hoja(df):
+    """
+    Convierte un DataFrame en la matriz (encabezado, filas) tal como se
+    escribe en Sheets.
+    """
+    df = df.fillna("")
+    encabezado = [str(c) for c in df.columns]
+    filas = [
+        [_valor_celda(v) for v in fila]
+        for fila in df.values.tolist()
+    ]
+    return encabezado, filas
+
+def _rangos_modificados(anteriores, nuevas):
+    """
+    Compara dos matrices fila por fila y devuelve la lista de rangos para
+    batch_update: por cada fila modificada, el tramo de columnas entre la
+    primera y la última celda distinta, más un solo rango con las filas
+    agregadas al final. Los índices de fila asumen encabezado en la fila 1.
+    """
+    rangos = []
+
+    for i, (vieja, nueva) in enumerate(zip(anteriores, nuevas)):
+        distintas = [
+            j for j, (a, b) in enumerate(zip(vieja, nueva))
+            if a != b
+        ]
+        if not distintas:
+            continue
+
+        fila = i + 2
+        c_ini, c_fin = distintas[0], distintas[-1]
+        rangos.append({
+            "range": (
+                f"{rowcol_to_a1(fila, c_ini + 1)}:"
+                f"{rowcol_to_a1(fila, c_fin + 1)}"
+            ),
+            "values": [nueva[c_ini:c_fin + 1]],
+        })
+
+    agregadas = nuevas[len(anteriores):]
+    if agregadas:
+        fila = len(anteriores) + 2
+        rangos.append({
+            "range": (
+                f"{rowcol_to_a1(fila, 1)}:"
+                f"{rowcol_to_a1(fila + len(agregadas) - 1, len(agregadas[0]))}"
+            ),
+            "values": agregadas,
+        })
+
+    return rangos
+
+
+class AlmacenSheets(Almacen):
+    """
+    Hojas "productos" y "ventas" de un libro de Google Sheets.
+    """
+
+    nombre = "sheets"
+
+    # Cada cuánto se relee "ventas" completa aunque la cola coincida, para
+    # alcanzar ediciones hechas a mano en medio de la hoja.
+    RECARGA_COMPLETA_VENTAS_SEGUNDOS = 600
+
+    def __init__(self, libro):
+        self.libro = libro
+        self._encabezado_productos = []
+        # Última versión de "productos" leída o escrita; escribir_productos
+        # la usa para enviar solo las celdas que cambiaron.
+        self._snapshot_productos = None
+        # Copia local de "ventas" (valores tal como vienen de la hoja) para
+        # leer solo las filas nuevas en cada recarga.
+        self._ventas = None
+        self._ventas_recarga_completa = 0.0
+        self.generacion_ventas = 0
+
+    def leer_productos(self):
+        data = self.libro.worksheet("productos").get_all_records()
+        self._encabezado_productos = [str(c) for c in data[0]] if data else []
+        return pd.DataFrame(data)
+
+    def productos_leidos(self, df):
+        # Si al normalizar se agregaron o renombraron columnas, la
+        # siguiente escritura será completa.
+        encabezado, filas = _matriz_hoja(df)
+
+        if self._encabezado_productos == encabezado:
+            self._snapshot_productos = {"encabezado": encabezado, "filas": filas}
+        else:
+            self._snapshot_productos = None
+
+    def escribir_productos(self, df):
+        """
+        Envía solo las celdas que cambiaron respecto a la última versión
+        cargada (un solo batch_update con las filas modificadas y los
+        productos nuevos).
+
+        Si no hay versión previa, cambió el encabezado, se quitaron filas
+        o los IDs no coinciden por posición, reescribe la hoja completa.
+        """
+        productos = self.libro.worksheet("productos")
+
+        encabezado, filas = _matriz_hoja(df)
+
+        anterior = self._snapshot_productos
+        delta_valido = (
+            anterior is not None
+            and anterior["encabezado"] == encabezado
+            and len(filas) >= len(anterior["filas"])
+        )
+
+        if delta_valido and "id_producto" in encabezado:
+            col_id = encabezado.index("id_producto")
+            delta_valido = all(
+                str(a[col_id]) == str(b[col_id])
+                for a, b in zip(anterior["filas"], filas)
+            )
+
+        if delta_valido:
+            rangos = _rangos_modificados(anterior["filas"], filas)
+            if rangos:
+                productos.batch_update(rangos, raw=True)
+        else:
+            _reescribir_hoja(productos, df)
+
+        self._snapshot_productos = {"encabezado": encabezado, "filas": filas}
+
+    def uso_api(self):
+        if hasattr(self.libro, "uso_por_minuto"):
+            return self.libro.uso_por_minuto()
+        return None
+
+    def _leer_ventas_completo(self, hoja):
+        valores = hoja.get_all_values()
+
+        if not valores or not any(valores[0]):
+            self._ventas = None
+            return pd.DataFrame()
+
+        encabezado = [str(c) for c in valores[0]]
+        ventas = pd.DataFrame(
+            [_ajustar_fila(f, len(encabezado)) for f in valores[1:]],
+            columns=encabezado,
+        )
+        # La recarga periódica casi siempre trae lo mismo que la copia
+        # local: la generación solo sube si alguna fila cambió
+        if self._ventas is None or not self._ventas.equals(ventas):
+            self.generacion_ventas += 1
+        self._ventas = ventas
+        self._ventas_recarga_completa = time.monotonic()
+        return self._ventas
+
+    def leer_ventas(self):
+        """
+        Lee solo la cola de la hoja: desde la última fila conocida (como
+        ancla) hasta el final. Si el ancla ya no coincide (se borraron o
+        editaron filas) o pasó RECARGA_COMPLETA_VENTAS_SEGUNDOS, relee la
+        hoja completa.
+        """
+        hoja = self.libro.worksheet("ventas")
+
+        vencida = (
+            time.monotonic() - self._ventas_recarga_completa
+            >= self.RECARGA_COMPLETA_VENTAS_SEGUNDOS
+        )
+        if self._ventas is None or vencida:
+            return self._leer_ventas_completo(hoja)
+
+        columnas = list(self._ventas.columns)
+        n = len(self._ventas)
+
+        # Fila n + 1 de la hoja = última venta conocida (o el encabezado)
+        ultima_col = rowcol_to_a1(1, len(columnas)).rstrip("0123456789")
+        cola = hoja.get(f"A{n + 1}:{ultima_col}")
+
+        ancla_esperada = (
+            [str(v) for v in self._ventas.iloc[-1].tolist()] if n else columnas
+        )
+        ancla = _ajustar_fila(cola[0], len(columnas)) if cola else []
+
+        if [str(v) for v in ancla] != ancla_esperada:
+            return self._leer_ventas_completo(hoja)
+
+        nuevas = [_ajustar_fila(f, len(columnas)) for f in cola[1:]]
+        if nuevas:
+            self._ventas = pd.concat(
+                [self._ventas, pd.DataFrame(nuevas, columns=columnas)],
+                ignore_index=True,
+            )
+
+        return self._ventas
+
+    def escribir_ventas(self, df):
+        _reescribir_hoja(self.libro.worksheet("ventas"), df)
+        self._ventas = None
+
+    def agregar_ventas(self, filas, df_ventas=None):
+        """
+        Una sola llamada append_rows con las filas del ticket, sin tocar
+        el historial.
+        """
+        ventas = self.libro.worksheet("ventas")
+
+        encabezado = ventas.row_values(1)
+        faltantes = [c for c in _columnas_de(filas) if c not in encabezado]
+
+        if not encabezado or faltantes:
+            self._agregar_con_reescritura(filas, df_ventas)
+            return
+
+        valores = [
+            [_valor_celda(fila.get(col, "")) for col in encabezado]
+            for fila in filas
+        ]
+
+        ventas.append_rows(
+            valores,
+            value_input_option="RAW",
+            table_range="A1",
+        )
+
+    def eliminar_venta(self, posicion):
+        # encabezado + base 1
+        self.libro.worksheet("ventas").delete_rows(int(posicion) + 2)
+
+        if self._ventas is not None and int(posicion) < len(self._ventas):
+            self._ventas = self._ventas.drop(
+                index=self._ventas.index[int(posicion)]
+            ).reset_index(drop=True)
+
+# ============================================
+# SQLite
+# ============================================
+
+class AlmacenSQLite(Almacen):
+    """
+    Tablas "productos" y "ventas" en un archivo SQLite local. El orden
+    de registro es el rowid.
+    """
+
+    nombre = "sqlite"
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self._lock = threading.Lock()
+        self._conexion = sqlite3.connect(ruta, check_same_thread=False)
+        self._conexion.execute("PRAGMA journal_mode=WAL")
+
+    def _columnas(self, tabla):
+        return [
+            fila[1]
+            for fila in self._conexion.execute(f"PRAGMA table_info({tabla})")
+        ]
+
+    def _leer(self, tabla):
+        with self._lock:
+            if not self._columnas(tabla):
+                return pd.DataFrame()
+            return pd.read_sql_query(
+                f"SELECT * FROM {tabla} ORDER BY rowid",
+                self._conexion,
+            )
+
+    def _reemplazar(self, tabla, df):
+        with self._lock:
+            df.to_sql(tabla, self._conexion, if_exists="replace", index=False)
+
+    def leer_productos(self):
+        return self._leer("productos")
+
+    def escribir_productos(self, df):
+        self._reemplazar("productos", df)
+
+    def leer_ventas(self):
+        return self._leer("ventas")
+
+    def escribir_ventas(self, df):
+        self._reemplazar("ventas", df)
+
+    def agregar_ventas(self, filas, df_ventas=None):
+        columnas = self._columnas("ventas")
+        faltantes = [c for c in _columnas_de(filas) if c not in columnas]
+
+        if not columnas or faltantes:
+            self._agregar_con_reescritura(filas, df_ventas)
+            return
+
+        with self._lock:
+            pd.DataFrame(filas).to_sql(
+                "ventas", self._conexion, if_exists="append", index=False
+            )
+
+    def eliminar_venta(self, posicion):
+        with self._lock, self._conexion:
+            self._conexion.execute(
+                "DELETE FROM ventas WHERE rowid = "
+                "(SELECT rowid FROM ventas ORDER BY rowid LIMIT 1 OFFSET ?)",
+                (int(posicion),),
+            )
+
+# ============================================
+# Archivos CSV
+# ============================================
+
+class AlmacenCSV(Almacen):
+    """
+    Archivos CSV locales con el mismo esquema que las hojas
+    (inventario.csv y ventas.csv).
+    """
+
+    nombre = "csv"
+
+    def __init__(
+        self,
+        carpeta=".",
+        archivo_productos="inventario.csv",
+        archivo_ventas="ventas.csv",
+    ):
+        self.ruta_productos = os.path.join(carpeta, archivo_productos)
+        self.ruta_ventas = os.path.join(carpeta, archivo_ventas)
+        self._lock = threading.Lock()
+
+    def _leer(self, ruta):
+        with self._lock:
+            if not os.path.exists(ruta) or os.path.getsize(ruta) == 0:
+                return pd.DataFrame()
+            return pd.read_csv(ruta, dtype={"id_producto": str})
+
+    def _reemplazar(self, ruta, df):
+        # Archivo temporal + os.replace: nunca queda un CSV a medias
+        temporal = ruta + ".tmp"
+        with self._lock:
+            df.to_csv(temporal, index=False, lineterminator="\r\n")
+            os.replace(temporal, ruta)
+
+    def _encabezado(self, ruta):
+        if not os.path.exists(ruta):
+            return []
+        with open(ruta, newline="", encoding="utf-8") as f:
+            return next(csv.reader(f), [])
+
+    def leer_productos(self):
+        return self._leer(self.ruta_productos)
+
+    def escribir_productos(self, df):
+        self._reemplazar(self.ruta_productos, df)
+
+    def leer_ventas(self):
+        return self._leer(self.ruta_ventas)
+
+    def escribir_ventas(self, df):
+        self._reemplazar(self.ruta_ventas, df)
+
+    def agregar_ventas(self, filas, df_ventas=None):
+        encabezado = self._encabezado(self.ruta_ventas)
+        faltantes = [c for c in _columnas_de(filas) if c not in encabezado]
+
+        if not encabezado or faltantes:
+            self._agregar_con_reescritura(filas, df_ventas)
+            return
+
+        with self._lock:
+            with open(self.ruta_ventas, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                termina_en_linea = f.read(1) == b"\n"
+
+            with open(self.ruta_ventas, "a", newline="", encoding="utf-8") as f:
+                if not termina_en_linea:
+                    f.write("\r\n")
+                escritor = csv.writer(f)
+                for fila in filas:
+                    escritor.writerow(
+                        [_valor_celda(fila.get(col, "")) for col in encabezado]
+                    )
+
+    def eliminar_venta(self, posicion):
+        df = self.leer_ventas()
+        self.escribir_ventas(
+            df.drop(index=df.index[int(posicion)]).reset_index(drop=True)
+        )
+
+# ============================================
+# Selección por configuración
+# ============================================
+
+def crear_almacen(tipo=None):
+    """
+    Crea el almacén indicado por tipo o por la configuración "tipo"
+    ("sheets", "sqlite" o "csv"; por defecto "sheets").
+    """
+    tipo = (tipo or config_almacen("tipo", "sheets")).lower()
+
+    if tipo == "sheets":
+        return AlmacenSheets(ClienteSheets(conectar_sheets()))
+
+    if tipo == "sqlite":
+        return AlmacenSQLite(config_almacen("ruta_sqlite", "paleteria.db"))
+
+    if tipo == "csv":
+        return AlmacenCSV(config_almacen("carpeta_csv", "."))
+
+    raise ValueError(f"Tipo de almacenamiento desconocido: {tipo}")
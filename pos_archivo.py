@@ -0,0 +1,220 @@
+import json
+import os
+import threading
+import time
+
+import streamlit as st
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from pos_almacenes import COLUMNAS_VENTAS
+from pos_reportes import clave_venta
+
+# ============================================
+# Archivo columnar de ventas por mes
+# ============================================
+#
+# Copia local del historial de ventas en Parquet, un directorio por mes
+# (mes=AAAA-MM). Una consulta por rango de fechas abre solo los archivos
+# de los meses que toca, lee solo las columnas pedidas y filtra "fecha"
+# con las estadísticas de cada archivo.
+#
+# El índice de archivos vive en _estado.json (se reemplaza de forma
+# atómica), así que un archivo que se escribió a medias o que quedó
+# huérfano tras una compactación nunca se lee.
+
+CARPETA_ARCHIVO = os.environ.get("PALETERIA_ARCHIVO", "archivo_ventas")
+
+# Partes de un mes a partir de las cuales se compactan en un solo archivo
+MAX_PARTES_POR_MES = 20
+
+COLUMNAS_IMPORTES = ["precio", "descuento", "extra", "total", "costo"]
+
+ESQUEMA_VENTAS = pa.schema([
+    (
+        col,
+        pa.int64() if col == "cantidad"
+        else pa.float64() if col in COLUMNAS_IMPORTES
+        else pa.string(),
+    )
+    for col in COLUMNAS_VENTAS
+])
+
+
+class ArchivoVentas:
+    def __init__(self, carpeta=CARPETA_ARCHIVO):
+        self.carpeta = carpeta
+        self._lock = threading.Lock()
+        os.makedirs(carpeta, exist_ok=True)
+        self._estado = self._leer_estado()
+
+    # ---------- Índice de archivos ----------
+
+    def _ruta_estado(self):
+        return os.path.join(self.carpeta, "_estado.json")
+
+    def _leer_estado(self):
+        try:
+            with open(self._ruta_estado(), encoding="utf-8") as f:
+                estado = json.load(f)
+            estado["ancla"] = tuple(estado["ancla"]) if estado["ancla"] else None
+            return estado
+        except (OSError, ValueError, KeyError):
+            return {"filas": 0, "ancla": None, "generacion": None, "partes": {}}
+
+    def _guardar_estado(self, estado):
+        tmp = self._ruta_estado() + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(estado, f)
+        os.replace(tmp, self._ruta_estado())
+        self._estado = estado
+
+    def _borrar(self, partes):
+        for nombre in partes:
+            try:
+                os.remove(os.path.join(self.carpeta, nombre))
+            except OSError:
+                pass
+
+    # ---------- Escritura ----------
+
+    def _escribir_parte(self, mes, df):
+        """
+        Escribe un archivo Parquet con las ventas de un mes y devuelve su
+        ruta relativa a la carpeta del archivo.
+        """
+        os.makedirs(os.path.join(self.carpeta, f"mes={mes}"), exist_ok=True)
+        nombre = os.path.join(f"mes={mes}", f"parte-{time.time_ns()}.parquet")
+
+        tabla = pa.Table.from_pandas(df, schema=ESQUEMA_VENTAS, preserve_index=False)
+        pq.write_table(tabla, os.path.join(self.carpeta, nombre))
+        return nombre
+
+    def _escribir_meses(self, df_ventas):
+        """
+        Reparte las ventas por mes y escribe una parte por cada mes.
+        """
+        df = df_ventas.reindex(columns=COLUMNAS_VENTAS)
+        for col in COLUMNAS_VENTAS:
+            if col == "cantidad":
+                df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0).round().astype("int64")
+            elif col == "costo":
+                # Vacío si la venta no registró costo
+                df[col] = pd.to_numeric(df[col], errors="coerce").astype(float)
+            elif col in COLUMNAS_IMPORTES:
+                df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0.0).astype(float)
+            else:
+                df[col] = df[col].fillna("").astype(str)
+
+        return {
+            str(mes): [self._escribir_parte(mes, grupo)]
+            for mes, grupo in df.groupby(df["fecha"].str[:7], sort=True)
+        }
+
+    def espejar(self, df_ventas):
+        """
+        Lleva al archivo las ventas de df_ventas que aún no tiene. Si el
+        historial ya no empieza igual (se borró o editó una venta) o el
+        almacén lo releyó con cambios (df_ventas.attrs["generacion"]), lo
+        reescribe completo.
+        """
+        generacion = df_ventas.attrs.get("generacion")
+
+        with self._lock:
+            estado = self._estado
+            n = estado["filas"]
+
+            vigente = (
+                estado.get("generacion") == generacion
+                and len(df_ventas) >= n
+                and (n == 0 or clave_venta(df_ventas.iloc[n - 1]) == estado["ancla"])
+            )
+            if vigente and len(df_ventas) == n:
+                return
+
+            if vigente:
+                partes = {mes: list(lista) for mes, lista in estado["partes"].items()}
+                for mes, nuevas in self._escribir_meses(df_ventas.iloc[n:]).items():
+                    partes.setdefault(mes, []).extend(nuevas)
+                sobrantes = []
+            else:
+                partes = self._escribir_meses(df_ventas)
+                sobrantes = [p for lista in estado["partes"].values() for p in lista]
+
+            self._guardar_estado({
+                "filas": len(df_ventas),
+                "ancla": clave_venta(df_ventas.iloc[-1]) if len(df_ventas) else None,
+                "generacion": generacion,
+                "partes": partes,
+            })
+            self._borrar(sobrantes)
+
+            for mes, lista in partes.items():
+                if len(lista) > MAX_PARTES_POR_MES:
+                    self._compactar_mes(mes)
+
+    def _compactar_mes(self, mes):
+        anteriores = self._estado["partes"][mes]
+        rutas = [os.path.join(self.carpeta, p) for p in anteriores]
+
+        df = (
+            ds.dataset(rutas, format="parquet", schema=ESQUEMA_VENTAS)
+            .to_table()
+            .to_pandas()
+            .sort_values(["fecha", "hora"], kind="stable")
+        )
+        nueva = self._escribir_parte(mes, df)
+
+        partes = dict(self._estado["partes"])
+        partes[mes] = [nueva]
+        self._guardar_estado({**self._estado, "partes": partes})
+        self._borrar(anteriores)
+
+    def compactar(self):
+        """
+        Junta las partes de cada mes en un solo archivo ordenado por fecha
+        y hora (menos archivos que abrir y estadísticas más útiles).
+        """
+        with self._lock:
+            for mes, lista in list(self._estado["partes"].items()):
+                if len(lista) > 1:
+                    self._compactar_mes(mes)
+
+    # ---------- Lectura ----------
+
+    def consultar(self, f_ini, f_fin, columnas=None):
+        """
+        Ventas entre dos fechas ISO (inclusive). Solo abre los meses del
+        rango y solo lee `columnas` (todas si es None).
+        """
+        columnas = list(columnas or COLUMNAS_VENTAS)
+
+        # Bajo el candado para que una compactación no borre las partes
+        # mientras se leen
+        with self._lock:
+            rutas = [
+                os.path.join(self.carpeta, p)
+                for mes, lista in sorted(self._estado["partes"].items())
+                if f_ini[:7] <= mes <= f_fin[:7]
+                for p in lista
+            ]
+
+            if not rutas:
+                return pd.DataFrame(columns=columnas)
+
+            tabla = ds.dataset(rutas, format="parquet", schema=ESQUEMA_VENTAS).to_table(
+                columns=columnas,
+                filter=(ds.field("fecha") >= f_ini) & (ds.field("fecha") <= f_fin),
+            )
+
+        return tabla.to_pandas()
+
+
+@st.cache_resource
+def obtener_archivo():
+    """
+    Archivo de ventas compartido por todas las sesiones.
+    """
+    return ArchivoVentas()
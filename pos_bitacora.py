@@ -0,0 +1,523 @@
+import json
+import os
+from collections import Counter
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import streamlit as st
+import pandas as pd
+
+from pos_almacenes import normalizar_ventas
+from pos_reportes import clave_venta
+from pos_datos import (
+    cargar_productos,
+    guardar_productos,
+    cargar_ventas,
+    agregar_ventas,
+    invalidar_cache,
+    posiciones_productos,
+)
+
+# ============================================
+# Bitácora local de ventas (write-ahead)
+# ============================================
+#
+# Cada cobro se guarda primero en una base SQLite local y un hilo en
+# segundo plano lo replica a las hojas "productos" y "ventas". Las
+# operaciones se aplican estrictamente en orden: si una falla, se
+# reintenta con espera creciente y las siguientes esperan su turno.
+
+RUTA_BITACORA = os.environ.get("PALETERIA_BITACORA", "bitacora_ventas.db")
+
+# Espera máxima (segundos) entre reintentos cuando Sheets no responde
+ESPERA_MAXIMA_REINTENTO = 60
+
+# Pasos de una venta en la bitácora
+PASO_PENDIENTE = 0
+PASO_STOCK_APLICADO = 1
+# Ya se pidió agregar las filas: si la llamada falló, pudieron llegar
+# igual (timeout o error después de escribir), así que antes de
+# reintentar se buscan en el almacén
+PASO_VENTAS_ENVIADAS = 2
+
+# Filas del final del historial, además de las del ticket, en que se
+# busca un ticket ya enviado (otros procesos pudieron agregar después)
+VENTANA_VERIFICACION_VENTAS = 200
+
+
+class ConflictoRevision(Exception):
+    """
+    La venta no se registró porque otro cobro o un ajuste de inventario
+    cambió alguno de sus productos desde que se validó el stock.
+    """
+
+    def __init__(self, ids):
+        super().__init__(f"Productos modificados por otra sesión: {', '.join(ids)}")
+        self.ids = ids
+
+
+def valor_json(valor):
+    """
+    default= de json.dumps para los números de numpy/pandas que quedan
+    en filas y tablas (la bitácora y los cierres de caja).
+    """
+    if hasattr(valor, "item"):
+        return valor.item()
+    raise TypeError(f"No se puede guardar {type(valor).__name__} como JSON")
+
+
+class Bitacora:
+    def __init__(self, ruta=RUTA_BITACORA):
+        self.ruta = ruta
+        self.bloqueo = threading.RLock()
+        self._aviso = threading.Event()
+        self._hilo = None
+
+        self._conexion = sqlite3.connect(
+            ruta,
+            check_same_thread=False,
+            isolation_level=None,
+        )
+        self._conexion.execute("PRAGMA journal_mode=WAL")
+        self._conexion.execute("PRAGMA synchronous=FULL")
+        self._conexion.execute(
+            """
+            CREATE TABLE IF NOT EXISTS operaciones (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                creada TEXT NOT NULL,
+                tipo TEXT NOT NULL,
+                datos TEXT NOT NULL,
+                paso INTEGER NOT NULL DEFAULT 0,
+                intentos INTEGER NOT NULL DEFAULT 0,
+                ultimo_error TEXT,
+                sincronizada TEXT
+            )
+            """
+        )
+        # Revisión por producto: sube con cada venta, devolución o
+        # ajuste de inventario que toque su stock.
+        self._conexion.execute(
+            """
+            CREATE TABLE IF NOT EXISTS revisiones (
+                id_producto TEXT PRIMARY KEY,
+                revision INTEGER NOT NULL
+            )
+            """
+        )
+        self._lock_db = threading.Lock()
+
+    # ---------- Escritura local ----------
+
+    def _subir_revisiones(self, ids):
+        self._conexion.executemany(
+            "INSERT INTO revisiones (id_producto, revision) VALUES (?, 1) "
+            "ON CONFLICT(id_producto) DO UPDATE SET revision = revision + 1",
+            [(i,) for i in ids],
+        )
+
+    def _registrar(self, tipo, filas, stock, revisiones_vistas=None):
+        datos = json.dumps(
+            {"filas": filas, "stock": stock},
+            default=valor_json,
+        )
+
+        with self._lock_db:
+            # BEGIN IMMEDIATE toma el candado de escritura de SQLite: la
+            # comparación de revisiones y el registro son una sola
+            # transacción, también entre procesos que compartan el archivo.
+            self._conexion.execute("BEGIN IMMEDIATE")
+            try:
+                if revisiones_vistas is not None:
+                    actuales = self._revisiones(stock)
+                    cambiados = [
+                        i for i in stock
+                        if actuales.get(i, 0) != revisiones_vistas.get(i, 0)
+                    ]
+                    if cambiados:
+                        raise ConflictoRevision(cambiados)
+
+                self._conexion.execute(
+                    "INSERT INTO operaciones (creada, tipo, datos) VALUES (?, ?, ?)",
+                    (datetime.now().isoformat(timespec="seconds"), tipo, datos),
+                )
+                self._subir_revisiones(stock)
+            except BaseException:
+                self._conexion.execute("ROLLBACK")
+                raise
+            self._conexion.execute("COMMIT")
+
+        self._aviso.set()
+
+    def registrar_venta(self, filas, revisiones_vistas=None):
+        """
+        Guarda un ticket en la bitácora (durable al regresar) y despierta
+        al sincronizador. filas son las líneas de venta tal como van a la
+        hoja "ventas"; el descuento de stock se deriva de ellas.
+
+        Si se pasan revisiones_vistas (las de revisiones() leídas antes
+        del catálogo con que se validó el stock) y alguno de los productos
+        cambió desde entonces, no registra nada y lanza ConflictoRevision.
+        """
+        stock = {}
+        for fila in filas:
+            id_prod = str(fila["id_producto"])
+            stock[id_prod] = stock.get(id_prod, 0) + int(fila["cantidad"])
+
+        self._registrar("venta", filas, stock, revisiones_vistas)
+
+    def registrar_devolucion(self, id_producto, cantidad):
+        """
+        Regresa stock de una venta eliminada. Se replica igual que una
+        venta, como un descuento negativo.
+        """
+        self._registrar("ajuste", [], {str(id_producto): -int(cantidad)})
+
+    def subir_revisiones(self, ids):
+        """
+        Marca productos como modificados (p. ej. tras editar inventario),
+        para que los cobros que los validaron antes vuelvan a validar.
+        """
+        with self._lock_db:
+            self._subir_revisiones([str(i) for i in ids])
+
+    # ---------- Consultas ----------
+
+    def _revisiones(self, ids=None):
+        if ids is None:
+            filas = self._conexion.execute(
+                "SELECT id_producto, revision FROM revisiones"
+            ).fetchall()
+        else:
+            ids = list(ids)
+            if not ids:
+                return {}
+            marcas = ", ".join("?" for _ in ids)
+            filas = self._conexion.execute(
+                f"SELECT id_producto, revision FROM revisiones "
+                f"WHERE id_producto IN ({marcas})",
+                ids,
+            ).fetchall()
+        return dict(filas)
+
+    def revisiones(self):
+        """
+        Revisión actual de cada producto que ha cambiado de stock. Debe
+        leerse antes que el catálogo con el que se valida un cobro.
+        """
+        with self._lock_db:
+            return self._revisiones()
+
+    def stock_pendiente(self):
+        """
+        Descuento de stock por producto de las operaciones que aún no se
+        aplican a "productos".
+        """
+        pendiente = {}
+        for operacion in self.pendientes():
+            if operacion["paso"] != PASO_PENDIENTE:
+                continue
+            for id_prod, cantidad in operacion["datos"]["stock"].items():
+                pendiente[id_prod] = pendiente.get(id_prod, 0) + int(cantidad)
+        return pendiente
+
+    def pendientes(self):
+        """
+        Operaciones aún no replicadas a Sheets, en orden de registro.
+        """
+        with self._lock_db:
+            filas = self._conexion.execute(
+                "SELECT id, tipo, datos, paso FROM operaciones "
+                "WHERE sincronizada IS NULL ORDER BY id"
+            ).fetchall()
+
+        return [
+            {"id": id_op, "tipo": tipo, "datos": json.loads(datos), "paso": paso}
+            for id_op, tipo, datos, paso in filas
+        ]
+
+    def estado(self):
+        """
+        Resumen para el indicador de sincronización: número de
+        operaciones pendientes y, si la más antigua está fallando, sus
+        intentos y último error.
+        """
+        with self._lock_db:
+            pendientes, = self._conexion.execute(
+                "SELECT COUNT(*) FROM operaciones WHERE sincronizada IS NULL"
+            ).fetchone()
+            primera = self._conexion.execute(
+                "SELECT intentos, ultimo_error FROM operaciones "
+                "WHERE sincronizada IS NULL ORDER BY id LIMIT 1"
+            ).fetchone()
+
+        intentos, ultimo_error = primera or (0, None)
+        return {
+            "pendientes": pendientes,
+            "intentos": intentos,
+            "ultimo_error": ultimo_error,
+        }
+
+    def esperar_sincronizacion(self, timeout=10):
+        """
+        Espera hasta que no haya operaciones pendientes. Devuelve False
+        si se agotó el tiempo.
+        """
+        self._aviso.set()
+        limite = time.monotonic() + timeout
+        while self.estado()["pendientes"]:
+            if time.monotonic() >= limite:
+                return False
+            time.sleep(0.1)
+        return True
+
+    # ---------- Sincronización ----------
+
+    def iniciar(self):
+        if self._hilo is None or not self._hilo.is_alive():
+            self._hilo = threading.Thread(
+                target=self._trabajar,
+                name="sincronizador-bitacora",
+                daemon=True,
+            )
+            self._hilo.start()
+
+    def _marcar(self, id_op, **campos):
+        columnas = ", ".join(f"{c} = ?" for c in campos)
+        with self._lock_db:
+            self._conexion.execute(
+                f"UPDATE operaciones SET {columnas} WHERE id = ?",
+                (*campos.values(), id_op),
+            )
+
+    def _aplicar_operacion(self, operacion):
+        datos = operacion["datos"]
+
+        with self.bloqueo:
+            if operacion["paso"] == PASO_PENDIENTE:
+                # Leer el stock más reciente y descontar sobre él
+                invalidar_cache("productos")
+                df = cargar_productos()
+
+                descontar_stock(df, datos["stock"])
+
+                guardar_productos(df)
+                self._marcar(operacion["id"], paso=PASO_STOCK_APLICADO)
+
+            enviadas = (
+                operacion["paso"] == PASO_VENTAS_ENVIADAS
+                and self._ventas_en_almacen(datos["filas"])
+            )
+            if not enviadas:
+                self._marcar(operacion["id"], paso=PASO_VENTAS_ENVIADAS)
+                agregar_ventas(datos["filas"])
+
+        self._marcar(
+            operacion["id"],
+            sincronizada=datetime.now().isoformat(timespec="seconds"),
+            ultimo_error=None,
+        )
+
+    def _ventas_en_almacen(self, filas):
+        """
+        True si todas las filas del ticket ya están al final del historial
+        (comparadas por clave_venta: mismas fecha, hora, producto y total).
+        """
+        if not filas:
+            return True
+
+        invalidar_cache("ventas")
+        df = cargar_ventas()
+
+        # El índice es la posición en el almacén, no el orden por momento
+        ultimas = df[df.index >= len(df) - len(filas) - VENTANA_VERIFICACION_VENTAS]
+        en_almacen = Counter(clave_venta(f) for f in ultimas.to_dict(orient="records"))
+        buscadas = Counter(clave_venta(f) for f in filas)
+
+        return all(en_almacen[clave] >= n for clave, n in buscadas.items())
+
+    def _trabajar(self):
+        while True:
+            pendientes = self.pendientes()
+
+            if not pendientes:
+                self._aviso.wait(timeout=5)
+                self._aviso.clear()
+                continue
+
+            operacion = pendientes[0]
+            try:
+                self._aplicar_operacion(operacion)
+            except Exception as e:
+                with self._lock_db:
+                    self._conexion.execute(
+                        "UPDATE operaciones SET intentos = intentos + 1, "
+                        "ultimo_error = ? WHERE id = ?",
+                        (f"{type(e).__name__}: {e}", operacion["id"]),
+                    )
+                    intentos, = self._conexion.execute(
+                        "SELECT intentos FROM operaciones WHERE id = ?",
+                        (operacion["id"],),
+                    ).fetchone()
+
+                self._aviso.wait(timeout=min(2 ** intentos, ESPERA_MAXIMA_REINTENTO))
+                self._aviso.clear()
+
+
+@st.cache_resource
+def obtener_bitacora():
+    """
+    Bitácora compartida por todas las sesiones, con su sincronizador ya
+    corriendo.
+    """
+    bitacora = Bitacora()
+    bitacora.iniciar()
+    return bitacora
+
+# ============================================
+# Lecturas que incluyen lo pendiente
+# ============================================
+
+def descontar_stock(df, cantidades):
+    """
+    Resta {id_producto: cantidad} del stock de df (en su lugar), buscando
+    cada producto en el índice del catálogo. Los que ya no existen se
+    ignoran.
+    """
+    columna = df.columns.get_loc("stock")
+    for id_prod, posicion in posiciones_productos(df, cantidades).items():
+        df.iat[posicion, columna] -= int(cantidades[id_prod])
+
+def cargar_productos_al_dia():
+    """
+    Catálogo con el stock ya descontado por las ventas que siguen en la
+    bitácora. Los pendientes se leen antes que el catálogo: si el
+    sincronizador avanza entre ambas lecturas, el stock queda de menos
+    (nunca de más) hasta el siguiente rerun.
+    """
+    pendiente = obtener_bitacora().stock_pendiente()
+    df = cargar_productos()
+
+    descontar_stock(df, pendiente)
+    return df
+
+def cargar_ventas_al_dia():
+    """
+    Historial de ventas más las ventas que aún no llegan a Sheets.
+    """
+    pendientes = obtener_bitacora().pendientes()
+    df = cargar_ventas()
+
+    filas = [
+        fila
+        for operacion in pendientes
+        for fila in operacion["datos"]["filas"]
+    ]
+
+    if not filas:
+        return df
+
+    attrs = df.attrs
+    df = pd.concat(
+        [df, normalizar_ventas(pd.DataFrame(filas))],
+        ignore_index=True,
+    )
+    df.attrs = attrs
+    # Una venta con fecha anterior rompe el orden por momento
+    if not df["momento"].is_monotonic_increasing:
+        df = df.sort_values("momento", kind="stable", ignore_index=True)
+
+    return df
+
+# ============================================
+# Cambios de inventario hechos a mano
+# ============================================
+
+def _iguales(a, b):
+    if pd.isna(a) and pd.isna(b):
+        return True
+    return a == b
+
+def combinar_cambios(base, editado, actual, stock_pendiente=None):
+    """
+    Aplica sobre el catálogo actual solo las celdas que cambiaron entre
+    base (lo que se cargó) y editado (lo que se quiere guardar), más los
+    productos nuevos. Así una edición no pisa el stock que otra sesión
+    movió mientras tanto.
+
+    base y editado incluyen el stock pendiente de la bitácora; por eso un
+    stock escrito a mano se guarda como valor + stock_pendiente, para que
+    al aplicar los descuentos pendientes quede lo que se capturó.
+
+    Devuelve (catálogo combinado, ids modificados).
+    """
+    stock_pendiente = stock_pendiente or {}
+    actual = actual.copy()
+
+    ids_actual = actual["id_producto"].astype(str)
+    pos_actual = {id_prod: idx for idx, id_prod in zip(actual.index, ids_actual)}
+    filas_base = {
+        str(fila["id_producto"]): fila
+        for _, fila in base.iterrows()
+    }
+
+    for col in editado.columns:
+        if col not in actual.columns:
+            actual[col] = pd.NA
+
+    modificados = []
+    nuevas = []
+
+    for _, fila in editado.iterrows():
+        id_prod = str(fila["id_producto"])
+        anterior = filas_base.get(id_prod)
+
+        if anterior is None or id_prod not in pos_actual:
+            nuevas.append(fila)
+            modificados.append(id_prod)
+            continue
+
+        cambios = {
+            col: fila[col]
+            for col in editado.columns
+            if col not in anterior.index or not _iguales(fila[col], anterior[col])
+        }
+        if not cambios:
+            continue
+
+        if "stock" in cambios:
+            cambios["stock"] = int(cambios["stock"]) + stock_pendiente.get(id_prod, 0)
+
+        idx = pos_actual[id_prod]
+        for col, valor in cambios.items():
+            actual.at[idx, col] = valor
+        modificados.append(id_prod)
+
+    if nuevas:
+        actual = pd.concat([actual, pd.DataFrame(nuevas)], ignore_index=True)
+
+    return actual, modificados
+
+def guardar_productos_editados(editado, base):
+    """
+    Guarda cambios de inventario hechos a mano (altas, ediciones, carga
+    masiva). Bajo el candado del sincronizador relee el catálogo, aplica
+    solo lo que el usuario cambió y sube la revisión de esos productos.
+    """
+    bitacora = obtener_bitacora()
+
+    with bitacora.bloqueo:
+        invalidar_cache("productos")
+        actual = cargar_productos()
+
+        combinado, modificados = combinar_cambios(
+            base,
+            editado,
+            actual,
+            bitacora.stock_pendiente(),
+        )
+
+        if modificados:
+            guardar_productos(combinado)
+            bitacora.subir_revisiones(modificados)
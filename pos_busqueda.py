@@ -0,0 +1,179 @@
+import bisect
+import re
+import unicodedata
+from collections import defaultdict
+
+import pandas as pd
+
+from pos_datos import derivado_productos
+
+# ============================================
+# Búsqueda de productos
+# ============================================
+#
+# La entrada rápida de "Registrar venta" recibe lo que se teclea o lo
+# que manda el lector de código de barras: un ID, un código de barras o
+# parte del nombre, sin importar acentos ni mayúsculas.
+#
+# IndiceBusqueda se arma una vez por lectura del catálogo (se guarda con
+# ella en la caché de pos_datos) y tiene:
+#   - un diccionario de IDs y códigos de barras exactos;
+#   - las palabras de nombre, categoría e ID ordenadas, para buscar por
+#     prefijo con búsqueda binaria ("choc" -> "Chocolate");
+#   - un índice de trigramas para tolerar errores de dedo cuando ningún
+#     prefijo coincide ("chocolte" -> "Chocolate").
+#
+# El código de barras sale de la columna opcional "codigo_barras" del
+# catálogo; sin ella, el lector puede mandar el ID impreso como código.
+
+MAX_RESULTADOS = 10
+
+# Trigramas en común / trigramas de la consulta y la palabra juntos
+SIMILITUD_MINIMA = 0.4
+
+
+def normalizar(texto):
+    """
+    Texto en minúsculas, sin acentos y con espacios simples.
+    """
+    texto = str(texto).casefold()
+    if not texto.isascii():
+        texto = unicodedata.normalize("NFKD", texto)
+        texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return " ".join(texto.split())
+
+
+def _palabras(normalizado):
+    return re.findall(r"\w+", normalizado)
+
+
+def _codigo(valor):
+    # Las hojas devuelven códigos numéricos como float (7501234567890.0)
+    if pd.isna(valor):
+        return ""
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    return normalizar(valor)
+
+
+def _trigramas(palabra):
+    palabra = f" {palabra} "
+    return {palabra[i:i + 3] for i in range(len(palabra) - 2)}
+
+
+class IndiceBusqueda:
+    def __init__(self, df_productos):
+        self.ids = df_productos["id_producto"].astype(str).tolist()
+        self._ids_normalizados = [normalizar(i) for i in self.ids]
+        self._nombres = [normalizar(n) for n in df_productos["nombre"]]
+        self._activos = df_productos["activa"].astype(bool).tolist()
+
+        codigos = (
+            df_productos["codigo_barras"]
+            if "codigo_barras" in df_productos.columns
+            else [None] * len(self.ids)
+        )
+
+        self._exactos = {}
+        palabras = set()
+        for posicion, (id_prod, categoria, codigo) in enumerate(
+            zip(self._ids_normalizados, df_productos["categoria"], codigos)
+        ):
+            # Con ids o códigos repetidos gana la primera fila
+            self._exactos.setdefault(id_prod, posicion)
+            codigo = _codigo(codigo)
+            if codigo:
+                self._exactos.setdefault(codigo, posicion)
+
+            textos = (self._nombres[posicion], normalizar(categoria), id_prod)
+            for palabra in {p for t in textos for p in _palabras(t)}:
+                palabras.add((palabra, posicion))
+            # El ID completo también, para buscar "p-00" por prefijo
+            palabras.add((id_prod, posicion))
+
+        # (palabra, posición) ordenadas: un prefijo es un tramo contiguo
+        ordenadas = sorted(palabras)
+        self._palabras = [p for p, _ in ordenadas]
+        self._posiciones = [pos for _, pos in ordenadas]
+
+        self._trigramas = defaultdict(list)   # trigrama -> palabras
+        self._distintas = sorted(set(self._palabras))
+        for k, palabra in enumerate(self._distintas):
+            for trigrama in _trigramas(palabra):
+                self._trigramas[trigrama].append(k)
+
+    def _con_prefijo(self, prefijo):
+        inicio = bisect.bisect_left(self._palabras, prefijo)
+        fin = inicio
+        while fin < len(self._palabras) and self._palabras[fin].startswith(prefijo):
+            fin += 1
+        return set(self._posiciones[inicio:fin])
+
+    def _parecidas(self, palabra):
+        # Números (IDs, códigos) solo por prefijo: un error ahí es otro
+        # producto
+        if not palabra.isalpha():
+            return self._con_prefijo(palabra)
+
+        # Palabras del catálogo con suficientes trigramas en común
+        buscados = _trigramas(palabra)
+        comunes = defaultdict(int)
+        for trigrama in buscados:
+            for k in self._trigramas.get(trigrama, ()):
+                comunes[k] += 1
+
+        encontradas = set()
+        for k, n in comunes.items():
+            total = len(buscados) + len(_trigramas(self._distintas[k])) - n
+            if n / total >= SIMILITUD_MINIMA:
+                encontradas |= self._con_prefijo(self._distintas[k])
+        return encontradas
+
+    def buscar(self, texto, limite=MAX_RESULTADOS, solo_activos=True):
+        """
+        IDs de los productos que corresponden a `texto`, los mejores
+        primero. Un ID o código de barras exacto devuelve solo ese
+        producto. Si no, cada palabra de `texto` debe ser el inicio de
+        alguna palabra del producto; si ninguno cumple, se buscan
+        palabras parecidas.
+        """
+        consulta = normalizar(texto)
+        if not consulta:
+            return []
+
+        posicion = self._exactos.get(consulta)
+        if posicion is not None and (self._activos[posicion] or not solo_activos):
+            return [self.ids[posicion]]
+
+        palabras = _palabras(consulta)
+        if not palabras:
+            return []
+
+        for buscar_palabra in (self._con_prefijo, self._parecidas):
+            encontradas = set.intersection(*(buscar_palabra(p) for p in palabras))
+            # Un ID a medias ("p-00") es el inicio de un ID completo
+            encontradas |= self._con_prefijo(consulta)
+            if solo_activos:
+                encontradas = {p for p in encontradas if self._activos[p]}
+            if encontradas:
+                break
+
+        # Primero los IDs que empiezan con la consulta (en orden de ID),
+        # luego los nombres que empiezan con ella y después el resto; los
+        # nombres, de más corto a más largo
+        def prioridad(p):
+            if self._ids_normalizados[p].startswith(consulta):
+                return (0, 0, self._ids_normalizados[p])
+            nombre = self._nombres[p]
+            return (1 if nombre.startswith(consulta) else 2, len(nombre), nombre)
+
+        orden = sorted(encontradas, key=prioridad)
+        return [self.ids[p] for p in orden[:limite]]
+
+
+def buscar_productos(texto, limite=MAX_RESULTADOS):
+    """
+    IDs de productos activos que corresponden a `texto` (ID, código de
+    barras o parte del nombre), con el índice del catálogo en caché.
+    """
+    return derivado_productos("busqueda", IndiceBusqueda).buscar(texto, limite)
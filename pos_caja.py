@@ -0,0 +1,282 @@
+import random
+import time
+
+import pandas as pd
+
+from pos_bitacora import (
+    ConflictoRevision,
+    obtener_bitacora,
+    cargar_productos_al_dia,
+)
+from pos_datos import posiciones_productos
+from pos_reportes import sumar_ventas
+
+# ============================================
+# Cobro
+# ============================================
+
+# Veces que se revalida un cobro cuando otra sesión tocó sus productos,
+# con una espera corta y aleatoria entre intentos para no chocar de nuevo
+MAX_INTENTOS_COBRO = 5
+ESPERA_CONFLICTO_SEGUNDOS = 0.02
+
+
+class StockInsuficiente(Exception):
+    """
+    No alcanza el stock para una o más líneas del ticket.
+    """
+
+    def __init__(self, faltantes):
+        super().__init__(
+            "; ".join(
+                f"{f['producto']}: pedido {f['pedido']}, disponible {f['disponible']}"
+                for f in faltantes
+            )
+        )
+        self.faltantes = faltantes
+
+
+def validar_stock(df_productos, lineas):
+    """
+    Revisa que haya stock para todas las líneas, sumando las que repiten
+    producto. Devuelve la lista de faltantes (vacía si todo alcanza); un
+    producto que ya no existe cuenta con disponible 0.
+    """
+    pedido = {}
+    nombres = {}
+    for linea in lineas:
+        id_prod = str(linea["id_producto"])
+        pedido[id_prod] = pedido.get(id_prod, 0) + int(linea["cantidad"])
+        nombres.setdefault(id_prod, linea.get("producto", id_prod))
+
+    columna_stock = df_productos["stock"]
+    stock = {
+        id_prod: columna_stock.iat[posicion]
+        for id_prod, posicion in posiciones_productos(df_productos, pedido).items()
+    }
+
+    return [
+        {
+            "id_producto": id_prod,
+            "producto": nombres[id_prod],
+            "pedido": cantidad,
+            "disponible": int(stock.get(id_prod, 0)),
+        }
+        for id_prod, cantidad in pedido.items()
+        if cantidad > stock.get(id_prod, 0)
+    ]
+
+
+def con_costo(filas, df_productos):
+    """
+    Copia de las filas con el costo unitario actual de cada producto
+    (el que ya traiga una fila se respeta). Así el margen de una venta no
+    cambia cuando después cambia el costo en el catálogo.
+    """
+    columna_costo = df_productos["costo"]
+    costos = {
+        id_prod: float(pd.to_numeric(columna_costo.iat[posicion], errors="coerce"))
+        for id_prod, posicion in posiciones_productos(
+            df_productos, {str(fila["id_producto"]) for fila in filas}
+        ).items()
+    }
+    return [
+        {**fila, "costo": fila.get("costo", costos.get(str(fila["id_producto"])))}
+        for fila in filas
+    ]
+
+
+def confirmar_venta(filas, df_productos, revisiones_vistas):
+    """
+    Registra un ticket solo si el stock con que se validó sigue vigente.
+
+    revisiones_vistas son las revisiones leídas antes de df_productos (el
+    catálogo con que se validó). Si otra sesión cambió alguno de esos
+    productos, se vuelve a leer el catálogo, se revalida y se reintenta;
+    si ya no alcanza el stock lanza StockInsuficiente. Cada línea se
+    guarda con el costo del producto en ese catálogo y el ticket se suma
+    al resumen diario de los reportes.
+    """
+    bitacora = obtener_bitacora()
+
+    for intento in range(1, MAX_INTENTOS_COBRO + 1):
+        faltantes = validar_stock(df_productos, filas)
+        if faltantes:
+            raise StockInsuficiente(faltantes)
+
+        try:
+            filas_con_costo = con_costo(filas, df_productos)
+            bitacora.registrar_venta(filas_con_costo, revisiones_vistas)
+            sumar_ventas(filas_con_costo)
+            return
+        except ConflictoRevision:
+            time.sleep(random.uniform(0, ESPERA_CONFLICTO_SEGUNDOS * intento))
+            # Revisiones primero y catálogo después, igual que en la carga
+            revisiones_vistas = bitacora.revisiones()
+            df_productos = cargar_productos_al_dia()
+
+    raise ConflictoRevision([str(f["id_producto"]) for f in filas])
+
+# ============================================
+# Carrito
+# ============================================
+#
+# Una línea por producto: agregar un producto que ya está en el carrito
+# suma a su línea. Los totales y lo apartado por producto se llevan al
+# día con cada operación, así que agregar, quitar o consultar no
+# recorre el carrito; el DataFrame solo se arma para mostrarlo, y se
+# reutiliza mientras el carrito no cambie.
+
+COLUMNAS_CARRITO = [
+    "id_producto",
+    "categoria",
+    "producto",
+    "cantidad",
+    "precio",
+    "extra",
+    "descuento",
+    "subtotal",
+]
+
+
+class Carrito:
+    def __init__(self):
+        self._lineas = {}   # id_producto -> línea (en orden de llegada)
+        self.cantidad = 0
+        self._bruto = 0.0
+        self._extra = 0.0
+        self._descuento = 0.0
+        self._tabla = None
+
+    def __len__(self):
+        return len(self._lineas)
+
+    def __bool__(self):
+        return bool(self._lineas)
+
+    @property
+    def bruto(self):
+        """
+        Suma de cantidad × precio, sin extras ni descuentos.
+        """
+        return round(self._bruto, 2)
+
+    @property
+    def extra(self):
+        return round(self._extra, 2)
+
+    @property
+    def descuento(self):
+        return round(self._descuento, 2)
+
+    @property
+    def total(self):
+        """
+        Suma de los subtotales de las líneas.
+        """
+        return round(self._bruto + self._extra - self._descuento, 2)
+
+    def _sumar(self, linea, signo):
+        self.cantidad += signo * linea["cantidad"]
+        self._bruto += signo * linea["cantidad"] * linea["precio"]
+        self._extra += signo * linea["extra"]
+        self._descuento += signo * linea["descuento"]
+        self._tabla = None
+
+    def agregar(self, id_producto, producto, categoria, cantidad, precio,
+                descuento=0.0, extra=0.0):
+        """
+        Agrega `cantidad` piezas de un producto. Si ya estaba en el
+        carrito se suman a su línea (cantidad, descuento y extra) y la
+        línea toma el precio recibido, que es el del catálogo actual.
+        """
+        id_producto = str(id_producto)
+        anterior = self._lineas.get(id_producto)
+        if anterior is not None:
+            self._sumar(anterior, -1)
+            cantidad += anterior["cantidad"]
+            descuento += anterior["descuento"]
+            extra += anterior["extra"]
+
+        linea = {
+            "id_producto": id_producto,
+            "categoria": categoria,
+            "producto": producto,
+            "cantidad": int(cantidad),
+            "precio": float(precio),
+            "extra": float(extra),
+            "descuento": float(descuento),
+        }
+        linea["subtotal"] = (
+            linea["cantidad"] * linea["precio"] + linea["extra"] - linea["descuento"]
+        )
+
+        # Reemplazar la llave conserva el lugar de la línea en el carrito
+        self._lineas[id_producto] = linea
+        self._sumar(linea, 1)
+
+    def agregar_del_catalogo(self, df_productos, id_producto, cantidad=1):
+        """
+        Agrega `cantidad` piezas de un producto activo con su nombre,
+        categoría y precio del catálogo. Lanza StockInsuficiente si no
+        alcanzan contando lo que ya está en el carrito (un producto que no
+        existe o no está activo cuenta con disponible 0).
+        """
+        id_producto = str(id_producto)
+        posicion = posiciones_productos(df_productos, [id_producto]).get(id_producto)
+        fila = None if posicion is None else df_productos.iloc[posicion]
+
+        disponible = 0
+        if fila is not None and bool(fila["activa"]):
+            disponible = max(int(fila["stock"]) - self.reservado(id_producto), 0)
+
+        if cantidad > disponible:
+            raise StockInsuficiente([{
+                "id_producto": id_producto,
+                "producto": id_producto if fila is None else fila["nombre"],
+                "pedido": cantidad,
+                "disponible": disponible,
+            }])
+
+        self.agregar(
+            id_producto,
+            fila["nombre"],
+            fila["categoria"],
+            cantidad,
+            float(fila["precio"]),
+        )
+
+    def quitar(self, id_producto):
+        """
+        Quita la línea de un producto (no hace nada si no está).
+        """
+        linea = self._lineas.pop(str(id_producto), None)
+        if linea is not None:
+            self._sumar(linea, -1)
+
+    def vaciar(self):
+        self.__init__()
+
+    def reservado(self, id_producto):
+        """
+        Piezas del producto que ya están en el carrito.
+        """
+        linea = self._lineas.get(str(id_producto))
+        return linea["cantidad"] if linea else 0
+
+    def lineas(self):
+        """
+        Copia de las líneas, en el orden en que se agregaron.
+        """
+        return [dict(linea) for linea in self._lineas.values()]
+
+    def tabla(self):
+        """
+        Las líneas como DataFrame (COLUMNAS_CARRITO), para mostrar. No se
+        debe modificar: se reutiliza hasta el siguiente cambio.
+        """
+        if self._tabla is None:
+            self._tabla = pd.DataFrame(
+                list(self._lineas.values()), columns=COLUMNAS_CARRITO
+            )
+        return self._tabla
@@ -0,0 +1,234 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+import streamlit as st
+import pandas as pd
+
+from pos_bitacora import valor_json
+from pos_reportes import analisis_rango, ventas_entre
+
+# ============================================
+# Cierres de caja
+# ============================================
+#
+# Cerrar un día congela su corte (líneas, totales por método de pago y
+# por categoría, producto más vendido) junto con una huella SHA-256 de
+# sus líneas de venta. Los cierres se guardan en una base SQLite local y
+# no se modifican: un día solo se cierra una vez.
+#
+# Al consultar un día cerrado se vuelve a calcular la huella con las
+# ventas actuales de ese día; si no coincide (se eliminó, agregó o editó
+# una venta después del cierre) el corte se marca como discrepancia.
+
+RUTA_CIERRES = os.environ.get("PALETERIA_CIERRES", "cierres_caja.db")
+
+# Campos de una línea de venta que entran en la huella del día
+CAMPOS_HUELLA = [
+    "fecha",
+    "hora",
+    "id_producto",
+    "cantidad",
+    "precio",
+    "descuento",
+    "extra",
+    "total",
+    "metodo_pago",
+]
+
+
+class DiaYaCerrado(Exception):
+    """
+    El día ya tiene un cierre de caja.
+    """
+
+    def __init__(self, fecha):
+        super().__init__(f"El día {fecha} ya tiene cierre de caja")
+        self.fecha = fecha
+
+
+def _texto_campo(valor, numerico):
+    if numerico:
+        numero = pd.to_numeric(valor, errors="coerce")
+        return "" if pd.isna(numero) else f"{float(numero):.2f}"
+    return "" if pd.isna(valor) else str(valor)
+
+
+def huella_ventas(df_dia):
+    """
+    SHA-256 de las líneas de venta de un día. No depende del orden de las
+    filas ni de si los números vienen como texto o como float.
+    """
+    numericos = {"cantidad", "precio", "descuento", "extra", "total"}
+    datos = df_dia.reindex(columns=CAMPOS_HUELLA)
+
+    lineas = sorted(
+        "|".join(
+            _texto_campo(valor, campo in numericos)
+            for campo, valor in zip(CAMPOS_HUELLA, fila)
+        )
+        for fila in datos.itertuples(index=False, name=None)
+    )
+
+    huella = hashlib.sha256()
+    for linea in lineas:
+        huella.update(linea.encode("utf-8"))
+        huella.update(b"\n")
+    return huella.hexdigest()
+
+
+def corte_del_dia(df_ventas, fecha):
+    """
+    Corte de `fecha` (ISO) calculado con las ventas actuales, con la
+    misma forma en que se guarda un cierre.
+    """
+    df_dia = ventas_entre(df_ventas, fecha, fecha)
+    tablas = analisis_rango(df_ventas, fecha, fecha)
+
+    por_producto = tablas["por_producto"]
+    producto_top = None
+    if not por_producto.empty:
+        producto_top = por_producto.iloc[0][
+            ["id_producto", "producto", "categoria", "cantidad", "total"]
+        ].to_dict()
+
+    return {
+        "fecha": fecha,
+        "lineas": len(df_dia),
+        "cantidad": float(tablas["por_dia"]["cantidad"].sum()),
+        "total": round(float(tablas["por_dia"]["total"].sum()), 2),
+        "por_metodo": tablas["por_metodo"].to_dict(orient="records"),
+        "por_categoria": tablas["por_categoria"].to_dict(orient="records"),
+        "producto_top": producto_top,
+        "huella": huella_ventas(df_dia),
+    }
+
+
+def diferencias(cierre, actual):
+    """
+    Diferencias entre un cierre y el corte actual del mismo día: lista de
+    {"concepto", "cierre", "actual"} (vacía si la huella coincide).
+    """
+    if cierre["huella"] == actual["huella"]:
+        return []
+
+    filas = [
+        {"concepto": "Líneas de venta", "cierre": cierre["lineas"], "actual": actual["lineas"]},
+        {"concepto": "Artículos", "cierre": cierre["cantidad"], "actual": actual["cantidad"]},
+        {"concepto": "Total", "cierre": cierre["total"], "actual": actual["total"]},
+    ]
+
+    metodos_cierre = {m["metodo_pago"]: m["total"] for m in cierre["por_metodo"]}
+    metodos_actual = {m["metodo_pago"]: m["total"] for m in actual["por_metodo"]}
+    for metodo in sorted(set(metodos_cierre) | set(metodos_actual)):
+        filas.append({
+            "concepto": f"Total {metodo}",
+            "cierre": round(metodos_cierre.get(metodo, 0.0), 2),
+            "actual": round(metodos_actual.get(metodo, 0.0), 2),
+        })
+
+    # Si los números cuadran, cambió el detalle (hora, producto, precio...)
+    cambiaron = [f for f in filas if f["cierre"] != f["actual"]]
+    return cambiaron or [{
+        "concepto": "Detalle de las ventas",
+        "cierre": cierre["huella"][:12],
+        "actual": actual["huella"][:12],
+    }]
+
+
+class CierresCaja:
+    def __init__(self, ruta=RUTA_CIERRES):
+        self.ruta = ruta
+        self._lock = threading.Lock()
+
+        self._conexion = sqlite3.connect(
+            ruta,
+            check_same_thread=False,
+            isolation_level=None,
+        )
+        self._conexion.execute("PRAGMA journal_mode=WAL")
+        self._conexion.execute("PRAGMA synchronous=FULL")
+        self._conexion.execute(
+            """
+            CREATE TABLE IF NOT EXISTS cierres (
+                fecha TEXT PRIMARY KEY,
+                cerrado TEXT NOT NULL,
+                huella TEXT NOT NULL,
+                datos TEXT NOT NULL
+            )
+            """
+        )
+
+    def cerrar(self, df_ventas, fecha):
+        """
+        Congela el corte de `fecha` (ISO). Lanza DiaYaCerrado si el día ya
+        tiene cierre. Devuelve el cierre guardado.
+        """
+        cierre = corte_del_dia(df_ventas, fecha)
+        cierre["cerrado"] = datetime.now().isoformat(timespec="seconds")
+
+        try:
+            with self._lock:
+                self._conexion.execute(
+                    "INSERT INTO cierres (fecha, cerrado, huella, datos) VALUES (?, ?, ?, ?)",
+                    (
+                        fecha,
+                        cierre["cerrado"],
+                        cierre["huella"],
+                        json.dumps(cierre, default=valor_json),
+                    ),
+                )
+        except sqlite3.IntegrityError:
+            raise DiaYaCerrado(fecha) from None
+
+        return cierre
+
+    def obtener(self, fecha):
+        """
+        Cierre de `fecha` (ISO) o None si el día no se ha cerrado.
+        """
+        with self._lock:
+            fila = self._conexion.execute(
+                "SELECT datos FROM cierres WHERE fecha = ?", (fecha,)
+            ).fetchone()
+        return json.loads(fila[0]) if fila else None
+
+    def fechas(self):
+        """
+        Fechas con cierre, de la más reciente a la más antigua.
+        """
+        with self._lock:
+            filas = self._conexion.execute(
+                "SELECT fecha FROM cierres ORDER BY fecha DESC"
+            ).fetchall()
+        return [fecha for fecha, in filas]
+
+    def revisar(self, df_ventas):
+        """
+        Compara cada cierre con las ventas actuales de su día. Devuelve
+        {fecha: diferencias} solo de los días que ya no cuadran.
+        """
+        with self._lock:
+            filas = self._conexion.execute(
+                "SELECT fecha, huella FROM cierres ORDER BY fecha"
+            ).fetchall()
+
+        discrepancias = {}
+        for fecha, huella in filas:
+            if huella_ventas(ventas_entre(df_ventas, fecha, fecha)) == huella:
+                continue
+            discrepancias[fecha] = diferencias(
+                self.obtener(fecha), corte_del_dia(df_ventas, fecha)
+            )
+        return discrepancias
+
+
+@st.cache_resource
+def obtener_cierres():
+    """
+    Cierres de caja compartidos por todas las sesiones.
+    """
+    return CierresCaja()
@@ -0,0 +1,208 @@
+import threading
+import time
+
+from pos_almacenes import (
+    crear_almacen,
+    normalizar_productos,
+    normalizar_ventas,
+)
+
+# Segundos que una lectura se reutiliza aunque nadie haya escrito, para
+# alcanzar ediciones hechas directamente en la hoja.
+TTL_CACHE_SEGUNDOS = 30
+
+# ============================================
+# Almacén activo
+# ============================================
+
+_almacen = None
+_lock_almacen = threading.Lock()
+
+def obtener_almacen():
+    """
+    Almacén configurado (Sheets, SQLite o CSV), compartido por todas las
+    sesiones del proceso.
+    """
+    global _almacen
+
+    with _lock_almacen:
+        if _almacen is None:
+            _almacen = crear_almacen()
+        return _almacen
+
+def usar_almacen(almacen):
+    """
+    Cambia el almacén activo (benchmarks, pruebas locales) y descarta la
+    caché de lecturas.
+    """
+    global _almacen
+
+    with _lock_almacen:
+        _almacen = almacen
+    invalidar_cache()
+
+# ============================================
+# Caché compartida de lecturas
+# ============================================
+
+# Una entrada por hoja, compartida por todas las sesiones del proceso.
+# Los escritores de este módulo suben la versión de la hoja que tocan.
+_versiones = {"productos": 0, "ventas": 0}
+_cache = {}
+_locks_cache = {nombre: threading.Lock() for nombre in _versiones}
+
+def _marcar_cambio(nombre):
+    with _locks_cache[nombre]:
+        _versiones[nombre] += 1
+        _cache.pop(nombre, None)
+
+def invalidar_cache(nombre=None):
+    """
+    Descarta las lecturas en caché (de una hoja o de todas) para forzar
+    la siguiente carga desde el almacén.
+    """
+    for n in ([nombre] if nombre else list(_versiones)):
+        _marcar_cambio(n)
+
+def _entrada_cache(nombre, leer):
+    with _locks_cache[nombre]:
+        entrada = _cache.get(nombre)
+        vigente = (
+            entrada is not None
+            and entrada["version"] == _versiones[nombre]
+            and time.monotonic() - entrada["momento"] < TTL_CACHE_SEGUNDOS
+        )
+
+        if not vigente:
+            entrada = {
+                "version": _versiones[nombre],
+                "momento": time.monotonic(),
+                "df": leer(),
+            }
+            _cache[nombre] = entrada
+
+        return entrada
+
+def _cargar_con_cache(nombre, leer):
+    # Copia para que los cambios locales de una sesión no toquen la caché
+    return _entrada_cache(nombre, leer)["df"].copy()
+
+# ============================================
+# Funciones auxiliares
+# ============================================
+
+def cargar_productos():
+    """
+    Catálogo de productos. Se lee del almacén solo si cambió la versión o
+    venció el TTL; si no, se sirve de la caché compartida.
+    """
+    return _cargar_con_cache("productos", _leer_productos)
+
+def _leer_productos():
+    almacen = obtener_almacen()
+    df = normalizar_productos(almacen.leer_productos())
+    almacen.productos_leidos(df)
+    return df
+
+def guardar_productos(df):
+    obtener_almacen().escribir_productos(df)
+    _marcar_cambio("productos")
+
+# ============================================
+# Índice de productos
+# ============================================
+#
+# Buscar un producto con df["id_producto"] == id recorre todo el
+# catálogo, y un cobro de k líneas lo hacía k veces. El índice
+# {id_producto: posición} se arma una vez por lectura del catálogo, se
+# guarda junto a ella en la caché y cada búsqueda cuesta O(1).
+#
+# Las copias que reparte cargar_productos conservan el orden de la
+# lectura. Aun así cada posición se comprueba contra el df consultado:
+# si no coincide (p. ej. el df lleva un producto recién agregado en la
+# sesión) se arma un índice propio para ese df.
+
+def _armar_indice(df):
+    ids = df["id_producto"].astype(str).tolist()
+    # Al recorrer al revés, con ids repetidos gana la primera fila
+    return dict(zip(reversed(ids), range(len(ids) - 1, -1, -1)))
+
+def derivado_productos(clave, armar):
+    """
+    armar(catálogo) calculado una vez por lectura del catálogo y guardado
+    junto a ella en la caché: se vuelve a armar cuando cambia la versión
+    o vence el TTL. Se comparte entre sesiones, no se debe modificar.
+    """
+    entrada = _entrada_cache("productos", _leer_productos)
+    with _locks_cache["productos"]:
+        derivados = entrada.setdefault("derivados", {})
+        if clave not in derivados:
+            derivados[clave] = armar(entrada["df"])
+        return derivados[clave]
+
+def _indice_en_cache():
+    return derivado_productos("indice", lambda df: (_armar_indice(df), len(df)))
+
+def posiciones_productos(df_productos, ids):
+    """
+    {id_producto (texto): posición en df_productos} de los ids que están
+    en el catálogo; los que no existen no aparecen. Con los df que
+    devuelve cargar_productos cuesta O(len(ids)).
+    """
+    ids = [str(i) for i in ids]
+    indice, filas = _indice_en_cache()
+    columna = df_productos["id_producto"]
+
+    if len(df_productos) == filas:
+        posiciones = {i: indice[i] for i in ids if i in indice}
+        if all(str(columna.iat[p]) == i for i, p in posiciones.items()):
+            return posiciones
+
+    indice = _armar_indice(df_productos)
+    return {i: indice[i] for i in ids if i in indice}
+
+def cargar_ventas():
+    """
+    Historial de ventas, servido desde la caché compartida mientras no
+    cambie la versión ni venza el TTL.
+    """
+    return _cargar_con_cache("ventas", _leer_ventas)
+
+def _leer_ventas():
+    almacen = obtener_almacen()
+    df = normalizar_ventas(almacen.leer_ventas())
+    # Viaja con el df (y sus copias) hasta los resúmenes de pos_reportes
+    df.attrs["generacion"] = almacen.generacion_ventas
+    return df
+
+def guardar_ventas(df):
+    """
+    Reescribe el historial de ventas completo. El flujo normal de cobro
+    usa agregar_ventas y nunca reescribe el historial.
+    """
+    obtener_almacen().escribir_ventas(df.drop(columns=["momento"], errors="ignore"))
+    _marcar_cambio("ventas")
+
+def agregar_ventas(filas, df_ventas=None):
+    """
+    Agrega solo las filas del ticket nuevo al final del historial. Si el
+    almacén no tiene todas las columnas del ticket (p. ej. "extra"),
+    reescribe el historial con df_ventas (o las ventas actuales) más las
+    filas nuevas.
+    """
+    if not filas:
+        return
+
+    if df_ventas is not None:
+        df_ventas = df_ventas.drop(columns=["momento"], errors="ignore")
+
+    obtener_almacen().agregar_ventas(filas, df_ventas)
+    _marcar_cambio("ventas")
+
+def eliminar_venta(posicion):
+    """
+    Elimina la venta en la posición dada del historial (base 0, el mismo
+    índice que devuelve cargar_ventas).
+    """
+    obtener_almacen().eliminar_venta(posicion)
+    _marcar_cambio("ventas")
@@ -0,0 +1,127 @@
+import io
+import os
+import tempfile
+
+import pandas as pd
+from openpyxl import Workbook
+
+# ============================================
+# Exportación de reportes
+# ============================================
+#
+# Los archivos se escriben por lotes de FILAS_POR_LOTE filas en un
+# archivo temporal en disco, en vez de armar todo el texto con to_csv()
+# de una vez. Para Excel se usa el modo write_only de openpyxl, que no
+# guarda las celdas de la hoja en memoria.
+#
+# Los exportadores devuelven el archivo abierto para lectura, no sus
+# bytes: st.download_button lo lee directamente y el temporal se borra
+# cuando se cierra. Con st.download_button(data=partial(exportar_csv,
+# df)) el archivo se genera hasta que se hace clic, en otro hilo, sin
+# detener la página.
+# En lugar de un DataFrame se puede pasar una función que lo devuelve
+# (p. ej. partial(archivo.consultar, f_ini, f_fin)): los datos también se
+# leen hasta el clic.
+#
+# La columna interna "momento" no se exporta (tampoco se guarda en el
+# almacén).
+
+FILAS_POR_LOTE = 20_000
+
+# Filas por hoja de Excel, sin el encabezado; lo que sobra sigue en
+# otra hoja con el mismo nombre y un número
+MAX_FILAS_HOJA = 1_048_575
+
+MIME_CSV = "text/csv"
+MIME_XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+def _datos(df):
+    return df() if callable(df) else df
+
+
+def _columnas(df, columnas=None):
+    return list(columnas or [c for c in df.columns if c != "momento"])
+
+
+def lotes(df, columnas=None, filas_por_lote=FILAS_POR_LOTE):
+    """
+    Rebanadas consecutivas de df con las columnas a exportar (sin copiar
+    el DataFrame completo).
+    """
+    columnas = _columnas(df, columnas)
+    for inicio in range(0, len(df), filas_por_lote):
+        yield df.iloc[inicio:inicio + filas_por_lote][columnas]
+
+
+def _archivo_temporal():
+    return tempfile.TemporaryFile(mode="w+b")
+
+
+def _para_descarga(archivo):
+    """
+    El archivo temporal ya escrito, abierto de nuevo solo para lectura
+    (io.BufferedReader, uno de los tipos que acepta st.download_button).
+    El temporal sigue en disco hasta que se cierra lo que se devuelve.
+    """
+    with archivo:
+        archivo.flush()
+        return open(os.dup(archivo.fileno()), "rb")
+
+
+def exportar_csv(df, columnas=None):
+    """
+    CSV (UTF-8) con las filas de df, escrito por lotes. Devuelve el
+    archivo abierto para lectura.
+    """
+    df = _datos(df)
+    columnas = _columnas(df, columnas)
+    archivo = _archivo_temporal()
+
+    texto = io.TextIOWrapper(archivo, encoding="utf-8", newline="")
+    if df.empty:
+        pd.DataFrame(columns=columnas).to_csv(texto, index=False)
+    for i, lote in enumerate(lotes(df, columnas)):
+        lote.to_csv(texto, index=False, header=(i == 0))
+    texto.flush()
+    texto.detach()
+
+    return _para_descarga(archivo)
+
+
+def _filas_excel(lote):
+    # Celdas vacías en vez de "nan"
+    datos = lote.astype(object).where(lote.notna(), None)
+    return datos.itertuples(index=False, name=None)
+
+
+def exportar_xlsx(hojas):
+    """
+    Libro de Excel con una hoja por cada (nombre, DataFrame) de `hojas`,
+    escrito fila por fila en modo write_only. Devuelve el archivo
+    abierto para lectura.
+    """
+    libro = Workbook(write_only=True)
+
+    for nombre, df in hojas.items():
+        df = _datos(df)
+        columnas = _columnas(df)
+        parte = 1
+        hoja = libro.create_sheet(title=nombre[:31])
+        hoja.append([str(c) for c in columnas])
+        filas_hoja = 0
+
+        for lote in lotes(df, columnas):
+            for fila in _filas_excel(lote):
+                if filas_hoja == MAX_FILAS_HOJA:
+                    parte += 1
+                    sufijo = f" ({parte})"
+                    hoja = libro.create_sheet(title=nombre[:31 - len(sufijo)] + sufijo)
+                    hoja.append([str(c) for c in columnas])
+                    filas_hoja = 0
+                hoja.append(fila)
+                filas_hoja += 1
+
+    archivo = _archivo_temporal()
+    libro.save(archivo)
+    return _para_descarga(archivo)
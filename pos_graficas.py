@@ -0,0 +1,82 @@
+import json
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+# ============================================
+# Caché de gráficas
+# ============================================
+#
+# Armar una figura de plotly.express cuesta decenas de milisegundos y
+# Streamlit las vuelve a armar en cada rerun (en inventario, con cada
+# tecla del buscador) aunque las tablas agregadas no hayan cambiado.
+#
+# figura() guarda cada figura bajo una huella de los datos que grafica
+# (hash de los valores y el índice, columnas y tipos) más las opciones
+# de la gráfica. Si nada cambió, devuelve la misma figura; si cambió, la
+# arma de nuevo. Las figuras se descartan de la menos usada a la más usada
+# cuando se pasa de MAX_FIGURAS o de MAX_MB_FIGURAS.
+
+MAX_FIGURAS = 64
+MAX_MB_FIGURAS = 64
+
+# Memoria fija de una figura aparte de sus datos (layout, plantilla)
+BYTES_BASE_FIGURA = 20_000
+
+_figuras = OrderedDict()   # huella -> (figura, bytes estimados)
+_bytes = 0
+_lock = threading.Lock()
+
+def _huella(funcion, df, opciones):
+    # El índice cuenta: px.imshow lo usa como eje
+    valores = pd.util.hash_pandas_object(df, index=True).to_numpy()
+    return (
+        funcion.__module__,
+        funcion.__name__,
+        tuple(df.columns),
+        tuple(str(t) for t in df.dtypes),
+        len(df),
+        hash(valores.tobytes()),
+        json.dumps(opciones, sort_keys=True, default=str),
+    )
+
+def figura(funcion, df, trazas=None, diseno=None, **opciones):
+    """
+    Figura funcion(df, **opciones) (px.bar, px.pie, ...) con
+    update_traces(**trazas) y update_layout(**diseno) ya aplicados.
+
+    La figura puede ser compartida con otras sesiones: se pasa tal cual a
+    st.plotly_chart y no se modifica.
+    """
+    huella = _huella(
+        funcion, df, {"opciones": opciones, "trazas": trazas, "diseno": diseno}
+    )
+
+    with _lock:
+        guardada = _figuras.get(huella)
+        if guardada is not None:
+            _figuras.move_to_end(huella)
+            return guardada[0]
+
+    fig = funcion(df, **opciones)
+    if trazas:
+        fig.update_traces(**trazas)
+    if diseno:
+        fig.update_layout(**diseno)
+
+    # Plotly copia las columnas graficadas a la figura
+    tamano = BYTES_BASE_FIGURA + int(df.memory_usage(index=False, deep=True).sum())
+
+    global _bytes
+    with _lock:
+        if huella not in _figuras:
+            _figuras[huella] = (fig, tamano)
+            _bytes += tamano
+        while _figuras and (
+            len(_figuras) > MAX_FIGURAS or _bytes > MAX_MB_FIGURAS * 1024 * 1024
+        ):
+            _, (_, descartado) = _figuras.popitem(last=False)
+            _bytes -= descartado
+
+    return fig
@@ -0,0 +1,848 @@
+import heapq
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pandas as pd
+
+# ============================================
+# Resumen diario de ventas
+# ============================================
+#
+# Tabla acumulada por fecha × producto × categoría × método de pago con
+# la suma de cantidad, total, descuento y extra (y el número de líneas),
+# más el costo de lo vendido y las ventas de las líneas que registraron
+# su costo al cobrarse (para el margen).
+# Los reportes la consultan en vez del historial completo: un año de
+# ventas son ~365 × productos filas aunque haya millones de líneas.
+#
+# Se mantiene de forma incremental y es compartida por todas las sesiones
+# del proceso:
+#   - sumar_ventas(filas) al confirmar un cobro;
+#   - restar_venta(df_ventas, posicion) al eliminar una venta;
+#   - resumen_diario(df_ventas) resume solo las filas que aparecieron al
+#     final del historial (ventas de otros procesos, por ejemplo). Si la
+#     última fila resumida ya no está en su lugar, o el almacén releyó el
+#     historial completo (pudo haber ediciones a mano en medio de la
+#     hoja), se recalcula completo.
+#
+# Junto al resumen se lleva, con las mismas filas, la tabla por hora:
+# fecha × hora del día ("00" a "23") × categoría, para el reporte de
+# horarios de venta; y el conteo de productos destacados de todo el
+# historial (ConteoDestacados).
+
+CLAVES_RESUMEN = ["fecha", "id_producto", "producto", "categoria", "metodo_pago"]
+MEDIDAS_RESUMEN = [
+    "cantidad", "total", "descuento", "extra", "costo_total", "total_con_costo",
+]
+
+CLAVES_HORAS = ["fecha", "hora", "categoria"]
+MEDIDAS_HORAS = ["cantidad", "total"]
+
+# Hora del día como texto, por número de hora (24 = hora no válida)
+_HORAS = np.array([f"{h:02d}" for h in range(24)] + [""], dtype=object)
+
+_lock = threading.Lock()
+_lock_recalculo = threading.Lock()
+# resumen: DataFrame indexado por CLAVES_RESUMEN (ordenado); horas: ídem
+# por CLAVES_HORAS; destacados: ConteoDestacados; filas: líneas del
+# historial que cubren; ancla: clave de la última de ellas; generacion:
+# la del almacén al leer ese historial (df.attrs["generacion"]); version:
+# sube cada vez que cambian las tablas.
+_estado = {
+    "resumen": None,
+    "horas": None,
+    "destacados": None,
+    "filas": 0,
+    "ancla": None,
+    "generacion": None,
+    "version": 0,
+}
+
+def clave_venta(fila):
+    """
+    Identifica una venta para reconocerla al comparar el historial con lo
+    que ya se resumió (los números pueden venir como texto o como float).
+    """
+    total = pd.to_numeric(fila.get("total"), errors="coerce")
+    return (
+        str(fila.get("fecha")),
+        str(fila.get("hora")),
+        str(fila.get("id_producto")),
+        0.0 if pd.isna(total) else round(float(total), 2),
+    )
+
+def _agrupar(df, claves=CLAVES_RESUMEN, medidas=MEDIDAS_RESUMEN):
+    """
+    Agrupa líneas de venta por claves (CLAVES_RESUMEN por omisión).
+    """
+    datos = df.reindex(columns=claves + medidas)
+
+    for col in claves:
+        datos[col] = datos[col].fillna("").astype(str)
+    for col in medidas:
+        datos[col] = pd.to_numeric(datos[col], errors="coerce").fillna(0.0).astype(float)
+    datos["lineas"] = 1
+
+    if "costo_total" in medidas:
+        # Solo las líneas con costo registrado cuentan para el margen
+        costo = pd.to_numeric(
+            df["costo"] if "costo" in df.columns else pd.Series(np.nan, index=df.index),
+            errors="coerce",
+        )
+        datos["costo_total"] = costo.fillna(0.0) * datos["cantidad"]
+        datos["total_con_costo"] = datos["total"].where(costo.notna(), 0.0)
+
+    return datos.groupby(claves, sort=True)[medidas + ["lineas"]].sum()
+
+def _agrupar_horas(df):
+    """
+    Agrupa líneas de venta por CLAVES_HORAS. La hora sale de "momento"
+    si el historial ya viene normalizado, o del texto de "hora" (filas
+    de un ticket recién cobrado). Las líneas con una hora que no se
+    entiende quedan con hora "" y no cuentan en ninguna hora del día.
+    """
+    datos = df.reindex(columns=["fecha", "categoria"] + MEDIDAS_HORAS)
+    texto = df.get("hora", pd.Series("", index=df.index))
+
+    if "momento" in df.columns:
+        momentos = df["momento"].to_numpy()
+        horas = df["momento"].dt.hour.fillna(24).to_numpy(dtype=int, copy=True)
+        # Una hora ilegible deja el momento a las 00:00 de su fecha: las
+        # filas a medianoche exacta se revisan contra el texto de "hora"
+        medianoche = momentos == momentos.astype("datetime64[D]")
+        if medianoche.any():
+            horas[medianoche] = _horas_del_texto(texto[medianoche])
+    else:
+        horas = _horas_del_texto(texto)
+
+    datos["hora"] = _HORAS[horas]
+    return _agrupar(datos, CLAVES_HORAS, MEDIDAS_HORAS)
+
+def _horas_del_texto(texto):
+    """
+    Hora del día (0 a 23) de cada texto "H:MM" o "HH:MM:SS"; 24 si no se
+    entiende.
+    """
+    horas = pd.to_numeric(
+        texto.astype(str).str.strip().str.extract(
+            r"^(\d{1,2}):[0-5]\d(?::[0-5]\d)?$", expand=False
+        ),
+        errors="coerce",
+    )
+    return horas.where(horas < 24).fillna(24).astype(int).to_numpy()
+
+def _aplicar(resumen, delta):
+    """
+    Suma delta (ya agrupado) al resumen sin modificarlo. Las claves que
+    se quedan sin líneas se eliminan.
+    """
+    if resumen is None:
+        resumen = delta.iloc[0:0]
+
+    posiciones = resumen.index.get_indexer(delta.index)
+    existentes = posiciones >= 0
+
+    valores = resumen.to_numpy(copy=True)
+    valores[posiciones[existentes]] += delta.to_numpy()[existentes]
+    resultado = pd.DataFrame(valores, index=resumen.index, columns=resumen.columns)
+
+    if not existentes.all():
+        resultado = pd.concat([resultado, delta[~existentes]]).sort_index()
+
+    vacias = resultado["lineas"] <= 0
+    if vacias.any():
+        resultado = resultado[~vacias]
+
+    return resultado.astype({"lineas": int})
+
+def _cantidad_entera(cantidad):
+    """
+    Las cantidades se suman como float junto con los importes: vuelven a
+    int (Series o arreglo) si todas son enteras.
+    """
+    if (cantidad % 1 == 0).all():
+        return cantidad.astype(int)
+    return cantidad
+
+def _recordar(resumen, horas, filas, ancla):
+    if resumen is not _estado["resumen"] or horas is not _estado["horas"]:
+        _estado["version"] += 1
+    _estado["resumen"] = resumen
+    _estado["horas"] = horas
+    _estado["filas"] = filas
+    _estado["ancla"] = ancla
+
+def resumen_diario(df_ventas):
+    """
+    Resumen de df_ventas (el historial tal como lo ven los reportes,
+    pendientes incluidos). Solo agrupa las filas nuevas desde la última
+    llamada; no modificar el DataFrame devuelto.
+    """
+    return _al_dia(df_ventas)[0]
+
+def _al_dia(df_ventas):
+    """
+    Pone al día las tablas con df_ventas y devuelve (resumen, horas,
+    version).
+
+    El recálculo completo se hace fuera de _lock, para que sumar_ventas
+    (en cada cobro) no espere a que termine; _lock_recalculo evita que
+    dos sesiones recalculen a la vez.
+    """
+    resultado = _al_dia_incremental(df_ventas)
+    if resultado is not None:
+        return resultado
+
+    with _lock_recalculo:
+        # Otra sesión pudo recalcular mientras se esperaba
+        resultado = _al_dia_incremental(df_ventas)
+        if resultado is not None:
+            return resultado
+
+        resumen, horas = agrupar_historial(df_ventas)
+        destacados = ConteoDestacados.desde_resumen(resumen)
+
+        with _lock:
+            # Un cobro confirmado durante el recálculo no está en estas
+            # tablas, pero sí al final del siguiente df_ventas
+            _estado["destacados"] = destacados
+            _recordar(resumen, horas, len(df_ventas), _ancla(df_ventas))
+            _estado["generacion"] = df_ventas.attrs.get("generacion")
+            return resumen, horas, _estado["version"]
+
+def _ancla(df_ventas):
+    return clave_venta(df_ventas.iloc[-1]) if len(df_ventas) else None
+
+def _al_dia_incremental(df_ventas):
+    """
+    Agrega a las tablas las filas nuevas al final de df_ventas y devuelve
+    (resumen, horas, version); None si hay que recalcular completo.
+    """
+    with _lock:
+        resumen = _estado["resumen"]
+        horas = _estado["horas"]
+        n = _estado["filas"]
+
+        vigente = (
+            resumen is not None
+            and df_ventas.attrs.get("generacion") == _estado["generacion"]
+            and len(df_ventas) >= n
+            and (n == 0 or clave_venta(df_ventas.iloc[n - 1]) == _estado["ancla"])
+        )
+        if not vigente:
+            return None
+
+        if len(df_ventas) > n:
+            nuevas = df_ventas.iloc[n:]
+            delta = _agrupar(nuevas)
+            resumen = _aplicar(resumen, delta)
+            horas = _aplicar(horas, _agrupar_horas(nuevas))
+            _estado["destacados"].aplicar(delta)
+
+        _recordar(resumen, horas, len(df_ventas), _ancla(df_ventas))
+        return resumen, horas, _estado["version"]
+
+def sumar_ventas(filas):
+    """
+    Agrega al resumen las filas de un ticket recién confirmado. Quedan al
+    final del historial, así que la siguiente consulta no las repite.
+    """
+    with _lock:
+        if _estado["resumen"] is None or not filas:
+            return
+
+        df_filas = pd.DataFrame(filas)
+        delta = _agrupar(df_filas)
+        _estado["destacados"].aplicar(delta)
+        _recordar(
+            _aplicar(_estado["resumen"], delta),
+            _aplicar(_estado["horas"], _agrupar_horas(df_filas)),
+            _estado["filas"] + len(filas),
+            clave_venta(filas[-1]),
+        )
+
+def restar_venta(df_ventas, posicion):
+    """
+    Quita del resumen la venta que estaba en `posicion` de df_ventas (el
+    historial guardado, antes de eliminarla).
+    """
+    with _lock:
+        resumen = _estado["resumen"]
+        n = _estado["filas"]
+
+        if resumen is None or posicion >= n:
+            return
+
+        # El resumen debe cubrir este historial; si no, se recalcula en la
+        # siguiente consulta
+        if (
+            df_ventas.attrs.get("generacion") != _estado["generacion"]
+            or n <= len(df_ventas) and clave_venta(df_ventas.iloc[n - 1]) != _estado["ancla"]
+        ):
+            _estado["destacados"] = None
+            _recordar(None, None, 0, None)
+            return
+
+        ancla = _estado["ancla"]
+        if posicion == n - 1:
+            ancla = clave_venta(df_ventas.iloc[posicion - 1]) if posicion else None
+
+        venta = df_ventas.iloc[[posicion]]
+        delta = -_agrupar(venta)
+        _estado["destacados"].aplicar(delta)
+        _recordar(
+            _aplicar(resumen, delta),
+            _aplicar(_estado["horas"], -_agrupar_horas(venta)),
+            n - 1,
+            ancla,
+        )
+
+def resumen_en_rango(resumen, f_ini, f_fin):
+    """
+    Filas del resumen entre dos fechas ISO (inclusive), con las claves
+    como columnas. Usa el orden del índice en vez de recorrer el resumen.
+    """
+    if resumen.empty:
+        return pd.DataFrame(columns=CLAVES_RESUMEN + MEDIDAS_RESUMEN + ["lineas"])
+
+    filas = resumen.loc[f_ini:f_fin].reset_index()
+
+    filas["cantidad"] = _cantidad_entera(filas["cantidad"])
+    return filas
+
+# ============================================
+# Recalcular en paralelo por mes
+# ============================================
+#
+# Un recálculo completo del resumen (al arrancar, o si cambió una venta
+# ya resumida) agrupa todo el historial. Con historiales grandes se
+# reparte por mes entre procesos: cada mes se agrupa por separado y los
+# parciales se juntan sumando (las sumas y conteos se pueden combinar en
+# cualquier orden).
+#
+# Está apagado por omisión: cada mes se serializa y se envía a un proceso
+# nuevo (spawn), y en una máquina de un núcleo eso hace el recálculo más
+# lento (benchmarks/bench_paralelo.py: 1M ventas, 0.83 s con un proceso y
+# 1.98 s con dos). Se enciende con PALETERIA_PROCESOS_REPORTES después de
+# medir con ese benchmark en la máquina donde corre la app.
+
+PROCESOS_REPORTES = int(os.environ.get("PALETERIA_PROCESOS_REPORTES", 1))
+
+# Con menos filas, repartir cuesta más de lo que ahorra
+MIN_FILAS_PARALELO = int(
+    os.environ.get("PALETERIA_MIN_FILAS_PARALELO", 500_000)
+)
+
+# Columnas que necesita un proceso para agrupar su mes
+_COLUMNAS_PARTE = list(dict.fromkeys(
+    CLAVES_RESUMEN
+    + ["cantidad", "total", "descuento", "extra", "costo", "hora", "momento"]
+))
+
+_procesos = {"pool": None, "trabajadores": 0}
+_lock_procesos = threading.Lock()
+
+def _pool(trabajadores):
+    """
+    Procesos compartidos por todas las sesiones; se crean en el primer
+    uso (spawn: el servidor de Streamlit tiene hilos).
+    """
+    with _lock_procesos:
+        if _procesos["pool"] is None or _procesos["trabajadores"] != trabajadores:
+            if _procesos["pool"] is not None:
+                _procesos["pool"].shutdown(wait=False, cancel_futures=True)
+            _procesos["pool"] = ProcessPoolExecutor(
+                max_workers=trabajadores,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            _procesos["trabajadores"] = trabajadores
+        return _procesos["pool"]
+
+def _particiones_mes(df_ventas):
+    """
+    Límites [inicio, fin) de las filas de cada mes, por búsqueda binaria
+    sobre "momento". None si df_ventas no está ordenado por momento (las
+    filas sin momento válido pueden ir al final, en la última parte).
+    """
+    if "momento" not in df_ventas.columns:
+        return None
+
+    momentos = df_ventas["momento"].to_numpy()
+    validos = int((~np.isnat(momentos)).sum())
+    if validos == 0 or not np.isnat(momentos[validos:]).all():
+        return None
+    if not (momentos[1:validos] >= momentos[:validos - 1]).all():
+        return None
+
+    meses = pd.date_range(
+        pd.Timestamp(momentos[0]).to_period("M").start_time,
+        pd.Timestamp(momentos[validos - 1]),
+        freq="MS",
+    )
+    inicios = np.searchsorted(momentos[:validos], meses.to_numpy(), side="left")
+    limites = list(dict.fromkeys([0, *inicios.tolist(), len(df_ventas)]))
+    return list(zip(limites[:-1], limites[1:]))
+
+def _agrupar_parte(parte):
+    return _agrupar(parte), _agrupar_horas(parte)
+
+def _juntar(parciales):
+    """
+    Suma tablas agrupadas (mismas columnas e índice) en una sola, ordenada.
+    """
+    tabla = pd.concat(parciales)
+    if not tabla.index.is_unique:
+        tabla = tabla.groupby(level=list(range(tabla.index.nlevels)), sort=True).sum()
+    elif not tabla.index.is_monotonic_increasing:
+        tabla = tabla.sort_index()
+    return tabla.astype({"lineas": int})
+
+def agrupar_historial(df_ventas, procesos=None):
+    """
+    Resumen y tabla por hora de df_ventas completo. Con al menos
+    MIN_FILAS_PARALELO filas y más de un proceso (PROCESOS_REPORTES por
+    omisión), agrupa cada mes en un proceso aparte y junta los parciales.
+    """
+    procesos = PROCESOS_REPORTES if procesos is None else procesos
+    partes = None
+    if procesos > 1 and len(df_ventas) >= MIN_FILAS_PARALELO:
+        partes = _particiones_mes(df_ventas)
+
+    if not partes or len(partes) < 2:
+        return _agrupar_parte(df_ventas)
+
+    datos = df_ventas[[c for c in _COLUMNAS_PARTE if c in df_ventas.columns]]
+    try:
+        pool = _pool(procesos)
+        resultados = list(pool.map(
+            _agrupar_parte, (datos.iloc[i:j] for i, j in partes)
+        ))
+    except (BrokenProcessPool, OSError):
+        # Sin procesos disponibles: se agrupa aquí mismo
+        with _lock_procesos:
+            _procesos["pool"] = None
+        return _agrupar_parte(df_ventas)
+
+    return (
+        _juntar([resumen for resumen, _ in resultados]),
+        _juntar([horas for _, horas in resultados]),
+    )
+
+# ============================================
+# Análisis de un rango de fechas
+# ============================================
+#
+# Todas las tablas de los reportes salen de una sola pasada sobre las
+# filas del resumen en el rango: los códigos enteros del índice del
+# resumen (uno por fecha, producto, categoría y método de pago) sirven
+# de clave para np.bincount, sin groupby ni columnas de texto nuevas.
+
+MAX_ANALISIS_EN_CACHE = 32
+
+_analisis = OrderedDict()
+_lock_analisis = threading.Lock()
+
+def _sumar_por(codigos, n, medidas):
+    """
+    Suma cantidad y total por código. Devuelve los códigos presentes y
+    sus sumas.
+    """
+    presentes = np.flatnonzero(np.bincount(codigos, minlength=n))
+    sumas = [
+        np.bincount(codigos, weights=medidas[:, k], minlength=n)[presentes]
+        for k in range(medidas.shape[1])
+    ]
+    return presentes, sumas
+
+def _tablas_por_clave(filas, medidas):
+    """
+    Sumas de `medidas` de las filas del resumen por método de pago,
+    producto, categoría y fecha, sin ordenar.
+    """
+    columnas = {
+        "por_metodo": ["metodo_pago"],
+        "por_producto": ["id_producto", "producto", "categoria", "categoria_producto"],
+        "por_categoria": ["categoria"],
+        "por_dia": ["fecha"],
+    }
+    if filas.empty:
+        return {
+            nombre: pd.DataFrame(columns=claves + medidas)
+            for nombre, claves in columnas.items()
+        }
+
+    indice = filas.index
+    niveles = dict(zip(indice.names, indice.levels))
+    codigos = dict(zip(indice.names, (np.asarray(c, dtype=np.int64) for c in indice.codes)))
+    valores = filas[medidas].to_numpy(dtype=float)
+
+    def tabla(clave):
+        presentes, sumas = _sumar_por(codigos[clave], len(niveles[clave]), valores)
+        return pd.DataFrame({clave: niveles[clave][presentes], **dict(zip(medidas, sumas))})
+
+    # Producto = (id_producto, producto, categoria) combinados en un entero
+    n_prod, n_cat = len(niveles["producto"]), len(niveles["categoria"])
+    combinado = (
+        codigos["id_producto"] * n_prod + codigos["producto"]
+    ) * n_cat + codigos["categoria"]
+    unicos, inverso = np.unique(combinado, return_inverse=True)
+    _, sumas = _sumar_por(inverso, len(unicos), valores)
+
+    c_cat = unicos % n_cat
+    c_prod = (unicos // n_cat) % n_prod
+    c_id = unicos // n_cat // n_prod
+    por_producto = pd.DataFrame({
+        "id_producto": niveles["id_producto"][c_id],
+        "producto": niveles["producto"][c_prod],
+        "categoria": niveles["categoria"][c_cat],
+        **dict(zip(medidas, sumas)),
+    })
+    por_producto.insert(
+        3,
+        "categoria_producto",
+        por_producto["categoria"] + " - " + por_producto["producto"],
+    )
+
+    tablas = {
+        "por_metodo": tabla("metodo_pago"),
+        "por_producto": por_producto,
+        "por_categoria": tabla("categoria"),
+        "por_dia": tabla("fecha"),
+    }
+
+    for df in tablas.values():
+        df["cantidad"] = _cantidad_entera(df["cantidad"])
+
+    return tablas
+
+def _ordenar(tablas, por, producto_por=None):
+    """
+    Ordena de mayor a menor por `por` (por_producto por producto_por, si
+    se indica); por_dia queda por fecha.
+    """
+    for nombre, df in tablas.items():
+        if nombre != "por_dia":
+            columna = producto_por if nombre == "por_producto" and producto_por else por
+            df = df.sort_values(columna, ascending=False, kind="stable")
+        tablas[nombre] = df.reset_index(drop=True)
+    return tablas
+
+def _tablas_rango(filas):
+    return _ordenar(
+        _tablas_por_clave(filas, ["cantidad", "total"]), "total", "cantidad"
+    )
+
+def _en_cache(clave, calcular):
+    """
+    Tablas de calcular() guardadas en caché bajo clave; cada llamada
+    recibe copias que puede modificar.
+    """
+    with _lock_analisis:
+        tablas = _analisis.get(clave)
+        if tablas is not None:
+            _analisis.move_to_end(clave)
+
+    if tablas is None:
+        tablas = calcular()
+
+        with _lock_analisis:
+            _analisis[clave] = tablas
+            while len(_analisis) > MAX_ANALISIS_EN_CACHE:
+                _analisis.popitem(last=False)
+
+    return {nombre: df.copy() for nombre, df in tablas.items()}
+
+def _filas_rango(resumen, f_ini, f_fin):
+    return resumen if resumen.empty else resumen.loc[str(f_ini):str(f_fin)]
+
+def analisis_rango(df_ventas, f_ini, f_fin):
+    """
+    Tablas de los reportes para las ventas entre dos fechas ISO
+    (inclusive), calculadas juntas desde el resumen diario:
+
+        por_metodo     metodo_pago, cantidad, total (mayor total primero)
+        por_producto   id_producto, producto, categoria,
+                       categoria_producto, cantidad, total (más vendido
+                       primero)
+        por_categoria  categoria, cantidad, total (mayor total primero)
+        por_dia        fecha, cantidad, total (por fecha)
+
+    Se guardan en caché por (f_ini, f_fin, versión del resumen); cada
+    llamada recibe copias que puede modificar.
+    """
+    resumen, _, version = _al_dia(df_ventas)
+    return _en_cache(
+        ("rango", str(f_ini), str(f_fin), version),
+        lambda: _tablas_rango(_filas_rango(resumen, f_ini, f_fin)),
+    )
+
+def _tablas_margen(filas):
+    tablas = _tablas_por_clave(
+        filas, ["cantidad", "total", "costo_total", "total_con_costo"]
+    )
+    for nombre, df in tablas.items():
+        utilidad = df["total_con_costo"] - df["costo_total"]
+        con_costo = df["total_con_costo"].to_numpy(dtype=float)
+        tablas[nombre] = df.assign(
+            costo=df["costo_total"],
+            utilidad=utilidad,
+            margen=np.divide(
+                utilidad.to_numpy(dtype=float),
+                con_costo,
+                out=np.full(len(df), np.nan),
+                where=con_costo != 0,
+            ),
+            sin_costo=df["total"] - df["total_con_costo"],
+        ).drop(columns=["costo_total", "total_con_costo"])
+    return _ordenar(tablas, "utilidad")
+
+def analisis_margen(df_ventas, f_ini, f_fin):
+    """
+    Utilidad bruta entre dos fechas ISO (inclusive) por método de pago,
+    producto, categoría y día (mismas claves que analisis_rango), con el
+    costo que se registró en cada venta:
+
+        cantidad, total  todas las ventas
+        costo            costo de lo vendido (líneas con costo)
+        utilidad         ventas con costo - costo
+        margen           utilidad / ventas con costo (NaN si no hay)
+        sin_costo        ventas sin costo registrado (anteriores a que se
+                         guardara), que no entran a la utilidad
+
+    De mayor a menor utilidad; por_dia por fecha. En caché igual que
+    analisis_rango.
+    """
+    resumen, _, version = _al_dia(df_ventas)
+    return _en_cache(
+        ("margen", str(f_ini), str(f_fin), version),
+        lambda: _tablas_margen(_filas_rango(resumen, f_ini, f_fin)),
+    )
+
+def ventas_entre(df_ventas, f_ini, f_fin):
+    """
+    Ventas entre dos fechas (ISO o date, inclusive). df_ventas debe estar
+    ordenado por "momento", como lo entregan cargar_ventas y
+    cargar_ventas_al_dia: el rango se ubica con búsqueda binaria y se
+    devuelve una rebanada, sin recorrer el historial.
+    """
+    inicio = pd.Timestamp(f_ini).normalize()
+    fin = pd.Timestamp(f_fin).normalize() + pd.Timedelta(days=1)
+
+    momentos = df_ventas["momento"]
+    i = momentos.searchsorted(inicio, side="left")
+    j = momentos.searchsorted(fin, side="left")
+    return df_ventas.iloc[i:j]
+
+# ============================================
+# Horarios de venta
+# ============================================
+
+DIAS_SEMANA = ["Lunes", "Martes", "Miércoles", "Jueves", "Viernes", "Sábado", "Domingo"]
+
+def demanda_por_hora(df_ventas, f_ini, f_fin, categoria=None):
+    """
+    Unidades y ventas por día de la semana (0 = lunes) y hora del día
+    entre dos fechas ISO (inclusive), de una sola categoría si se indica.
+    Sale de la tabla por hora: 168 filas (7 × 24), también las que no
+    tienen ventas.
+    """
+    _, horas, _ = _al_dia(df_ventas)
+
+    rejilla = pd.DataFrame({
+        "dia_semana": np.repeat(np.arange(7), 24),
+        "hora": np.tile(np.arange(24), 7),
+    })
+    if horas.empty:
+        return rejilla.assign(cantidad=0, total=0.0)
+
+    filas = horas.loc[str(f_ini):str(f_fin)]
+    if categoria is not None:
+        filas = filas[filas.index.get_level_values("categoria") == categoria]
+
+    indice = filas.index
+    niveles = dict(zip(indice.names, indice.levels))
+    codigos = dict(zip(indice.names, indice.codes))
+
+    # Día de la semana y hora de cada valor de los niveles (pocos), no de
+    # cada fila
+    dias = pd.to_datetime(
+        pd.Series(niveles["fecha"]), format="%Y-%m-%d", errors="coerce"
+    ).dt.dayofweek.to_numpy()
+    hora = pd.to_numeric(pd.Series(niveles["hora"]), errors="coerce").to_numpy()
+
+    dia_fila = dias[codigos["fecha"]]
+    hora_fila = hora[codigos["hora"]]
+    validas = ~np.isnan(dia_fila) & (hora_fila >= 0) & (hora_fila < 24)
+    celda = (dia_fila[validas] * 24 + hora_fila[validas]).astype(np.int64)
+
+    medidas = filas[MEDIDAS_HORAS].to_numpy(dtype=float)[validas]
+    cantidad = np.bincount(celda, weights=medidas[:, 0], minlength=7 * 24)
+    total = np.bincount(celda, weights=medidas[:, 1], minlength=7 * 24)
+
+    return rejilla.assign(cantidad=_cantidad_entera(cantidad), total=total)
+
+# ============================================
+# Productos destacados y clasificación ABC
+# ============================================
+#
+# ConteoDestacados lleva las ventas ($) por producto de todo el historial
+# con el algoritmo Space-Saving: vigila a lo más CAPACIDAD_DESTACADOS
+# productos. Mientras no ha tenido que reemplazar ninguno, las cifras son
+# exactas. Después, el producto que entra ocupa el lugar del de menor
+# total y hereda ese total como cota de error; los productos que de
+# verdad concentran las ventas nunca salen. Leer los n mayores no
+# depende del largo del historial.
+
+CAPACIDAD_DESTACADOS = 2_000
+
+# Participación acumulada de ventas ($) hasta donde llega cada clase
+LIMITE_A = 0.80
+LIMITE_B = 0.95
+
+_CLAVES_PRODUCTO = ["id_producto", "producto", "categoria"]
+
+class ConteoDestacados:
+    def __init__(self, capacidad=CAPACIDAD_DESTACADOS):
+        self.capacidad = capacidad
+        # (id_producto, producto, categoria) -> [total, cantidad, error]
+        self.conteos = {}
+        self.exacto = True
+
+    @classmethod
+    def desde_resumen(cls, resumen, capacidad=CAPACIDAD_DESTACADOS):
+        """
+        Conteo inicial con los totales exactos del resumen: se quedan los
+        `capacidad` productos con más ventas.
+        """
+        conteo = cls(capacidad)
+        por_producto = _tablas_rango(resumen)["por_producto"]
+        if len(por_producto) > capacidad:
+            por_producto = por_producto.nlargest(capacidad, "total")
+            conteo.exacto = False
+
+        for id_producto, producto, categoria, cantidad, total in zip(
+            por_producto["id_producto"],
+            por_producto["producto"],
+            por_producto["categoria"],
+            por_producto["cantidad"],
+            por_producto["total"],
+        ):
+            conteo.conteos[(id_producto, producto, categoria)] = [
+                float(total), float(cantidad), 0.0,
+            ]
+        return conteo
+
+    def sumar(self, producto, total, cantidad):
+        conteo = self.conteos.get(producto)
+
+        if conteo is not None:
+            conteo[0] += total
+            conteo[1] += cantidad
+            # Un producto sin ventas deja su lugar libre (solo si las
+            # cifras son exactas; si no, su total también es cota)
+            if self.exacto and conteo[0] <= 0 and conteo[1] <= 0:
+                del self.conteos[producto]
+        elif total < 0 or cantidad < 0:
+            # Venta eliminada de un producto que no se vigila
+            return
+        elif len(self.conteos) < self.capacidad:
+            self.conteos[producto] = [total, cantidad, 0.0]
+        else:
+            menor = min(self.conteos, key=lambda p: self.conteos[p][0])
+            minimo = self.conteos.pop(menor)[0]
+            self.conteos[producto] = [minimo + total, cantidad, minimo]
+            self.exacto = False
+
+    def aplicar(self, delta):
+        """
+        Suma un delta del resumen (negativo al eliminar una venta).
+        """
+        por_producto = delta.groupby(level=_CLAVES_PRODUCTO)[["total", "cantidad"]].sum()
+        for producto, total, cantidad in zip(
+            por_producto.index, por_producto["total"], por_producto["cantidad"]
+        ):
+            self.sumar(producto, float(total), float(cantidad))
+
+    def mayores(self, n):
+        """
+        Los n productos con más ventas: [(producto, total, cantidad,
+        error), ...].
+        """
+        return [
+            (producto, total, cantidad, error)
+            for producto, (total, cantidad, error) in heapq.nlargest(
+                n, self.conteos.items(), key=lambda item: item[1][0]
+            )
+        ]
+
+def productos_destacados(df_ventas, n=10):
+    """
+    Los n productos con más ventas ($) de todo el historial, sin recorrer
+    el historial. Devuelve (tabla, exacto): tabla con id_producto,
+    producto, categoria, categoria_producto, cantidad, total y error
+    (cuánto del total puede ser de otros productos; 0 si exacto).
+    """
+    _al_dia(df_ventas)
+    with _lock:
+        conteo = _estado["destacados"]
+        mayores = conteo.mayores(n)
+        exacto = conteo.exacto
+
+    tabla = pd.DataFrame(
+        [(*producto, cantidad, total, error) for producto, total, cantidad, error in mayores],
+        columns=_CLAVES_PRODUCTO + ["cantidad", "total", "error"],
+    )
+    tabla.insert(3, "categoria_producto", tabla["categoria"] + " - " + tabla["producto"])
+
+    if exacto and (tabla["cantidad"] % 1 == 0).all():
+        tabla["cantidad"] = tabla["cantidad"].astype(int)
+
+    return tabla, exacto
+
+def clasificacion_abc(por_producto, limite_a=LIMITE_A, limite_b=LIMITE_B):
+    """
+    Clasificación ABC de la tabla por_producto de analisis_rango: ordena
+    por ventas ($) y agrega participacion, acumulada y clase. Un producto
+    es A si las ventas de los anteriores aún no llegan a limite_a (así el
+    que cruza el límite también es A), B si no llegan a limite_b, y C el
+    resto.
+    """
+    tabla = por_producto.sort_values(
+        "total", ascending=False, kind="stable"
+    ).reset_index(drop=True)
+
+    suma = tabla["total"].sum()
+    tabla["participacion"] = tabla["total"] / suma if suma else 0.0
+    tabla["acumulada"] = tabla["participacion"].cumsum()
+
+    previa = (tabla["acumulada"] - tabla["participacion"]).to_numpy()
+    tabla["clase"] = np.where(
+        previa < limite_a, "A", np.where(previa < limite_b, "B", "C")
+    )
+    return tabla
+
+def top_con_otros(tabla, n, etiqueta="Otros"):
+    """
+    Las primeras n filas de una tabla de clasificacion_abc y una fila más
+    con la suma del resto.
+    """
+    top = tabla.head(n)
+    resto = tabla.iloc[n:]
+    if resto.empty:
+        return top.reset_index(drop=True)
+
+    otros = {col: "" for col in tabla.columns}
+    otros.update({
+        "categoria_producto": f"{etiqueta} ({len(resto)} productos)",
+        "cantidad": resto["cantidad"].sum(),
+        "total": resto["total"].sum(),
+        "participacion": resto["participacion"].sum(),
+        "acumulada": tabla["acumulada"].iloc[-1],
+        "clase": etiqueta,
+    })
+    return pd.concat([top, pd.DataFrame([otros])], ignore_index=True)
@@ -0,0 +1,239 @@
+import random
+import threading
+import time
+from collections import Counter, deque
+
+import requests
+from gspread.exceptions import APIError
+
+# ============================================
+# Cliente de Google Sheets con control de cuota
+# ============================================
+#
+# Envuelve un Spreadsheet de gspread para que todas las llamadas pasen
+# por un solo lugar:
+#   - las hojas (worksheet) se buscan una sola vez por proceso;
+#   - lecturas idénticas dentro de VENTANA_COALESCENCIA_SEGUNDOS (o en
+#     curso en otro hilo) comparten una sola llamada; pasada la ventana el
+#     resultado se descarta;
+#   - errores 429/5xx y de red se reintentan con espera exponencial y
+#     jitter;
+#   - se lleva la cuenta de llamadas del último minuto y, si se llega al
+#     límite, se espera antes de llamar en vez de recibir un 429.
+
+# Límites por usuario y por minuto de la API de Sheets
+LIMITE_LECTURAS_MINUTO = 60
+LIMITE_ESCRITURAS_MINUTO = 60
+
+VENTANA_COALESCENCIA_SEGUNDOS = 2.0
+
+MAX_REINTENTOS = 5
+ESPERA_BASE_SEGUNDOS = 1.0
+ESPERA_MAXIMA_SEGUNDOS = 32.0
+
+CODIGOS_REINTENTABLES = {429, 500, 502, 503, 504}
+
+# Escrituras que no se pueden repetir a ciegas: un 5xx pudo haberse
+# aplicado, así que solo se reintentan ante un 429 (rechazo por cuota).
+METODOS_NO_IDEMPOTENTES = {"append_rows", "delete_rows"}
+
+METODOS_LECTURA = {"get", "get_all_values", "get_all_records", "row_values"}
+METODOS_ESCRITURA = {
+    "update",
+    "batch_update",
+    "append_rows",
+    "batch_clear",
+    "clear",
+    "delete_rows",
+}
+
+
+def _es_reintentable(error, metodo):
+    if isinstance(error, APIError):
+        codigo = getattr(error.response, "status_code", None)
+        if metodo in METODOS_NO_IDEMPOTENTES:
+            return codigo == 429
+        return codigo in CODIGOS_REINTENTABLES
+
+    if metodo in METODOS_NO_IDEMPOTENTES:
+        return False
+    return isinstance(
+        error,
+        (requests.exceptions.ConnectionError, requests.exceptions.Timeout),
+    )
+
+
+class ClienteSheets:
+    def __init__(self, libro, dormir=time.sleep):
+        self.libro = libro
+        self.llamadas = Counter()
+        self.reintentos = 0
+        self._dormir = dormir
+        self._lock = threading.Lock()
+        self._historial = {"lectura": deque(), "escritura": deque()}
+        self._hojas = {}
+        self._lecturas = {}
+        self._en_curso = {}
+
+    # ---------- Cuota y reintentos ----------
+
+    def _limpiar_historial(self, ahora):
+        for marcas in self._historial.values():
+            while marcas and ahora - marcas[0] >= 60:
+                marcas.popleft()
+
+    def _esperar_cupo(self, tipo):
+        limite = (
+            LIMITE_LECTURAS_MINUTO if tipo == "lectura" else LIMITE_ESCRITURAS_MINUTO
+        )
+        while True:
+            with self._lock:
+                ahora = time.monotonic()
+                self._limpiar_historial(ahora)
+                marcas = self._historial[tipo]
+                if len(marcas) < limite:
+                    marcas.append(ahora)
+                    return
+                espera = 60 - (ahora - marcas[0])
+            self._dormir(max(espera, 0.01))
+
+    def _llamar(self, tipo, metodo, funcion, *args, **kwargs):
+        intento = 0
+        while True:
+            self._esperar_cupo(tipo)
+            with self._lock:
+                self.llamadas[metodo] += 1
+            try:
+                return funcion(*args, **kwargs)
+            except Exception as e:
+                intento += 1
+                if intento > MAX_REINTENTOS or not _es_reintentable(e, metodo):
+                    raise
+                with self._lock:
+                    self.reintentos += 1
+                espera = min(ESPERA_BASE_SEGUNDOS * 2 ** (intento - 1), ESPERA_MAXIMA_SEGUNDOS)
+                self._dormir(espera + random.uniform(0, espera))
+
+    def uso_por_minuto(self):
+        """
+        Llamadas de lectura y escritura en los últimos 60 segundos, junto
+        con sus límites.
+        """
+        with self._lock:
+            self._limpiar_historial(time.monotonic())
+            return {
+                "lecturas": len(self._historial["lectura"]),
+                "escrituras": len(self._historial["escritura"]),
+                "limite_lecturas": LIMITE_LECTURAS_MINUTO,
+                "limite_escrituras": LIMITE_ESCRITURAS_MINUTO,
+                "reintentos": self.reintentos,
+            }
+
+    # ---------- Coalescencia de lecturas ----------
+
+    def _leer(self, titulo, metodo, funcion, *args, **kwargs):
+        clave = (titulo, metodo, args, tuple(sorted(kwargs.items())))
+        try:
+            hash(clave)
+        except TypeError:
+            return self._llamar("lectura", metodo, funcion, *args, **kwargs)
+
+        with self._lock:
+            guardada = self._lecturas.get(clave)
+            if (
+                guardada is not None
+                and time.monotonic() - guardada[0] < VENTANA_COALESCENCIA_SEGUNDOS
+            ):
+                return guardada[1]
+
+            evento = self._en_curso.get(clave)
+            propia = evento is None
+            if propia:
+                evento = threading.Event()
+                self._en_curso[clave] = evento
+
+        if not propia:
+            evento.wait()
+            with self._lock:
+                guardada = self._lecturas.get(clave)
+            if guardada is not None:
+                return guardada[1]
+            # La lectura en curso falló o fue invalidada: leer por cuenta propia
+            return self._llamar("lectura", metodo, funcion, *args, **kwargs)
+
+        try:
+            resultado = self._llamar("lectura", metodo, funcion, *args, **kwargs)
+            with self._lock:
+                ahora = time.monotonic()
+                # Las lecturas son hojas completas: las vencidas se
+                # descartan aquí para no guardarlas hasta la próxima
+                # escritura en la hoja
+                vencidas = [
+                    c for c, (momento, _) in self._lecturas.items()
+                    if ahora - momento >= VENTANA_COALESCENCIA_SEGUNDOS
+                ]
+                for c in vencidas:
+                    del self._lecturas[c]
+                self._lecturas[clave] = (ahora, resultado)
+            return resultado
+        finally:
+            with self._lock:
+                self._en_curso.pop(clave, None)
+            evento.set()
+
+    def _invalidar_lecturas(self, titulo):
+        with self._lock:
+            for clave in [c for c in self._lecturas if c[0] == titulo]:
+                del self._lecturas[clave]
+
+    # ---------- API tipo gspread ----------
+
+    def worksheet(self, titulo):
+        with self._lock:
+            hoja = self._hojas.get(titulo)
+        if hoja is None:
+            hoja = HojaCliente(
+                self,
+                self._llamar("lectura", "worksheet", self.libro.worksheet, titulo),
+            )
+            with self._lock:
+                self._hojas[titulo] = hoja
+        return hoja
+
+
+class HojaCliente:
+    """
+    Worksheet de gspread cuyas lecturas y escrituras pasan por
+    ClienteSheets.
+    """
+
+    def __init__(self, cliente, hoja):
+        self._cliente = cliente
+        self._hoja = hoja
+        self.title = hoja.title
+
+    @property
+    def row_count(self):
+        return self._hoja.row_count
+
+    @property
+    def col_count(self):
+        return self._hoja.col_count
+
+    def __getattr__(self, metodo):
+        funcion = getattr(self._hoja, metodo)
+
+        if metodo in METODOS_LECTURA:
+            def leer(*args, **kwargs):
+                return self._cliente._leer(self.title, metodo, funcion, *args, **kwargs)
+            return leer
+
+        if metodo in METODOS_ESCRITURA:
+            def escribir(*args, **kwargs):
+                try:
+                    return self._cliente._llamar("escritura", metodo, funcion, *args, **kwargs)
+                finally:
+                    self._cliente._invalidar_lecturas(self.title)
+            return escribir
+
+        return funcion
@@ -0,0 +1,348 @@
+import os
+import subprocess
+import textwrap
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# ============================================
+# Tickets de venta
+# ============================================
+#
+# El mismo ticket_data de "Registrar venta" se entrega como PDF tamaño
+# carta o como ticket para impresora térmica de 58 u 80 mm. El térmico
+# es texto plano con comandos ESC/POS (alineación, negritas, corte de
+# papel): se arma en microsegundos y se manda tal cual a la impresora.
+#
+# Las impresoras de cada caja se configuran en PALETERIA_IMPRESORAS, por
+# ejemplo "Caja 1=/dev/usb/lp0;Caja 2=lp:termica". Una ruta se abre como
+# archivo de dispositivo; "lp:NOMBRE" manda el ticket a la cola de
+# impresión local (CUPS) sin procesarlo.
+
+FORMATO_PDF = "PDF (carta)"
+
+# Caracteres por renglón de cada formato térmico (fuente A)
+COLUMNAS_TERMICA = {
+    "Térmica 58 mm": 32,
+    "Térmica 80 mm": 48,
+}
+FORMATOS_TICKET = [FORMATO_PDF, *COLUMNAS_TERMICA]
+
+# Tabla WPC1252 (acentos, ñ, ¡) de Epson y compatibles
+CODIFICACION_ESCPOS = "cp1252"
+TABLA_ESCPOS = 16
+
+# Renglones en blanco antes del corte, para que el texto pase la cuchilla
+AVANCE_ANTES_DE_CORTE = 3
+
+ESC = b"\x1b"
+GS = b"\x1d"
+
+CONFIG_IMPRESORAS = os.environ.get("PALETERIA_IMPRESORAS", "")
+
+
+class ErrorImpresion(Exception):
+    """
+    No se pudo mandar el ticket a la impresora.
+    """
+
+# ============================================
+# PDF
+# ============================================
+#
+# El ticket en PDF es una hoja carta con texto en Helvetica y una línea.
+# Todo lo fijo del archivo (encabezado, fuentes, catálogo, diccionario
+# de página y los comandos de los textos que no cambian) se arma una
+# sola vez al importar el módulo; por ticket solo se escriben los
+# renglones de cada página y la tabla xref. El diseño es el mismo que
+# se dibujaba con reportlab, pero sin armar un Canvas por venta.
+#
+# generar_ticket_pdf_en_hilo lo genera en un hilo aparte: la página
+# muestra la venta de inmediato y el botón de descarga espera el PDF.
+
+ANCHO_CARTA = 612
+ALTO_CARTA = 792
+MARGEN_PDF = 50
+
+# Por debajo de esta altura el siguiente producto va en otra página
+ALTO_MINIMO_PDF = 100
+
+HILOS_TICKETS = 2
+
+# Objetos fijos: 1 y 2 fuentes, 3 catálogo; 4 es la lista de páginas,
+# que se escribe al final porque depende del número de páginas
+_OBJETOS_FIJOS = [
+    b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica "
+    b"/Encoding /WinAnsiEncoding >>",
+    b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold "
+    b"/Encoding /WinAnsiEncoding >>",
+    b"<< /Type /Catalog /Pages 4 0 R >>",
+]
+_OBJETO_PAGINAS = 4
+
+_PAGINA_PDF = (
+    b"<< /Type /Page /Parent 4 0 R /MediaBox [0 0 %d %d] "
+    b"/Resources << /Font << /F1 1 0 R /F2 2 0 R >> >> /Contents %%d 0 R >>"
+    % (ANCHO_CARTA, ALTO_CARTA)
+)
+
+_tickets = {"pool": None}
+_lock_tickets = threading.Lock()
+
+
+def _texto_pdf(texto):
+    # Cadena literal de PDF en WinAnsi (cp1252)
+    datos = str(texto).encode("cp1252", errors="replace")
+    return datos.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+def _renglon_pdf(fuente, tamano, y, texto):
+    return b"BT /%s %d Tf %d %d Td (%s) Tj ET\n" % (
+        fuente, tamano, MARGEN_PDF, y, _texto_pdf(texto)
+    )
+
+def _parte_fija():
+    datos = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    posiciones = []
+    for numero, objeto in enumerate(_OBJETOS_FIJOS, start=1):
+        posiciones.append(len(datos))
+        datos += b"%d 0 obj\n%s\nendobj\n" % (numero, objeto)
+    return bytes(datos), posiciones
+
+_INICIO_PDF, _POSICIONES_FIJAS = _parte_fija()
+
+_TITULO_PDF = _renglon_pdf(b"F2", 14, ALTO_CARTA - MARGEN_PDF, "Ticket de venta")
+_DETALLE_PDF = _renglon_pdf(b"F2", 11, ALTO_CARTA - MARGEN_PDF - 65, "Detalle de productos:")
+_GRACIAS_PDF = "¡Gracias por su compra!"
+
+
+def _paginas_ticket(ticket):
+    """
+    Comandos de contenido de cada página del ticket.
+    """
+    paginas = []
+    pagina = bytearray(_TITULO_PDF)
+    y = ALTO_CARTA - MARGEN_PDF - 25
+
+    pagina += _renglon_pdf(b"F1", 10, y, f"Fecha: {ticket['fecha']}   Hora: {ticket['hora']}")
+    y -= 15
+    pagina += _renglon_pdf(b"F1", 10, y, f"Método de pago: {ticket['metodo_pago']}")
+    pagina += _DETALLE_PDF
+    y -= 43
+
+    def pagina_nueva():
+        nonlocal pagina, y
+        paginas.append(bytes(pagina))
+        pagina = bytearray()
+        y = ALTO_CARTA - MARGEN_PDF
+
+    for item in ticket["items"]:
+        linea3 = ""
+        if item.get("extra", 0) > 0:
+            linea3 += f"  Extra: +${item['extra']:.2f}"
+        if item.get("descuento", 0) > 0:
+            linea3 += f"  Descuento: -${item['descuento']:.2f}"
+
+        if y < ALTO_MINIMO_PDF:
+            pagina_nueva()
+
+        pagina += _renglon_pdf(
+            b"F1", 10, y,
+            f"- ID: {item['id_producto']} | {item['categoria']} - {item['producto']}",
+        )
+        y -= 15
+        pagina += _renglon_pdf(
+            b"F1", 10, y, f"  Cant: {item['cantidad']}  Precio: ${item['precio']:.2f}"
+        )
+        y -= 15
+        if linea3:
+            pagina += _renglon_pdf(b"F1", 10, y, linea3)
+            y -= 15
+        pagina += _renglon_pdf(
+            b"F1", 11, y, f"Subtotal: ${float(item.get('subtotal', 0)):.2f}"
+        )
+        y -= 20
+
+    # El cierre (línea, total y agradecimiento) no se parte entre páginas
+    if y < ALTO_MINIMO_PDF:
+        pagina_nueva()
+
+    y -= 10
+    pagina += b"%d %d m %d %d l S\n" % (MARGEN_PDF, y, ANCHO_CARTA - MARGEN_PDF, y)
+    y -= 20
+    pagina += _renglon_pdf(b"F2", 12, y, f"TOTAL A PAGAR: ${ticket['total']:.2f}")
+    y -= 25
+    pagina += _renglon_pdf(b"F1", 10, y, _GRACIAS_PDF)
+
+    paginas.append(bytes(pagina))
+    return paginas
+
+def generar_ticket_pdf(ticket: dict) -> bytes:
+    """
+    Ticket en PDF tamaño carta (bytes), sobre la parte fija ya armada.
+    """
+    datos = bytearray(_INICIO_PDF)
+    posiciones = [*_POSICIONES_FIJAS, None]
+    hojas = []
+
+    for contenido in _paginas_ticket(ticket):
+        numero = len(posiciones) + 1
+        posiciones.append(len(datos))
+        datos += b"%d 0 obj\n" % numero + _PAGINA_PDF % (numero + 1) + b"\nendobj\n"
+        posiciones.append(len(datos))
+        datos += b"%d 0 obj\n<< /Length %d >>\nstream\n%s\nendstream\nendobj\n" % (
+            numero + 1, len(contenido), contenido
+        )
+        hojas.append(b"%d 0 R" % numero)
+
+    posiciones[_OBJETO_PAGINAS - 1] = len(datos)
+    datos += b"%d 0 obj\n<< /Type /Pages /Kids [%s] /Count %d >>\nendobj\n" % (
+        _OBJETO_PAGINAS, b" ".join(hojas), len(hojas)
+    )
+
+    inicio_xref = len(datos)
+    datos += b"xref\n0 %d\n0000000000 65535 f \n" % (len(posiciones) + 1)
+    datos += b"".join(b"%010d 00000 n \n" % p for p in posiciones)
+    datos += b"trailer\n<< /Size %d /Root 3 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(posiciones) + 1, inicio_xref
+    )
+    return bytes(datos)
+
+def _pool_tickets():
+    # Hilos compartidos por todas las sesiones; se crean en el primer uso
+    with _lock_tickets:
+        if _tickets["pool"] is None:
+            _tickets["pool"] = ThreadPoolExecutor(
+                max_workers=HILOS_TICKETS,
+                thread_name_prefix="tickets",
+            )
+        return _tickets["pool"]
+
+def generar_ticket_pdf_en_hilo(ticket: dict) -> Future:
+    """
+    Empieza a generar el PDF en un hilo aparte. future.result() devuelve
+    los bytes; se puede pasar como data= de st.download_button.
+    """
+    return _pool_tickets().submit(generar_ticket_pdf, ticket)
+
+# ============================================
+# Impresora térmica (ESC/POS)
+# ============================================
+
+def _dinero(valor):
+    return f"${float(valor):,.2f}"
+
+def _cortar(texto, columnas):
+    # textwrap solo con los renglones que no caben
+    if len(texto) <= columnas:
+        return [texto]
+    return textwrap.wrap(texto, columnas)
+
+def _renglones(izquierda, derecha, columnas):
+    # Texto a la izquierda (cortado al ancho) e importe pegado a la
+    # derecha del último renglón, o en uno propio si no cabe
+    renglones = _cortar(izquierda, columnas) or [""]
+    if len(renglones[-1]) + 1 + len(derecha) > columnas:
+        renglones.append("")
+    renglones[-1] = renglones[-1].ljust(columnas - len(derecha)) + derecha
+    return renglones
+
+def _renglones_ticket(ticket, columnas):
+    """
+    Renglones del ticket como (texto, centrado, resaltado).
+    """
+    renglones = []
+
+    def agregar(textos, centrado=False, resaltado=False):
+        renglones.extend((t, centrado, resaltado) for t in textos)
+
+    separador = ["-" * columnas]
+
+    agregar(["Ticket de venta"], centrado=True, resaltado=True)
+    agregar(_renglones(f"Fecha: {ticket['fecha']}", f"Hora: {ticket['hora']}", columnas))
+    agregar(_cortar(f"Método de pago: {ticket['metodo_pago']}", columnas))
+    agregar(separador)
+
+    for item in ticket["items"]:
+        agregar(_cortar(
+            f"{item['id_producto']} {item['categoria']} - {item['producto']}",
+            columnas,
+        ))
+        agregar(_renglones(
+            f"  {item['cantidad']} x {_dinero(item['precio'])}",
+            _dinero(float(item["cantidad"]) * float(item["precio"])),
+            columnas,
+        ))
+        if item.get("extra", 0) > 0:
+            agregar(_renglones("  Extra", "+" + _dinero(item["extra"]), columnas))
+        if item.get("descuento", 0) > 0:
+            agregar(_renglones("  Descuento", "-" + _dinero(item["descuento"]), columnas))
+
+    agregar(separador)
+    if ticket.get("descuento", 0) > 0:
+        agregar(_renglones("Subtotal", _dinero(ticket["total_bruto"]), columnas))
+        agregar(_renglones("Descuento", "-" + _dinero(ticket["descuento"]), columnas))
+    agregar(_renglones("TOTAL", _dinero(ticket["total"]), columnas), resaltado=True)
+    agregar([""])
+    agregar(["¡Gracias por su compra!"], centrado=True)
+
+    return renglones
+
+def texto_ticket(ticket: dict, columnas=32) -> str:
+    """
+    Vista previa en texto plano del ticket térmico de `columnas`
+    caracteres por renglón.
+    """
+    return "\n".join(
+        texto.center(columnas).rstrip() if centrado else texto
+        for texto, centrado, _ in _renglones_ticket(ticket, columnas)
+    )
+
+def ticket_escpos(ticket: dict, columnas=32) -> bytes:
+    """
+    Ticket térmico en ESC/POS, listo para mandar a la impresora: mismo
+    texto que texto_ticket, con títulos y total en negritas y doble alto,
+    y corte de papel al final.
+    """
+    datos = bytearray(ESC + b"@" + ESC + b"t" + bytes([TABLA_ESCPOS]))
+
+    for texto, centrado, resaltado in _renglones_ticket(ticket, columnas):
+        datos += ESC + b"a" + (b"\x01" if centrado else b"\x00")
+        if resaltado:
+            datos += ESC + b"E\x01" + GS + b"!\x01"
+        datos += texto.encode(CODIFICACION_ESCPOS, errors="replace") + b"\n"
+        if resaltado:
+            datos += ESC + b"E\x00" + GS + b"!\x00"
+
+    datos += ESC + b"d" + bytes([AVANCE_ANTES_DE_CORTE]) + GS + b"V\x01"
+    return bytes(datos)
+
+def impresoras():
+    """
+    {nombre: destino} configuradas en PALETERIA_IMPRESORAS.
+    """
+    configuradas = {}
+    for entrada in CONFIG_IMPRESORAS.split(";"):
+        nombre, _, destino = entrada.partition("=")
+        if nombre.strip() and destino.strip():
+            configuradas[nombre.strip()] = destino.strip()
+    return configuradas
+
+def imprimir(datos: bytes, destino: str):
+    """
+    Manda bytes ESC/POS a un destino de impresoras(): un archivo de
+    dispositivo o "lp:NOMBRE" (cola local). Lanza ErrorImpresion si no se
+    pudo.
+    """
+    try:
+        if destino.startswith("lp:"):
+            subprocess.run(
+                ["lp", "-d", destino[3:], "-o", "raw"],
+                input=datos,
+                capture_output=True,
+                check=True,
+                timeout=10,
+            )
+        else:
+            with open(destino, "wb") as impresora:
+                impresora.write(datos)
+    except (OSError, subprocess.SubprocessError) as e:
+        raise ErrorImpresion(f"{destino}: {e}") from e